@@ -0,0 +1,171 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Hashable, Iterable
+
+
+class AdaptiveConcurrencyLimiter:
+    """Class for AIMD concurrency window adjusted by observed latency and errors"""
+
+    def __init__(
+            self,
+            initial_limit: int = 15,
+            min_limit: int = 2,
+            max_limit: int = 64,
+            latency_target: float = 2.0,
+            decrease_factor: float = 0.5,
+    ) -> None:
+        """
+        Initialisation function for adaptive limiter
+        Args:
+            initial_limit (int): initial number of requests in flight
+            min_limit (int): lower bound for the window
+            max_limit (int): upper bound for the window
+            latency_target (float): latency in seconds above which the window is decreased
+            decrease_factor (float): multiplicative decrease factor
+        Returns:
+            None
+        """
+
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.in_flight = 0
+        self.latency_ewma: float | None = None
+        self.decreases = 0
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        """
+        Function waits until there is a free slot in the window
+        Returns:
+            None
+        """
+
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, latency: float, success: bool) -> None:
+        """
+        Function frees slot, adjusts the window and wakes only as many waiters as there are free slots
+        Args:
+            latency (float): observed request latency in seconds
+            success (bool): whether request succeeded
+        Returns:
+            None
+        """
+
+        async with self._condition:
+            self.in_flight -= 1
+            self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+            if success and latency <= self.latency_target:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            elif time.monotonic() - self._last_decrease > (self.latency_ewma or 0):
+                # decrease at most once per round trip so one slow batch doesn't collapse the window
+                self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                self.decreases += 1
+                self._last_decrease = time.monotonic()
+            self._condition.notify(max(int(self.limit) - self.in_flight, 0))
+
+    def get_metrics(self) -> dict:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "latency_ewma": self.latency_ewma,
+            "decreases": self.decreases,
+        }
+
+
+class AdaptiveFetcher:
+    """
+    Class for pipelined fetching with adaptive number of requests in flight. Window is created for every
+    fetch so concurrent fetches don't share it and it is bound to the event loop fetch runs in
+    """
+
+    def __init__(
+            self,
+            initial_limit: int = 15,
+            min_limit: int = 2,
+            max_limit: int = 64,
+            latency_target: float = 2.0,
+            decrease_factor: float = 0.5,
+    ) -> None:
+        """
+        Initialisation function for adaptive fetcher
+        Args:
+            initial_limit (int): initial number of requests in flight
+            min_limit (int): lower bound for the window
+            max_limit (int): upper bound for the window and number of workers
+            latency_target (float): latency in seconds above which the window is decreased
+            decrease_factor (float): multiplicative decrease factor
+        Returns:
+            None
+        """
+
+        self.initial_limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+
+    def make_limiter(self) -> AdaptiveConcurrencyLimiter:
+        """
+        Function creates window for one fetch
+        Returns:
+            AdaptiveConcurrencyLimiter: new limiter
+        """
+
+        return AdaptiveConcurrencyLimiter(
+            initial_limit=self.initial_limit,
+            min_limit=self.min_limit,
+            max_limit=self.max_limit,
+            latency_target=self.latency_target,
+            decrease_factor=self.decrease_factor,
+        )
+
+    async def fetch_all(
+            self,
+            keys: Iterable[Hashable],
+            fetch: Callable[[Any], Awaitable[Any]],
+            limiter: AdaptiveConcurrencyLimiter | None = None,
+    ) -> dict[Any, Any]:
+        """
+        Function fetches data for deduplicated keys keeping the window full. Keys are pulled by a fixed pool
+        of workers sized to window upper bound, so tasks and waiters don't grow with the number of keys
+        Args:
+            keys (Iterable[Hashable]): keys to fetch, duplicates are fetched once
+            fetch (Callable[[Any], Awaitable[Any]]): coroutine function fetching data for a key
+            limiter (AdaptiveConcurrencyLimiter | None): window to use, new one is created if not provided
+        Returns:
+            dict[Any, Any]: fetched data by key in order of first key appearance
+        Raises:
+            Any, first error from fetch, other requests are cancelled
+        """
+
+        limiter = limiter if limiter else self.make_limiter()
+        unique_keys = list(dict.fromkeys(keys))
+        results = [None] * len(unique_keys)
+        pending = iter(enumerate(unique_keys))
+
+        async def worker():
+            for position, key in pending:
+                await limiter.acquire()
+                start = time.monotonic()
+                try:
+                    results[position] = await fetch(key)
+                except BaseException:
+                    await limiter.release(time.monotonic() - start, success=False)
+                    raise
+                await limiter.release(time.monotonic() - start, success=True)
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(limiter.max_limit, len(unique_keys)))]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            raise
+        return dict(zip(unique_keys, results))
@@ -1,7 +1,16 @@
+import asyncio
+import copy
+from typing import Any, Awaitable, Callable
+
 import aiohttp
+from fastapi import HTTPException
 from loguru import logger
 
 from app.common.exceptions.http_exception_wrapper import http_exception
+from .response_cache import ResponseCache
+from .retry_policy import RetryPolicy, CircuitBreaker, UpstreamMetrics
+
+_NOT_MODIFIED = object()
 
 
 class APIHandler:
@@ -9,16 +18,29 @@ class APIHandler:
     def __init__(
             self,
             base_url: str,
+            name: str | None = None,
+            retry_policy: RetryPolicy | None = None,
+            circuit_breaker: CircuitBreaker | None = None,
+            response_cache: ResponseCache | None = None,
     ) -> None:
         """Initialisation function
 
         Args:
             base_url (str): Base api url
+            name (str | None): Upstream name used in logs and metrics
+            retry_policy (RetryPolicy | None): Retry policy, default policy is used if not provided
+            circuit_breaker (CircuitBreaker | None): Upstream circuit breaker, default one is used if not provided
+            response_cache (ResponseCache | None): Cache for idempotent GET responses, disabled if not provided
         Returns:
             None
         """
 
         self.base_url = base_url
+        self.name = name if name else base_url
+        self.retry_policy = retry_policy if retry_policy else RetryPolicy()
+        self.circuit_breaker = circuit_breaker if circuit_breaker else CircuitBreaker()
+        self.metrics = UpstreamMetrics()
+        self.response_cache = response_cache
 
     @staticmethod
     async def _check_response_status(
@@ -29,7 +51,7 @@ class APIHandler:
         Args:
             response (aiohttp.ClientResponse): Response object
         Returns:
-            list|dict: requested data with additional info, e.g. {"retry": True | False, "response": {response.json}}
+            list|dict|None: requested data, None if upstream connection was reset and request can be retried
         Raises:
             http_exception with response status code from API
         """
@@ -39,7 +61,7 @@ class APIHandler:
         elif response.status == 500:
             if response.content_type == "application/json":
                 response_info = await response.json()
-                if "reset by peer" in response_info["error"]:
+                if isinstance(response_info, dict) and "reset by peer" in str(response_info.get("error")):
                     return None
             else:
                 response_info = await response.text()
@@ -61,12 +83,136 @@ class APIHandler:
             logger.error(exception)
             raise exception
 
+
+    def get_metrics(self) -> dict:
+        """Function returns upstream request metrics
+
+        Returns:
+            dict: request counters and circuit breaker state
+        """
+
+        metrics = {
+            **self.metrics.to_dict(),
+            "circuit_state": self.circuit_breaker.state,
+            "consecutive_failures": self.circuit_breaker.consecutive_failures,
+        }
+        if self.response_cache:
+            metrics["response_cache"] = self.response_cache.get_metrics()
+        return metrics
+
+    async def _request(
+            self,
+            method: str,
+            endpoint_url: str,
+            session: aiohttp.ClientSession,
+            response_reader: Callable[[aiohttp.ClientResponse], Awaitable[Any]] | None = None,
+            retry: bool | None = None,
+            **request_kwargs,
+    ) -> Any:
+        """Function issues request with bounded retries and circuit breaker
+
+        Args:
+            method (str): HTTP method
+            endpoint_url (str): Endpoint url
+            session (aiohttp.ClientSession): Session to use
+            response_reader (Callable | None): Coroutine reading response, None result means retry.
+            Defaults to json reading with status check
+            retry (bool | None): Whether request can be retried, None to retry only idempotent methods
+            **request_kwargs: headers, params and body passed to aiohttp
+        Returns:
+            Any: Response data returned by reader
+        Raises:
+            503, upstream circuit is open or retries are exhausted,
+            Any, non-retryable error from API
+        """
+
+        url = self.base_url + endpoint_url
+        response_reader = response_reader if response_reader else self._check_response_status
+        last_error = None
+        last_status = 503
+        max_attempts = self.retry_policy.get_attempts(method, retry)
+        for attempt in range(1, max_attempts + 1):
+            if not self.circuit_breaker.allow_request():
+                self.metrics.short_circuited += 1
+                raise http_exception(
+                    503,
+                    f"{self.name} is unavailable, request is rejected by circuit breaker",
+                    _input=url,
+                    _detail={"retry_after": round(self.circuit_breaker.retry_after(), 2)},
+                )
+            self.metrics.requests += 1
+            try:
+                async with session.request(method, url, **request_kwargs) as response:
+                    if response.status in self.retry_policy.retry_statuses:
+                        last_status = response.status
+                        last_error = f"{response.status}: {await response.text()}"
+                    else:
+                        result = await response_reader(response)
+                        if result is not None:
+                            self.circuit_breaker.record_success()
+                            return result
+                        last_status = response.status
+                        last_error = f"{response.status}: connection reset by peer"
+            except HTTPException as e:
+                if e.status_code >= 500:
+                    self._record_failure(str(e.detail))
+                else:
+                    self.circuit_breaker.record_success()
+                raise e
+            except (
+                    aiohttp.ClientConnectionError,
+                    aiohttp.ClientPayloadError,
+                    asyncio.IncompleteReadError,
+                    asyncio.TimeoutError,
+            ) as e:
+                last_status = 503
+                last_error = f"{type(e).__name__}: {e}"
+            except BaseException:
+                # cancelled requests and reader errors must not keep half open circuit blocked by lost probe
+                self.circuit_breaker.release_probe()
+                raise
+            self._record_failure(last_error)
+            if attempt == max_attempts:
+                break
+            delay = self.retry_policy.get_delay(attempt)
+            self.metrics.retries += 1
+            logger.warning(
+                f"Attempt {attempt} to {method} {url} failed with {last_error}, retrying in {delay:.2f}s"
+            )
+            await asyncio.sleep(delay)
+        exception = http_exception(
+            last_status,
+            f"Couldn't get data from {self.name} after {max_attempts} attempts",
+            _input=url,
+            _detail=last_error,
+        )
+        logger.error(exception)
+        raise exception
+
+    def _record_failure(self, error: str) -> None:
+        """Function registers failed attempt in metrics and circuit breaker
+
+        Args:
+            error (str): error description
+        Returns:
+            None
+        """
+
+        self.metrics.failures += 1
+        self.metrics.last_error = error
+        if self.circuit_breaker.record_failure():
+            self.metrics.circuit_opened += 1
+            logger.error(
+                f"Circuit breaker for {self.name} is open for {self.circuit_breaker.recovery_timeout}s"
+            )
+
     async def get(
             self,
             endpoint_url: str,
             headers: dict | None = None,
             params: dict | None = None,
             session: aiohttp.ClientSession | None = None,
+            use_cache: bool = True,
     ) -> dict | list:
         """Function to get data from api
 
@@ -75,33 +221,145 @@ class APIHandler:
             headers (dict | None): Headers
             params (dict | None): Query parameters
             session (aiohttp.ClientSession | None): Session to use
+            use_cache (bool): Whether response cache can be used for the request
         Returns:
             dict | list: Response data as python object
         """
 
         if not session:
             async with aiohttp.ClientSession() as session:
-                return await  self.get(
+                return await self.get(
                     endpoint_url=endpoint_url,
                     headers=headers,
                     params=params,
                     session=session,
+                    use_cache=use_cache,
                 )
-        url = self.base_url + endpoint_url
-        async with session.get(
-                url=url,
-                headers=headers,
-                params=params
-        ) as response:
-            result = await self._check_response_status(response)
-            if result is None:
-                return await  self.get(
+        if self.response_cache and use_cache:
+            ttl = self.response_cache.get_ttl(endpoint_url)
+            if ttl is not None and not (headers and "Authorization" in headers):
+                return await self._get_cached(
                     endpoint_url=endpoint_url,
+                    ttl=ttl,
                     headers=headers,
                     params=params,
                     session=session,
                 )
-            return result
+        return await self._request(
+            "GET",
+            endpoint_url,
+            session,
+            headers=headers,
+            params=params,
+        )
+
+    async def get_raw(
+            self,
+            endpoint_url: str,
+            response_reader: Callable[[aiohttp.ClientResponse], Awaitable[Any]],
+            headers: dict | None = None,
+            params: dict | None = None,
+            session: aiohttp.ClientSession | None = None,
+    ) -> Any:
+        """Function to get data from api with custom response reader, e.g. for streamed binary bodies
+
+        Args:
+            endpoint_url (str): Endpoint url
+            response_reader (Callable): Coroutine reading response, None result means retry
+            headers (dict | None): Headers
+            params (dict | None): Query parameters
+            session (aiohttp.ClientSession | None): Session to use
+        Returns:
+            Any: Data returned by reader
+        """
+
+        if not session:
+            async with aiohttp.ClientSession() as session:
+                return await self.get_raw(
+                    endpoint_url=endpoint_url,
+                    response_reader=response_reader,
+                    headers=headers,
+                    params=params,
+                    session=session,
+                )
+        return await self._request(
+            "GET",
+            endpoint_url,
+            session,
+            response_reader=response_reader,
+            headers=headers,
+            params=params,
+        )
+
+    async def _read_cacheable_response(
+            self,
+            response: aiohttp.ClientResponse,
+    ) -> tuple | object | None:
+        """Function reads response keeping validators for revalidation
+
+        Args:
+            response (aiohttp.ClientResponse): Response object
+        Returns:
+            tuple | object | None: data with ETag and Last-Modified, _NOT_MODIFIED marker on 304,
+            None if request should be retried
+        """
+
+        if response.status == 304:
+            return _NOT_MODIFIED
+        result = await self._check_response_status(response)
+        if result is None:
+            return None
+        return result, response.headers.get("ETag"), response.headers.get("Last-Modified")
+
+    async def _get_cached(
+            self,
+            endpoint_url: str,
+            ttl: float,
+            headers: dict | None,
+            params: dict | None,
+            session: aiohttp.ClientSession,
+    ) -> dict | list:
+        """Function gets data through response cache with conditional revalidation
+
+        Args:
+            endpoint_url (str): Endpoint url
+            ttl (float): Time to live for endpoint response in seconds
+            headers (dict | None): Headers
+            params (dict | None): Query parameters
+            session (aiohttp.ClientSession): Session to use
+        Returns:
+            dict | list: Response data as python object, copy of cached data so callers can't mutate it
+        """
+
+        key = self.response_cache.make_key(self.base_url + endpoint_url, params)
+        entry = await self.response_cache.get(key)
+        if entry and entry.is_fresh():
+            self.response_cache.metrics["hits"] += 1
+            return copy.deepcopy(entry.data)
+        self.response_cache.metrics["misses"] += 1
+        request_headers = dict(headers) if headers else {}
+        if entry:
+            request_headers.update(entry.get_validators())
+        try:
+            result = await self._request(
+                "GET",
+                endpoint_url,
+                session,
+                response_reader=self._read_cacheable_response,
+                headers=request_headers,
+                params=params,
+            )
+        except HTTPException as e:
+            if entry and e.status_code >= 500:
+                logger.warning(f"Serving stale response for {endpoint_url} from cache, upstream failed: {e.detail}")
+                return copy.deepcopy(entry.data)
+            raise e
+        if result is _NOT_MODIFIED:
+            await self.response_cache.refresh(key, entry, ttl)
+            return copy.deepcopy(entry.data)
+        data, etag, last_modified = result
+        await self.response_cache.set(key, data, ttl, etag=etag, last_modified=last_modified)
+        return copy.deepcopy(data)
 
     async def post(
             self,
@@ -110,6 +368,7 @@ class APIHandler:
             params: dict | None = None,
             data: dict | None = None,
             session: aiohttp.ClientSession | None = None,
+            retry: bool = False,
         ) -> dict | list:
         """Function to post data from api
 
@@ -119,6 +378,7 @@ class APIHandler:
             params (dict | None): Query parameters
             data (dict | None): Request data
             session (aiohttp.ClientSession | None): Session to use
+            retry (bool): Whether request is safe to retry on timeouts and 5xx, off since it can repeat the write
         Returns:
             dict | list: Response data as python object
         """
@@ -131,23 +391,17 @@ class APIHandler:
                     params=params,
                     data=data,
                     session=session,
+                    retry=retry,
                 )
-        url = self.base_url + endpoint_url
-        async with session.post(
-            url=url,
+        return await self._request(
+            "POST",
+            endpoint_url,
+            session,
+            retry=retry,
             headers=headers,
             params=params,
             json=data,
-        ) as response:
-            result = await self._check_response_status(response)
-            if result is None:
-                return await  self.post(
-                    endpoint_url=endpoint_url,
-                    headers=headers,
-                    params=params,
-                    session=session,
-                )
-            return result
+        )
 
     async def put(
             self,
@@ -156,8 +410,9 @@ class APIHandler:
             params: dict | None = None,
             data: dict | None = None,
             session: aiohttp.ClientSession | None = None,
+            retry: bool = False,
     ) -> dict | list:
-        """Function to post data from api
+        """Function to put data to api
 
         Args:
             endpoint_url (str): Endpoint url
@@ -165,6 +420,7 @@ class APIHandler:
             params (dict | None): Query parameters
             data (dict | None): Request data
             session (aiohttp.ClientSession | None): Session to use
+            retry (bool): Whether request is safe to retry on timeouts and 5xx, off since it can repeat the write
         Returns:
             dict | list: Response data as python object
         """
@@ -177,23 +433,17 @@ class APIHandler:
                     params=params,
                     data=data,
                     session=session,
+                    retry=retry,
                 )
-        url = self.base_url + endpoint_url
-        async with session.put(
-                url=url,
-                headers=headers,
-                params=params,
-                json=data,
-        ) as response:
-            result = await self._check_response_status(response)
-            if result is None:
-                return await  self.put(
-                    endpoint_url=endpoint_url,
-                    headers=headers,
-                    params=params,
-                    session=session,
-                )
-            return result
+        return await self._request(
+            "PUT",
+            endpoint_url,
+            session,
+            retry=retry,
+            headers=headers,
+            params=params,
+            json=data,
+        )
 
     async def delete(
             self,
@@ -202,8 +452,9 @@ class APIHandler:
             params: dict | None = None,
             data: dict | None = None,
             session: aiohttp.ClientSession | None = None,
+            retry: bool = False,
     ) -> dict | list:
-        """Function to post data from api
+        """Function to delete data from api
 
         Args:
             endpoint_url (str): Endpoint url
@@ -211,6 +462,7 @@ class APIHandler:
             params (dict | None): Query parameters
             data (dict | None): Request data
             session (aiohttp.ClientSession | None): Session to use
+            retry (bool): Whether request is safe to retry on timeouts and 5xx, off since it can repeat the write
         Returns:
             dict | list: Response data as python object
         """
@@ -223,20 +475,14 @@ class APIHandler:
                     params=params,
                     data=data,
                     session=session,
+                    retry=retry,
                 )
-        url = self.base_url + endpoint_url
-        async with session.delete(
-                url=url,
-                headers=headers,
-                params=params,
-                data=data,
-        ) as response:
-            result = await self._check_response_status(response)
-            if result is None:
-                return await  self.delete(
-                    endpoint_url=endpoint_url,
-                    headers=headers,
-                    params=params,
-                    session=session,
-                )
-            return result
+        return await self._request(
+            "DELETE",
+            endpoint_url,
+            session,
+            retry=retry,
+            headers=headers,
+            params=params,
+            data=data,
+        )
@@ -0,0 +1,272 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from pathlib import Path
+
+import aiofiles
+from loguru import logger
+
+
+@dataclass
+class CacheEntry:
+    """Class for cached upstream response"""
+
+    data: dict | list
+    expires_at: float
+    etag: str | None = None
+    last_modified: str | None = None
+    size: int = 0
+
+    def is_fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    def get_validators(self) -> dict[str, str]:
+        """
+        Function returns conditional request headers for revalidation
+        Returns:
+            dict[str, str]: If-None-Match and If-Modified-Since headers
+        """
+
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """Class for two-tier (memory and disk) cache of idempotent GET responses"""
+
+    def __init__(
+            self,
+            ttl_rules: list[tuple[str, float]],
+            cache_path: Path | None = None,
+            max_memory_bytes: int = 64 * 1024 ** 2,
+            max_disk_bytes: int = 1024 ** 3,
+    ) -> None:
+        """
+        Initialisation function for response cache
+        Args:
+            ttl_rules (list[tuple[str, float]]): endpoint regex patterns with ttl in seconds, first match is used
+            cache_path (Path | None): directory for on-disk tier, can be shared by workers,
+            disk tier is disabled if not provided
+            max_memory_bytes (int): memory tier size limit
+            max_disk_bytes (int): disk tier size limit for whole directory
+        Returns:
+            None
+        """
+
+        self.ttl_rules = [(re.compile(pattern), ttl) for pattern, ttl in ttl_rules]
+        self.cache_path = cache_path
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_index: OrderedDict[str, int] = OrderedDict()
+        self._disk_bytes = 0
+        self.metrics = {"hits": 0, "misses": 0, "revalidated": 0, "evictions": 0}
+        if self.cache_path:
+            self.cache_path.mkdir(parents=True, exist_ok=True)
+            self._load_disk_index()
+
+    def _load_disk_index(self) -> None:
+        """
+        Function rebuilds disk tier index from cache directory ordered by last access time. Directory can be
+        shared by several workers, so it is the source of truth for entries and their sizes
+        Returns:
+            None
+        """
+
+        files = []
+        with os.scandir(self.cache_path) as entries:
+            for file in entries:
+                if not file.name.endswith(".json"):
+                    continue
+                try:
+                    stat = file.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, file.name[:-len(".json")], stat.st_size))
+        files.sort()
+        self._disk_index = OrderedDict((key, size) for _, key, size in files)
+        self._disk_bytes = sum(self._disk_index.values())
+
+    def _sync_disk_tier(self) -> int:
+        """
+        Function rebuilds disk tier index from directory and removes least recently used files over disk limit,
+        so the limit holds for all workers sharing directory and not for every worker's own view
+        Returns:
+            int: number of evicted entries
+        """
+
+        self._load_disk_index()
+        evicted = 0
+        while self._disk_bytes > self.max_disk_bytes and self._disk_index:
+            self._drop_disk_entry(next(iter(self._disk_index)))
+            evicted += 1
+        return evicted
+
+    def get_ttl(self, endpoint_url: str) -> float | None:
+        """
+        Function returns ttl for endpoint
+        Args:
+            endpoint_url (str): endpoint url without base url
+        Returns:
+            float | None: ttl in seconds, None if endpoint is not cacheable
+        """
+
+        for pattern, ttl in self.ttl_rules:
+            if pattern.fullmatch(endpoint_url):
+                return ttl
+        return None
+
+    @staticmethod
+    def make_key(url: str, params: dict | None) -> str:
+        """
+        Function builds cache key from url and query parameters
+        Args:
+            url (str): full request url
+            params (dict | None): query parameters
+        Returns:
+            str: cache key
+        """
+
+        normalized_params = sorted((str(k), str(v)) for k, v in (params or {}).items())
+        raw_key = json.dumps([url, normalized_params], ensure_ascii=False)
+        return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> CacheEntry | None:
+        """
+        Function returns cached entry from memory or disk tier, including stale one
+        Args:
+            key (str): cache key
+        Returns:
+            CacheEntry | None: cached entry
+        """
+
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return self._memory[key]
+        if not self.cache_path:
+            return None
+        # file is checked instead of index, entries are written and evicted by other workers too
+        try:
+            async with aiofiles.open(self.cache_path / f"{key}.json", "r", encoding="utf-8") as fin:
+                entry = CacheEntry(**json.loads(await fin.read()))
+            os.utime(self.cache_path / f"{key}.json")
+        except FileNotFoundError:
+            self._drop_disk_index(key)
+            return None
+        except Exception as e:
+            logger.warning(f"Failed to read cached response {key}: {e}")
+            self._drop_disk_entry(key)
+            return None
+        if key in self._disk_index:
+            self._disk_index.move_to_end(key)
+        self._put_to_memory(key, entry)
+        return entry
+
+    async def set(
+            self,
+            key: str,
+            data: dict | list,
+            ttl: float,
+            etag: str | None = None,
+            last_modified: str | None = None,
+    ) -> None:
+        """
+        Function saves response to both cache tiers
+        Args:
+            key (str): cache key
+            data (dict | list): response data
+            ttl (float): ttl in seconds
+            etag (str | None): ETag header of response
+            last_modified (str | None): Last-Modified header of response
+        Returns:
+            None
+        """
+
+        serialized = json.dumps(data, ensure_ascii=False)
+        entry = CacheEntry(
+            data=data,
+            expires_at=time.time() + ttl,
+            etag=etag,
+            last_modified=last_modified,
+            size=len(serialized.encode("utf-8")),
+        )
+        self._put_to_memory(key, entry)
+        await self._write_to_disk(key, entry)
+
+    async def refresh(self, key: str, entry: CacheEntry, ttl: float) -> None:
+        """
+        Function extends entry ttl after successful revalidation
+        Args:
+            key (str): cache key
+            entry (CacheEntry): revalidated entry
+            ttl (float): ttl in seconds
+        Returns:
+            None
+        """
+
+        self.metrics["revalidated"] += 1
+        entry.expires_at = time.time() + ttl
+        self._put_to_memory(key, entry)
+        await self._write_to_disk(key, entry)
+
+    def _put_to_memory(self, key: str, entry: CacheEntry) -> None:
+        if key in self._memory:
+            self._memory_bytes -= self._memory.pop(key).size
+        if entry.size > self.max_memory_bytes:
+            return
+        self._memory[key] = entry
+        self._memory_bytes += entry.size
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.size
+            self.metrics["evictions"] += 1
+
+    async def _write_to_disk(self, key: str, entry: CacheEntry) -> None:
+        if not self.cache_path or entry.size > self.max_disk_bytes:
+            return
+        try:
+            tmp_path = self.cache_path / f"{key}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+            async with aiofiles.open(tmp_path, "w", encoding="utf-8") as fout:
+                await fout.write(json.dumps(asdict(entry), ensure_ascii=False))
+            await asyncio.to_thread(os.replace, tmp_path, self.cache_path / f"{key}.json")
+        except Exception as e:
+            logger.warning(f"Failed to write cached response {key}: {e}")
+            return
+        self.metrics["evictions"] += await asyncio.to_thread(self._sync_disk_tier)
+
+    def _drop_disk_index(self, key: str) -> None:
+        if key in self._disk_index:
+            self._disk_bytes -= self._disk_index.pop(key)
+
+    def _drop_disk_entry(self, key: str) -> None:
+        self._drop_disk_index(key)
+        try:
+            os.remove(self.cache_path / f"{key}.json")
+        except FileNotFoundError:
+            pass
+
+    def get_metrics(self) -> dict:
+        """
+        Function returns cache counters and tier sizes
+        Returns:
+            dict: cache metrics
+        """
+
+        return {
+            **self.metrics,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "disk_entries": len(self._disk_index),
+            "disk_bytes": self._disk_bytes,
+        }
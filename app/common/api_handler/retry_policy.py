@@ -0,0 +1,149 @@
+import random
+import time
+from dataclasses import dataclass, field, asdict
+from typing import Literal
+
+
+@dataclass
+class RetryPolicy:
+    """Class for bounded retries with exponential backoff and full jitter"""
+
+    max_attempts: int = 5
+    base_delay: float = 0.5
+    max_delay: float = 10.0
+    retry_statuses: tuple[int, ...] = (502, 503, 504)
+    retry_methods: tuple[str, ...] = ("GET", "HEAD", "OPTIONS")
+
+    def get_attempts(self, method: str, retry: bool | None = None) -> int:
+        """
+        Function returns number of attempts for request. Only idempotent methods are retried by default,
+        since repeated writes after timeout or 5xx can duplicate records upstream
+        Args:
+            method (str): HTTP method
+            retry (bool | None): whether request can be retried, None to decide by method
+        Returns:
+            int: number of attempts
+        """
+
+        if retry is None:
+            retry = method.upper() in self.retry_methods
+        return self.max_attempts if retry else 1
+
+    def get_delay(self, attempt: int) -> float:
+        """
+        Function calculates delay before the next attempt
+        Args:
+            attempt (int): number of the failed attempt, starting from 1
+        Returns:
+            float: delay in seconds
+        """
+
+        backoff = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return random.uniform(0, backoff)
+
+
+class CircuitBreaker:
+    """Class for failing fast while upstream is unhealthy"""
+
+    def __init__(
+            self,
+            failure_threshold: int = 5,
+            recovery_timeout: float = 30.0,
+    ) -> None:
+        """
+        Initialisation function for circuit breaker
+        Args:
+            failure_threshold (int): consecutive failures to open the circuit
+            recovery_timeout (float): seconds to wait before a probe request is allowed
+        Returns:
+            None
+        """
+
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state: Literal["closed", "open", "half_open"] = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allow_request(self) -> bool:
+        """
+        Function checks whether request to upstream can be issued
+        Returns:
+            bool: False if circuit is open and request should fail fast
+        """
+
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.recovery_timeout:
+                return False
+            self.state = "half_open"
+        if self._probe_in_flight:
+            return False
+        self._probe_in_flight = True
+        return True
+
+    def retry_after(self) -> float:
+        """
+        Function returns seconds left until circuit allows a probe request
+        Returns:
+            float: seconds to wait
+        """
+
+        if self.state != "open":
+            return 0.0
+        return max(0.0, self.recovery_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self) -> None:
+        """
+        Function closes circuit after successful request
+        Returns:
+            None
+        """
+
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """
+        Function frees probe slot of request that ended without success or failure, e.g. was cancelled,
+        so circuit stays half open and the next request probes upstream
+        Returns:
+            None
+        """
+
+        self._probe_in_flight = False
+
+    def record_failure(self) -> bool:
+        """
+        Function registers failed request and opens circuit if threshold is reached
+        Returns:
+            bool: True if circuit was opened by this failure
+        """
+
+        self._probe_in_flight = False
+        self.consecutive_failures += 1
+        if self.state == "half_open" or (
+                self.state == "closed" and self.consecutive_failures >= self.failure_threshold
+        ):
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+
+@dataclass
+class UpstreamMetrics:
+    """Class for upstream request counters"""
+
+    requests: int = 0
+    retries: int = 0
+    failures: int = 0
+    short_circuited: int = 0
+    circuit_opened: int = 0
+    last_error: str | None = field(default=None)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
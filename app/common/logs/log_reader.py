@@ -0,0 +1,137 @@
+import asyncio
+import os
+import re
+from pathlib import Path
+from typing import AsyncIterator
+
+import aiofiles
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header: str, size: int) -> tuple[int, int]:
+    """
+    Function parses single byte range of Range header
+    Args:
+        header (str): Range header value, e.g. bytes=0-1023, bytes=1024- or bytes=-1024
+        size (int): file size
+    Returns:
+        tuple[int, int]: first and last byte positions, inclusive
+    Raises:
+        ValueError: if range is malformed, has several ranges or can't be satisfied
+    """
+
+    match = RANGE_PATTERN.match(header.strip())
+    if match is None or match.groups() == ("", ""):
+        raise ValueError(f"Unsupported range {header}")
+    start, end = match.groups()
+    if start == "":
+        start, end = max(0, size - int(end)), size - 1
+    else:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError(f"Range {header} is not satisfiable for size {size}")
+    return start, end
+
+
+async def read_range(path: Path, start: int, end: int, chunk_size: int = 1024 ** 2) -> AsyncIterator[bytes]:
+    """
+    Function streams byte range of file without blocking event loop
+    Args:
+        path (Path): file path
+        start (int): first byte position
+        end (int): last byte position, inclusive
+        chunk_size (int): read chunk size
+    Returns:
+        AsyncIterator[bytes]: file chunks
+    """
+
+    remaining = end - start + 1
+    async with aiofiles.open(path, "rb") as fin:
+        await fin.seek(start)
+        while remaining > 0:
+            chunk = await fin.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def read_tail(path: Path, lines: int, end: int | None = None, chunk_size: int = 64 * 1024) -> bytes:
+    """
+    Function reads last lines of file reading it backwards, so only the tail is read
+    Args:
+        path (Path): file path
+        lines (int): number of lines
+        end (int | None): position tail ends at, end of file if not provided
+        chunk_size (int): read chunk size
+    Returns:
+        bytes: last lines
+    """
+
+    with open(path, "rb") as fin:
+        position = fin.seek(0, os.SEEK_END) if end is None else end
+        end = position
+        data = b""
+        while position > 0 and data.count(b"\n", 0, len(data) - 1 if data.endswith(b"\n") else len(data)) < lines:
+            step = min(chunk_size, position)
+            position -= step
+            fin.seek(position)
+            data = fin.read(step) + data
+    tail = data.splitlines(keepends=True)[-lines:]
+    return b"".join(tail) if end else b""
+
+
+async def follow(
+        path: Path,
+        tail_lines: int = 0,
+        poll_interval: float = 0.5,
+        keep_alive_interval: float = 15,
+        chunk_size: int = 64 * 1024,
+) -> AsyncIterator[str]:
+    """
+    Function yields new lines appended to file as server-sent events, reopening file after rotation
+    Args:
+        path (Path): file path
+        tail_lines (int): number of existing last lines sent first
+        poll_interval (float): seconds between checks for new lines
+        keep_alive_interval (float): seconds without new lines after which comment event is sent
+        chunk_size (int): read chunk size
+    Returns:
+        AsyncIterator[str]: server-sent events, one per line
+    """
+
+    position = (await asyncio.to_thread(os.stat, path)).st_size
+    if tail_lines:
+        tail = await asyncio.to_thread(read_tail, path, tail_lines, position)
+        for line in tail.decode(errors="replace").splitlines():
+            yield f"data: {line}\n\n"
+    inode = None
+    buffer = b""
+    idle = 0.0
+    while True:
+        try:
+            stat = await asyncio.to_thread(os.stat, path)
+        except FileNotFoundError:
+            await asyncio.sleep(poll_interval)
+            idle += poll_interval
+            continue
+        if inode is not None and (stat.st_ino != inode or stat.st_size < position):
+            position, buffer = 0, b""
+        inode = stat.st_ino
+        if stat.st_size > position:
+            async with aiofiles.open(path, "rb") as fin:
+                await fin.seek(position)
+                while chunk := await fin.read(chunk_size):
+                    position += len(chunk)
+                    buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                yield f"data: {line.decode(errors='replace')}\n\n"
+            idle = 0.0
+            continue
+        if idle >= keep_alive_interval:
+            yield ": keep-alive\n\n"
+            idle = 0.0
+        await asyncio.sleep(poll_interval)
+        idle += poll_interval
@@ -0,0 +1,190 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from loguru import logger
+
+from .prometheus_metrics import LOOP_BLOCKED_SECONDS, LOOP_BLOCKING_CALLS, LOOP_LAG_SECONDS
+
+APP_ROOT = Path(__file__).resolve().parents[2]
+OTHER_SITE = "other"
+
+
+@dataclass
+class BlockingSite:
+    """Class for statistics of call site blocking event loop"""
+
+    site: str
+    count: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    last_seen: float | None = None
+    last_stack: list[str] = field(default_factory=list)
+
+
+@dataclass
+class Stall:
+    """Class for event loop stall captured by monitor thread"""
+
+    site: str
+    stack: list[str]
+    detected_at: float
+
+
+class LoopWatchdog:
+    """
+    Event loop watchdog. Ticker coroutine measures loop lag, monitor thread captures stack of loop thread
+    when ticker misses its beat by more than threshold and attributes stall to the innermost app frame
+    """
+
+    def __init__(
+            self,
+            interval: float = 0.1,
+            threshold: float = 0.25,
+            max_sites: int = 100,
+            stack_limit: int = 40,
+            app_root: Path = APP_ROOT,
+    ) -> None:
+        """
+        Initialisation function for loop watchdog
+        Args:
+            interval (float): ticker interval in seconds
+            threshold (float): lag in seconds stalls are captured above
+            max_sites (int): number of tracked call sites, further sites are counted as other
+            stack_limit (int): number of innermost frames kept in captured stack
+            app_root (Path): frames from files under this path are preferred as call site
+        Returns:
+            None
+        """
+
+        self.interval = interval
+        self.threshold = threshold
+        self.max_sites = max_sites
+        self.stack_limit = stack_limit
+        self.app_root = str(app_root)
+        self.sites: dict[str, BlockingSite] = {}
+        self.stalls = 0
+        self.max_lag = 0.0
+        self._lock = threading.Lock()
+        self._beat = time.monotonic()
+        self._stall: Stall | None = None
+        self._loop_thread_id: int | None = None
+        self._task: asyncio.Task | None = None
+        self._thread: threading.Thread | None = None
+        self._stop_event = threading.Event()
+
+    def _get_site(self, stack: traceback.StackSummary) -> str:
+        frames = [i for i in stack if i.filename.startswith(self.app_root) and i.filename != __file__] or list(stack)
+        frame = frames[-1]
+        filename = Path(frame.filename)
+        if frame.filename.startswith(self.app_root):
+            filename = filename.relative_to(Path(self.app_root).parent)
+        return f"{filename}:{frame.lineno} {frame.name}"
+
+    def capture_stall(self) -> Stall | None:
+        """
+        Function captures stack of event loop thread
+        Returns:
+            Stall | None: captured stall or None if loop thread isn't running
+        """
+
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None
+        stack = traceback.extract_stack(frame, limit=self.stack_limit)
+        return Stall(site=self._get_site(stack), stack=stack.format(), detected_at=time.time())
+
+    def _record(self, stall: Stall, lag: float) -> None:
+        key = stall.site if stall.site in self.sites or len(self.sites) < self.max_sites else OTHER_SITE
+        site = self.sites.setdefault(key, BlockingSite(site=key))
+        site.count += 1
+        site.total_seconds += lag
+        site.max_seconds = max(site.max_seconds, lag)
+        site.last_seen = stall.detected_at
+        site.last_stack = stall.stack
+        self.stalls += 1
+        LOOP_BLOCKING_CALLS.labels(key).inc()
+        LOOP_BLOCKED_SECONDS.labels(key).inc(lag)
+        logger.warning(f"Event loop blocked for {lag:.3f}s at {stall.site}\n{''.join(stall.stack)}")
+
+    async def _tick(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+            LOOP_LAG_SECONDS.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+            with self._lock:
+                self._beat = time.monotonic()
+                stall, self._stall = self._stall, None
+            if stall is not None:
+                self._record(stall, lag)
+
+    def _monitor(self) -> None:
+        while not self._stop_event.wait(self.interval / 2):
+            with self._lock:
+                if self._stall is not None or time.monotonic() - self._beat < self.interval + self.threshold:
+                    continue
+            stall = self.capture_stall()
+            with self._lock:
+                if self._stall is None and time.monotonic() - self._beat >= self.interval + self.threshold:
+                    self._stall = stall
+
+    def start(self) -> None:
+        """
+        Function starts watchdog for running event loop
+        Returns:
+            None
+        """
+
+        if self._task is not None and not self._task.done():
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop_event.clear()
+        self._task = asyncio.create_task(self._tick())
+        self._thread = threading.Thread(target=self._monitor, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self) -> None:
+        """
+        Function stops watchdog
+        Returns:
+            None
+        """
+
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_report(self) -> dict:
+        """
+        Function returns stalls statistics with call sites sorted by total blocked time
+        Returns:
+            dict: watchdog report
+        """
+
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "interval": self.interval,
+            "threshold": self.threshold,
+            "stalls": self.stalls,
+            "max_lag": self.max_lag,
+            "sites": [
+                site.__dict__.copy()
+                for site in sorted(self.sites.values(), key=lambda i: i.total_seconds, reverse=True)
+            ],
+        }
@@ -0,0 +1,124 @@
+import time
+from contextlib import contextmanager
+from typing import Iterable
+
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+from app.common.api_handler.api_handler import APIHandler
+from app.common.storage.models.resident_models import ResidentModelCache
+
+MODEL_STAGE_SECONDS = Histogram(
+    "popframe_model_stage_seconds",
+    "Duration of popframe model calculation stages",
+    ["stage", "region_id", "outcome"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800),
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "popframe_http_request_seconds",
+    "Duration of http requests by router and route",
+    ["router", "method", "route", "status"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+LOOP_LAG_SECONDS = Histogram(
+    "popframe_event_loop_lag_seconds",
+    "Event loop lag measured as watchdog ticker oversleep",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+LOOP_BLOCKING_CALLS = Counter(
+    "popframe_event_loop_blocking_calls",
+    "Event loop stalls over watchdog threshold by blocking call site",
+    ["site"],
+)
+LOOP_BLOCKED_SECONDS = Counter(
+    "popframe_event_loop_blocked_seconds",
+    "Event loop lag of stalls over watchdog threshold by blocking call site",
+    ["site"],
+)
+
+
+@contextmanager
+def stage_timer(stage: str, region_id: int):
+    """
+    Function times model calculation stage, outcome label is error if stage raises
+    Args:
+        stage (str): stage name
+        region_id (int): region id
+    Returns:
+        Iterator[None]: context manager
+    """
+
+    start = time.perf_counter()
+    outcome = "success"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        MODEL_STAGE_SECONDS.labels(stage, str(region_id), outcome).observe(time.perf_counter() - start)
+
+
+class UpstreamMetricsCollector(Collector):
+    """Collector exporting APIHandler request, retry and circuit breaker counters"""
+
+    COUNTERS = ("requests", "retries", "failures", "short_circuited", "circuit_opened")
+    CACHE_COUNTERS = ("hits", "misses", "revalidated", "evictions")
+
+    def __init__(self, handlers: Iterable[APIHandler]) -> None:
+        self.handlers = list(handlers)
+
+    def collect(self):
+        counters = {
+            name: CounterMetricFamily(f"popframe_upstream_{name}", f"Upstream {name.replace('_', ' ')}", labels=["upstream"])
+            for name in self.COUNTERS
+        }
+        cache_counters = {
+            name: CounterMetricFamily(
+                f"popframe_upstream_cache_{name}", f"Upstream response cache {name}", labels=["upstream"]
+            )
+            for name in self.CACHE_COUNTERS
+        }
+        circuit_open = GaugeMetricFamily("popframe_upstream_circuit_open", "Whether upstream circuit is open", labels=["upstream"])
+        for handler in self.handlers:
+            metrics = handler.get_metrics()
+            for name, family in counters.items():
+                family.add_metric([handler.name], metrics[name])
+            for name, family in cache_counters.items():
+                if "response_cache" in metrics:
+                    family.add_metric([handler.name], metrics["response_cache"][name])
+            circuit_open.add_metric([handler.name], float(metrics["circuit_state"] == "open"))
+        yield from counters.values()
+        yield from cache_counters.values()
+        yield circuit_open
+
+
+class ResidentModelsMetricsCollector(Collector):
+    """Collector exporting resident models cache counters and memory by region and model part"""
+
+    COUNTERS = ("hits", "misses", "evictions", "stale", "derived_hits", "derived_misses", "derived_evictions")
+
+    def __init__(self, cache: ResidentModelCache) -> None:
+        self.cache = cache
+
+    def collect(self):
+        report = self.cache.get_report()
+        for name in self.COUNTERS:
+            family = CounterMetricFamily(f"popframe_model_cache_{name}", f"Resident models cache {name.replace('_', ' ')}")
+            family.add_metric([], report[name])
+            yield family
+        models = GaugeMetricFamily("popframe_model_cache_models", "Number of resident models")
+        models.add_metric([], len(report["models"]))
+        yield models
+        memory = GaugeMetricFamily(
+            "popframe_model_cache_bytes",
+            "Estimated memory of resident models by region and part",
+            labels=["region_id", "kind", "part"],
+        )
+        for region_id, entry in report["models"].items():
+            for part, size in entry["parts"].items():
+                memory.add_metric([str(region_id), "model", part], size)
+            for key, size in entry["derived"].items():
+                memory.add_metric([str(region_id), "derived", key], size)
+        yield memory
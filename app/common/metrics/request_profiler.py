@@ -0,0 +1,180 @@
+import hmac
+import heapq
+import itertools
+import re
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from urllib.parse import parse_qs
+
+from loguru import logger
+from pyinstrument import Profiler
+from pyinstrument.renderers import HTMLRenderer, SpeedscopeRenderer
+from pyinstrument.session import Session
+
+PROFILE_HEADER = "x-profile"
+PROFILE_TOKEN_HEADER = "x-profile-token"
+PROFILE_ID_HEADER = "x-profile-id"
+
+
+@dataclass
+class RequestProfile:
+    """Class for stored request profile"""
+
+    profile_id: str
+    method: str
+    path: str
+    query: str
+    status: int
+    duration: float
+    started_at: float
+    session: Session = field(repr=False)
+
+    def to_dict(self) -> dict:
+        return {
+            "profile_id": self.profile_id,
+            "method": self.method,
+            "path": self.path,
+            "query": self.query,
+            "status": self.status,
+            "duration": self.duration,
+            "started_at": self.started_at,
+        }
+
+    def render(self, profile_format: str = "speedscope") -> str:
+        """
+        Function renders profile
+        Args:
+            profile_format (str): speedscope for flamegraph json, html for pyinstrument report
+        Returns:
+            str: rendered profile
+        """
+
+        renderer = HTMLRenderer() if profile_format == "html" else SpeedscopeRenderer()
+        return renderer.render(self.session)
+
+
+class RequestProfileStore:
+    """Class for bounded store of recently requested and the slowest request profiles"""
+
+    def __init__(self, size: int = 20) -> None:
+        self.size = size
+        self.recent: deque[RequestProfile] = deque(maxlen=size)
+        self._slowest: list[tuple[float, int, RequestProfile]] = []
+        self._counter = itertools.count()
+
+    def add(self, profile: RequestProfile, requested: bool) -> None:
+        """
+        Function stores profile, explicitly requested profiles are always kept in recent ones
+        Args:
+            profile (RequestProfile): request profile
+            requested (bool): whether profile was requested by caller
+        Returns:
+            None
+        """
+
+        if requested:
+            self.recent.append(profile)
+        item = (profile.duration, next(self._counter), profile)
+        if len(self._slowest) < self.size:
+            heapq.heappush(self._slowest, item)
+        elif profile.duration > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, item)
+
+    @property
+    def slowest(self) -> list[RequestProfile]:
+        return [item[2] for item in sorted(self._slowest, reverse=True)]
+
+    def get(self, profile_id: str) -> RequestProfile | None:
+        for profile in itertools.chain(self.recent, self.slowest):
+            if profile.profile_id == profile_id:
+                return profile
+        return None
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware running requests under sampling profiler.
+    Requests are profiled when caller passes X-Profile header or profile query flag with valid token,
+    or for every request if sample_all is set, keeping only the slowest ones
+    """
+
+    def __init__(
+            self,
+            app,
+            token: str | None,
+            store: RequestProfileStore,
+            interval: float = 0.001,
+            sample_all: bool = False,
+            sample_all_interval: float = 0.01,
+    ) -> None:
+        """
+        Initialisation function for profiling middleware
+        Args:
+            app: asgi application
+            token (str | None): token authorizing profiling, profiling on demand is disabled if not set
+            store (RequestProfileStore): profiles store
+            interval (float): sampling interval for requested profiles in seconds
+            sample_all (bool): whether every request is profiled for the slowest profiles store
+            sample_all_interval (float): sampling interval for not requested profiles in seconds
+        Returns:
+            None
+        """
+
+        self.app = app
+        self.token = token
+        self.store = store
+        self.interval = interval
+        self.sample_all = sample_all
+        self.sample_all_interval = sample_all_interval
+
+    def is_authorized(self, token: str | None) -> bool:
+        return bool(self.token) and token is not None and hmac.compare_digest(token, self.token)
+
+    def is_requested(self, scope) -> bool:
+        headers = {key.decode("latin1"): value.decode("latin1") for key, value in scope["headers"]}
+        query = parse_qs(scope.get("query_string", b"").decode("latin1"))
+        flag = headers.get(PROFILE_HEADER) or query.get("profile", [None])[0]
+        token = headers.get(PROFILE_TOKEN_HEADER) or query.get("profile_token", [None])[0]
+        return flag in ("1", "true") and self.is_authorized(token)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        requested = self.is_requested(scope)
+        if not requested and not self.sample_all:
+            return await self.app(scope, receive, send)
+
+        profile_id = uuid.uuid4().hex
+        status = 500
+
+        async def send_with_profile_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if requested:
+                    message.setdefault("headers", [])
+                    message["headers"] = [*message["headers"], (PROFILE_ID_HEADER.encode(), profile_id.encode())]
+            await send(message)
+
+        profiler = Profiler(interval=self.interval if requested else self.sample_all_interval, async_mode="enabled")
+        started_at = time.time()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            session = profiler.stop()
+            profile = RequestProfile(
+                profile_id=profile_id,
+                method=scope["method"],
+                path=scope["path"],
+                query=re.sub(r"profile_token=[^&]*", "profile_token=***", scope.get("query_string", b"").decode("latin1")),
+                status=status,
+                duration=session.duration,
+                started_at=started_at,
+                session=session,
+            )
+            self.store.add(profile, requested)
+            if requested:
+                logger.info(f"Profiled {profile.method} {profile.path} in {profile.duration:.3f}s, id {profile_id}")
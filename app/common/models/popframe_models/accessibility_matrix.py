@@ -0,0 +1,489 @@
+from pathlib import Path
+from typing import Iterable, Literal
+
+import numpy as np
+import pandas as pd
+
+UNREACHABLE_UINT16 = np.iinfo(np.uint16).max
+MATERIALIZE_BLOCK_ROWS = 1024
+
+
+class CompactAccessibilityMatrix:
+    """Class for compact accessibility matrix with position indexing and zero-copy sub-selections"""
+
+    def __init__(
+            self,
+            data: np.ndarray,
+            labels: Iterable,
+            resolution: float | None = None,
+            rows: np.ndarray | None = None,
+    ) -> None:
+        """
+        Initialisation function for compact matrix
+        Args:
+            data (np.ndarray): square float32 matrix in minutes or uint16 matrix quantized with resolution
+            labels (Iterable): towns ids for data rows and columns
+            resolution (float | None): minutes per uint16 step, None for float32 data
+            rows (np.ndarray | None): positions of selected towns in data, None if all towns are selected
+        Returns:
+            None
+        """
+
+        self.data = data
+        self.resolution = resolution
+        self._base_labels = pd.Index(labels)
+        self._rows = rows
+        self.labels = self._base_labels if rows is None else self._base_labels[rows]
+
+    @classmethod
+    def from_frame(
+            cls,
+            adj_mx: pd.DataFrame,
+            dtype: Literal["float32", "uint16"] = "float32",
+            resolution: float = 0.1,
+    ) -> "CompactAccessibilityMatrix":
+        """
+        Function builds compact matrix from dense DataFrame
+        Args:
+            adj_mx (pd.DataFrame): square matrix with travel time in minutes, NaN or inf for unreachable pairs
+            dtype (Literal["float32", "uint16"]): storage dtype
+            resolution (float): minutes per step for uint16 quantization
+        Returns:
+            CompactAccessibilityMatrix: compact matrix
+        """
+
+        values = adj_mx.to_numpy()
+        if dtype == "float32":
+            data = values.astype(np.float32, copy=False)
+            if np.isnan(data).any():
+                data = np.where(np.isnan(data), np.float32(np.inf), data)
+            return cls(data, adj_mx.index)
+        unreachable = ~np.isfinite(values)
+        data = np.rint(np.clip(np.nan_to_num(values, posinf=0), 0, None) / resolution)
+        data = np.clip(data, 0, UNREACHABLE_UINT16 - 1).astype(np.uint16)
+        data[unreachable] = UNREACHABLE_UINT16
+        return cls(data, adj_mx.index, resolution=resolution)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return len(self.labels), len(self.labels)
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes
+
+    def positions(self, labels: Iterable) -> np.ndarray:
+        """
+        Function converts towns ids to positions in current selection
+        Args:
+            labels (Iterable): towns ids
+        Returns:
+            np.ndarray: positions
+        Raises:
+            KeyError, if some towns are not present in matrix
+        """
+
+        positions = self.labels.get_indexer(pd.Index(labels))
+        if (positions < 0).any():
+            missing = pd.Index(labels)[positions < 0].to_list()
+            raise KeyError(f"Towns are not present in accessibility matrix: {missing[:10]}")
+        return positions
+
+    def _base_positions(self, positions: np.ndarray) -> np.ndarray:
+        return positions if self._rows is None else self._rows[positions]
+
+    def select(self, labels: Iterable) -> "CompactAccessibilityMatrix":
+        """
+        Function selects sub-matrix for towns without copying matrix data
+        Args:
+            labels (Iterable): towns ids in required order
+        Returns:
+            CompactAccessibilityMatrix: view sharing data with current matrix
+        """
+
+        rows = self._base_positions(self.positions(labels))
+        if len(rows) == len(self._base_labels) and (rows == np.arange(len(rows))).all():
+            rows = None
+        return CompactAccessibilityMatrix(self.data, self._base_labels, self.resolution, rows)
+
+    def decode(self, values: np.ndarray) -> np.ndarray:
+        """
+        Function decodes stored values to float32 minutes
+        Args:
+            values (np.ndarray): stored values
+        Returns:
+            np.ndarray: travel time in minutes, inf for unreachable pairs
+        """
+
+        if self.resolution is None:
+            return values.astype(np.float32, copy=False)
+        decoded = values.astype(np.float32) * np.float32(self.resolution)
+        decoded[values == UNREACHABLE_UINT16] = np.inf
+        return decoded
+
+    def take(self, row_positions: np.ndarray, col_positions: np.ndarray) -> np.ndarray:
+        """
+        Function returns decoded block of matrix by positions in current selection
+        Args:
+            row_positions (np.ndarray): row positions
+            col_positions (np.ndarray): column positions
+        Returns:
+            np.ndarray: travel time in minutes
+        """
+
+        rows = self._base_positions(np.asarray(row_positions))
+        cols = self._base_positions(np.asarray(col_positions))
+        return self.decode(self.data[np.ix_(rows, cols)])
+
+    def get(self, town_from, town_to) -> float:
+        """
+        Function returns travel time between two towns
+        Args:
+            town_from: origin town id
+            town_to: destination town id
+        Returns:
+            float: travel time in minutes
+        """
+
+        rows = self._base_positions(self.positions([town_from, town_to]))
+        return float(self.decode(self.data[rows[:1], rows[1:]])[0])
+
+    def materialize(self, unreachable: float = np.inf) -> np.ndarray:
+        """
+        Function materializes current selection as new float32 array. Rows are decoded in blocks into the
+        result, so only the result and one block of temporary arrays are held
+        Args:
+            unreachable (float): value for unreachable pairs
+        Returns:
+            np.ndarray: travel time in minutes
+        """
+
+        size = len(self.labels)
+        rows = np.arange(size) if self._rows is None else self._rows
+        result = np.empty((size, size), dtype=np.float32)
+        for start in range(0, size, MATERIALIZE_BLOCK_ROWS):
+            block_rows = rows[start:start + MATERIALIZE_BLOCK_ROWS]
+            if self._rows is None:
+                block = self.data[start:start + MATERIALIZE_BLOCK_ROWS]
+            else:
+                block = self.data[np.ix_(block_rows, rows)]
+            target = result[start:start + len(block_rows)]
+            target[...] = self.decode(block)
+            target[np.isinf(target)] = unreachable
+        return result
+
+    def to_numpy(self) -> np.ndarray:
+        """
+        Function materializes current selection as float32 array
+        Returns:
+            np.ndarray: travel time in minutes, inf for unreachable pairs
+        """
+
+        return self.materialize()
+
+    def to_frame(self, unreachable: float = np.nan) -> pd.DataFrame:
+        """
+        Function materializes current selection as float32 DataFrame for PopFrame Region. Region keeps the
+        dense frame, so resident matrix takes 4 bytes per pair, half of float64 frame parsed from JSON.
+        uint16 storage reduces only disk and transfer size
+        Args:
+            unreachable (float): value for unreachable pairs, NaN as in TransportFrame matrix popframe is built on
+        Returns:
+            pd.DataFrame: travel time in minutes with towns ids as index and columns, owning materialized array
+        """
+
+        return pd.DataFrame(self.materialize(unreachable), index=self.labels, columns=self.labels, copy=False)
+
+    def save(self, path: Path) -> None:
+        """
+        Function saves materialized current selection to .npz file
+        Args:
+            path (Path): file path
+        Returns:
+            None
+        """
+
+        data = self.data if self._rows is None else self.data[np.ix_(self._rows, self._rows)]
+        np.savez(
+            path,
+            data=data,
+            labels=self.labels.to_numpy(),
+            resolution=np.nan if self.resolution is None else self.resolution,
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "CompactAccessibilityMatrix":
+        """
+        Function loads compact matrix from .npz file
+        Args:
+            path (Path): file path
+        Returns:
+            CompactAccessibilityMatrix: loaded matrix
+        """
+
+        with np.load(path, allow_pickle=False) as npz:
+            resolution = float(npz["resolution"])
+            return cls(
+                npz["data"],
+                npz["labels"],
+                resolution=None if np.isnan(resolution) else resolution,
+            )
+
+
+class SparseAccessibilityMatrix:
+    """Class for CSR accessibility matrix keeping only pairs within maximum travel time"""
+
+    def __init__(
+            self,
+            indptr: np.ndarray,
+            indices: np.ndarray,
+            data: np.ndarray,
+            labels: Iterable,
+            max_travel_time: float,
+    ) -> None:
+        """
+        Initialisation function for sparse matrix
+        Args:
+            indptr (np.ndarray): CSR row pointers
+            indices (np.ndarray): CSR column positions
+            data (np.ndarray): CSR float32 travel time in minutes
+            labels (Iterable): towns ids for rows and columns
+            max_travel_time (float): cutoff in minutes, pairs above it are unreachable
+        Returns:
+            None
+        """
+
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.labels = pd.Index(labels)
+        self.max_travel_time = max_travel_time
+
+    @staticmethod
+    def threshold_block(
+            block: np.ndarray,
+            max_travel_time: float,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Function keeps pairs within cutoff from dense row block
+        Args:
+            block (np.ndarray): row block of square matrix in minutes
+            max_travel_time (float): cutoff in minutes
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray]: pairs count per row, column positions and travel time
+        """
+
+        rows, cols = np.nonzero(block <= max_travel_time)
+        return (
+            np.bincount(rows, minlength=block.shape[0]),
+            cols.astype(np.int32),
+            block[rows, cols].astype(np.float32),
+        )
+
+    @classmethod
+    def from_parts(
+            cls,
+            parts: list[tuple[np.ndarray, np.ndarray, np.ndarray]],
+            labels: Iterable,
+            max_travel_time: float,
+    ) -> "SparseAccessibilityMatrix":
+        """
+        Function builds sparse matrix from thresholded consecutive row blocks
+        Args:
+            parts (list[tuple[np.ndarray, np.ndarray, np.ndarray]]): results of threshold_block in row order
+            labels (Iterable): towns ids for rows and columns
+            max_travel_time (float): cutoff in minutes
+        Returns:
+            SparseAccessibilityMatrix: sparse matrix
+        """
+
+        counts = np.concatenate([i[0] for i in parts]) if parts else np.zeros(0, dtype=np.int64)
+        return cls(
+            np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+            np.concatenate([i[1] for i in parts]) if parts else np.zeros(0, dtype=np.int32),
+            np.concatenate([i[2] for i in parts]) if parts else np.zeros(0, dtype=np.float32),
+            labels,
+            max_travel_time,
+        )
+
+    @classmethod
+    def from_frame(cls, adj_mx: pd.DataFrame, max_travel_time: float) -> "SparseAccessibilityMatrix":
+        """
+        Function builds sparse matrix from dense DataFrame
+        Args:
+            adj_mx (pd.DataFrame): square matrix with travel time in minutes
+            max_travel_time (float): cutoff in minutes
+        Returns:
+            SparseAccessibilityMatrix: sparse matrix
+        """
+
+        return cls.from_parts(
+            [cls.threshold_block(adj_mx.to_numpy(), max_travel_time)],
+            adj_mx.index,
+            max_travel_time,
+        )
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return len(self.labels), len(self.labels)
+
+    @property
+    def nbytes(self) -> int:
+        return self.indptr.nbytes + self.indices.nbytes + self.data.nbytes
+
+    def positions(self, labels: Iterable) -> np.ndarray:
+        """
+        Function converts towns ids to positions
+        Args:
+            labels (Iterable): towns ids
+        Returns:
+            np.ndarray: positions
+        Raises:
+            KeyError, if some towns are not present in matrix
+        """
+
+        positions = self.labels.get_indexer(pd.Index(labels))
+        if (positions < 0).any():
+            missing = pd.Index(labels)[positions < 0].to_list()
+            raise KeyError(f"Towns are not present in accessibility matrix: {missing[:10]}")
+        return positions
+
+    def _gather_rows(self, row_positions: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Function returns row number in selection and flat CSR offsets of all stored pairs of rows
+        Args:
+            row_positions (np.ndarray): row positions
+        Returns:
+            tuple[np.ndarray, np.ndarray]: selection row numbers and offsets in indices and data
+        """
+
+        starts = self.indptr[row_positions]
+        lengths = self.indptr[row_positions + 1] - starts
+        selection_rows = np.repeat(np.arange(len(row_positions)), lengths)
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return selection_rows, offsets + np.repeat(starts, lengths)
+
+    def select(self, labels: Iterable) -> "SparseAccessibilityMatrix":
+        """
+        Function selects sub-matrix for towns
+        Args:
+            labels (Iterable): towns ids in required order
+        Returns:
+            SparseAccessibilityMatrix: selected sub-matrix
+        """
+
+        positions = self.positions(labels)
+        remap = np.full(len(self.labels), -1, dtype=np.int64)
+        remap[positions] = np.arange(len(positions))
+        selection_rows, offsets = self._gather_rows(positions)
+        cols = remap[self.indices[offsets]]
+        keep = cols >= 0
+        counts = np.bincount(selection_rows[keep], minlength=len(positions))
+        return SparseAccessibilityMatrix(
+            np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+            cols[keep].astype(np.int32),
+            self.data[offsets][keep],
+            self.labels[positions],
+            self.max_travel_time,
+        )
+
+    def take(self, row_positions: np.ndarray, col_positions: np.ndarray) -> np.ndarray:
+        """
+        Function returns dense block of matrix by positions
+        Args:
+            row_positions (np.ndarray): row positions
+            col_positions (np.ndarray): column positions
+        Returns:
+            np.ndarray: travel time in minutes, inf for pairs above cutoff
+        """
+
+        row_positions = np.asarray(row_positions)
+        col_positions = np.asarray(col_positions)
+        result = np.full((len(row_positions), len(col_positions)), np.inf, dtype=np.float32)
+        remap = np.full(len(self.labels), -1, dtype=np.int64)
+        remap[col_positions] = np.arange(len(col_positions))
+        selection_rows, offsets = self._gather_rows(row_positions)
+        cols = remap[self.indices[offsets]]
+        keep = cols >= 0
+        result[selection_rows[keep], cols[keep]] = self.data[offsets][keep]
+        return result
+
+    def get(self, town_from, town_to) -> float:
+        """
+        Function returns travel time between two towns
+        Args:
+            town_from: origin town id
+            town_to: destination town id
+        Returns:
+            float: travel time in minutes, inf if above cutoff
+        """
+
+        positions = self.positions([town_from, town_to])
+        return float(self.take(positions[:1], positions[1:])[0, 0])
+
+    def materialize(self, unreachable: float = np.inf) -> np.ndarray:
+        """
+        Function materializes dense float32 array filled with unreachable value and stored pairs
+        Args:
+            unreachable (float): value for pairs above cutoff
+        Returns:
+            np.ndarray: travel time in minutes
+        """
+
+        result = np.full(self.shape, unreachable, dtype=np.float32)
+        rows = np.repeat(np.arange(len(self.labels)), np.diff(self.indptr))
+        result[rows, self.indices] = self.data
+        return result
+
+    def to_numpy(self) -> np.ndarray:
+        return self.materialize()
+
+    def to_frame(self, unreachable: float = np.nan) -> pd.DataFrame:
+        """
+        Function materializes dense float32 DataFrame for PopFrame Region. Region keeps the dense frame,
+        so resident memory is the same as in compact float32 mode, sparse storage reduces matrix parsing peak,
+        disk and transfer size only
+        Args:
+            unreachable (float): value for pairs above cutoff, NaN as in TransportFrame matrix popframe is built on
+        Returns:
+            pd.DataFrame: travel time in minutes
+        """
+
+        return pd.DataFrame(self.materialize(unreachable), index=self.labels, columns=self.labels, copy=False)
+
+    def save(self, path: Path) -> None:
+        np.savez(
+            path,
+            indptr=self.indptr,
+            indices=self.indices,
+            data=self.data,
+            labels=self.labels.to_numpy(),
+            max_travel_time=self.max_travel_time,
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "SparseAccessibilityMatrix":
+        with np.load(path, allow_pickle=False) as npz:
+            return cls(
+                npz["indptr"],
+                npz["indices"],
+                npz["data"],
+                npz["labels"],
+                float(npz["max_travel_time"]),
+            )
+
+
+def load_accessibility_matrix(path: Path) -> CompactAccessibilityMatrix | SparseAccessibilityMatrix:
+    """
+    Function loads compact or sparse accessibility matrix from .npz file
+    Args:
+        path (Path): file path
+    Returns:
+        CompactAccessibilityMatrix | SparseAccessibilityMatrix: loaded matrix
+    """
+
+    with np.load(path, allow_pickle=False) as npz:
+        is_sparse = "indptr" in npz.files
+    if is_sparse:
+        return SparseAccessibilityMatrix.load(path)
+    return CompactAccessibilityMatrix.load(path)
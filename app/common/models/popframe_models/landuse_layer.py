@@ -0,0 +1,136 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+
+import geopandas as gpd
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import shapely
+from shapely.geometry.base import BaseGeometry
+
+
+class LanduseLayer:
+    """
+    Class for region-wide OSM landuse features fetched once per model version. Features are indexed with STR tree,
+    so features of project territory are selected with index query instead of Overpass requests for every project
+    """
+
+    def __init__(
+            self,
+            features: gpd.GeoDataFrame,
+            coverage: BaseGeometry,
+            tag_filters: list[dict],
+            version: tuple | None = None,
+    ) -> None:
+        """
+        Initialisation function for landuse layer
+        Args:
+            features (gpd.GeoDataFrame): features in 4326 with tag_filter column
+            coverage (BaseGeometry): territory features were fetched for in 4326
+            tag_filters (list[dict]): OSM tag filters features were fetched with
+            version (tuple | None): version of model layer is built for
+        Returns:
+            None
+        """
+
+        self.features = features
+        self.coverage = coverage
+        self.tag_filters = [dict(i) for i in tag_filters]
+        self.version = None if version is None else tuple(int(i) for i in version)
+        # index is built eagerly, queries come from popframe worker threads
+        self.sindex = features.sindex
+
+    @staticmethod
+    def get_filter_id(tags: dict) -> str:
+        return json.dumps(sorted((str(k), str(v)) for k, v in tags.items()), ensure_ascii=False)
+
+    @classmethod
+    def build(
+            cls,
+            coverage: BaseGeometry,
+            tag_filters: list[dict],
+            fetch: Callable[[BaseGeometry, dict], gpd.GeoDataFrame],
+            version: tuple | None = None,
+            max_workers: int = 8,
+    ) -> "LanduseLayer":
+        """
+        Function fetches features of every tag filter within coverage, blocking, should be called in worker thread
+        Args:
+            coverage (BaseGeometry): territory to fetch features for in 4326
+            tag_filters (list[dict]): OSM tag filters
+            fetch (Callable[[BaseGeometry, dict], gpd.GeoDataFrame]): function fetching features for polygon and tags
+            version (tuple | None): version of model layer is built for
+            max_workers (int): tag filters fetched at once
+        Returns:
+            LanduseLayer: layer
+        Raises:
+            Any, error from fetch, layer without some tag filter would silently miss landuse category
+        """
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(lambda tags: fetch(coverage, tags), tag_filters))
+        frames = []
+        for tags, gdf in zip(tag_filters, results):
+            if gdf is None or gdf.empty:
+                continue
+            gdf = gdf.set_geometry("geometry")
+            gdf = gdf.set_crs(4326) if gdf.crs is None else gdf.to_crs(4326)
+            frames.append(gpd.GeoDataFrame(
+                {"tag_filter": cls.get_filter_id(tags)},
+                geometry=gdf.geometry.values,
+                index=pd.RangeIndex(len(gdf)),
+                crs=4326,
+            ))
+        if frames:
+            features = gpd.GeoDataFrame(pd.concat(frames, ignore_index=True), geometry="geometry", crs=4326)
+        else:
+            features = gpd.GeoDataFrame({"tag_filter": pd.Series(dtype=str)}, geometry=[], crs=4326)
+        return cls(features, coverage, tag_filters, version)
+
+    def covers(self, polygon: BaseGeometry) -> bool:
+        return self.coverage.covers(polygon)
+
+    def fetch(self, polygon: BaseGeometry, tags: dict) -> gpd.GeoDataFrame:
+        """
+        Function returns features of tag filter intersecting polygon, same as OSM features request for polygon
+        Args:
+            polygon (BaseGeometry): polygon in 4326 covered by layer
+            tags (dict): OSM tag filter
+        Returns:
+            gpd.GeoDataFrame: features in 4326
+        """
+
+        features = self.features.iloc[self.sindex.query(polygon, predicate="intersects")]
+        features = features[features["tag_filter"] == self.get_filter_id(tags)]
+        return gpd.GeoDataFrame(geometry=features.geometry.values, crs=4326)
+
+    def save(self, path: Path) -> None:
+        table = pa.table({
+            "tag_filter": pa.array(self.features["tag_filter"].to_numpy(), type=pa.string()),
+            "geometry": pa.array(shapely.to_wkb(self.features.geometry.values), type=pa.binary()),
+        })
+        table = table.replace_schema_metadata({
+            "coverage": shapely.to_wkb(self.coverage, hex=True),
+            "tag_filters": json.dumps(self.tag_filters, ensure_ascii=False),
+            "version": json.dumps(list(self.version) if self.version is not None else None),
+        })
+        pq.write_table(table, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "LanduseLayer":
+        table = pq.read_table(path)
+        metadata = {k.decode(): v.decode() for k, v in table.schema.metadata.items()}
+        version = json.loads(metadata["version"])
+        features = gpd.GeoDataFrame(
+            {"tag_filter": table.column("tag_filter").to_pandas()},
+            geometry=shapely.from_wkb(table.column("geometry").to_numpy(zero_copy_only=False)),
+            crs=4326,
+        )
+        return cls(
+            features,
+            shapely.from_wkb(metadata["coverage"]),
+            json.loads(metadata["tag_filters"]),
+            tuple(version) if version is not None else None,
+        )
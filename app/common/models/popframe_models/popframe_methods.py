@@ -0,0 +1,37 @@
+"""
+Lazy access to popframe methods. Popframe pulls matplotlib, networkx and sklearn stacks on import,
+so methods are imported on first attribute access instead of app import:
+
+    from app.common.models.popframe_models import popframe_methods
+    evaluation = popframe_methods.TerritoryEvaluation(region=region_model)
+"""
+
+import importlib
+
+LAZY_IMPORTS = {
+    "Region": "popframe.models.region",
+    "TerritoryEvaluation": "popframe.method.territory_evaluation",
+    "PopulationFrame": "popframe.method.popuation_frame",
+    "AgglomerationBuilder": "popframe.method.aglomeration",
+    "LandUseAssessment": "popframe.method.landuse_assessment",
+    "LevelFiller": "popframe.preprocessing.level_filler",
+}
+
+
+def __getattr__(name: str):
+    if name not in LAZY_IMPORTS:
+        raise AttributeError(f"module {__name__} has no attribute {name}")
+    value = getattr(importlib.import_module(LAZY_IMPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def preload() -> None:
+    """
+    Function imports all popframe methods, e.g. in gunicorn master before workers are forked
+    Returns:
+        None
+    """
+
+    for name in LAZY_IMPORTS:
+        __getattr__(name)
@@ -1,31 +1,59 @@
+import asyncio
 import json
+import os
+import uuid
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable
 
 import geopandas as gpd
 import pandas as pd
 from loguru import logger
-from popframe.method.aglomeration import AgglomerationBuilder
-from popframe.method.popuation_frame import PopulationFrame
+from shapely.geometry.base import BaseGeometry
 
-from popframe.preprocessing.level_filler import LevelFiller
-from popframe.models.region import Region
 from app.dependences import (
-    http_exception, geoserver_storage,
+    http_exception, geoserver_storage, get_config_value,
 )
 
+from app.common.metrics.prometheus_metrics import stage_timer
 from app.common.storage.models.pop_frame_caching_service import pop_frame_caching_service
+from app.common.storage.snapshots.region_snapshot_store import (
+    RegionInputs,
+    region_snapshot_store,
+    snapshots_enabled,
+)
+from . import popframe_methods
+from .accessibility_matrix import CompactAccessibilityMatrix, SparseAccessibilityMatrix
+from .landuse_layer import LanduseLayer
+from .reachability_index import ReachabilityIndex
 from .services.popframe_models_api_service import pop_frame_model_api_service
 
+if TYPE_CHECKING:
+    from popframe.models.region import Region
+
+matrix_storage_dtype = get_config_value("MATRIX_STORAGE_DTYPE", "float32")
+matrix_max_travel_time = get_config_value("MATRIX_MAX_TRAVEL_TIME")
+matrix_max_travel_time = float(matrix_max_travel_time) if matrix_max_travel_time else None
+reachability_max_travel_time = float(get_config_value("REACHABILITY_MAX_TRAVEL_TIME", "120"))
+if matrix_max_travel_time is not None and matrix_max_travel_time < reachability_max_travel_time:
+    raise ValueError(
+        f"MATRIX_MAX_TRAVEL_TIME {matrix_max_travel_time} is below REACHABILITY_MAX_TRAVEL_TIME "
+        f"{reachability_max_travel_time}, towns between them would be treated as unreachable"
+    )
+
 
 class PopFrameModelsService:
     """Class for popframe model handling"""
 
+    def __init__(self) -> None:
+        self._landuse_layer_locks: dict[int, asyncio.Lock] = {}
+
     @staticmethod
     async def create_model(
             region_borders: gpd.GeoDataFrame,
             towns: gpd.GeoDataFrame,
             adj_mx: pd.DataFrame,
             region_id: int,
-    ) -> Region:
+    ) -> "Region":
         """
         Function initialises popframe region model
         Args:
@@ -41,7 +69,7 @@ class PopFrameModelsService:
 
         local_crs = region_borders.estimate_utm_crs()
         try:
-            region_model = Region(
+            region_model = popframe_methods.Region(
                 region=region_borders.to_crs(local_crs),
                 towns=towns.to_crs(local_crs),
                 accessibility_matrix=adj_mx
@@ -61,19 +89,22 @@ class PopFrameModelsService:
                 _detail={"Error": str(e)}
             )
 
-    async def calculate_model(self, region_id: int) -> None:
+    @staticmethod
+    async def fetch_region_inputs(region_id: int) -> RegionInputs:
         """
-        Function calculates popframe model for region
+        Function retrieves raw model inputs for region from upstream apis
         Args:
             region_id (int): region id
         Returns:
-            None
+            RegionInputs: region borders, towns, population and accessibility matrix
         """
-        logger.info(f"Started model calculation for the region {region_id}")
-        region_borders = await pop_frame_model_api_service.get_region_borders(region_id)
+
+        with stage_timer("borders", region_id):
+            region_borders = await pop_frame_model_api_service.get_region_borders(region_id)
         logger.info(f"Extracted region border for the region {region_id}")
         #ToDo revise cities after broker
-        cities_gdf = await pop_frame_model_api_service.get_tf_cities(region_id)
+        with stage_timer("towns", region_id):
+            cities_gdf = await pop_frame_model_api_service.get_tf_cities(region_id)
         # cities = await urban_api_handler.get(
         #     endpoint_url="/api/v1/all_territories",
         #     params={
@@ -87,65 +118,166 @@ class PopFrameModelsService:
         #     logger.info(f"No cities found for region {region_id}")
         # cities_gdf = gpd.GeoDataFrame.from_features(cities, crs=4326)
         logger.info(f"Started population retrieval for region {region_id}")
-        population_data_df = await pop_frame_model_api_service.get_territories_population(
-            territories_ids=cities_gdf.index.to_list(),
-        )
-        population_data_df.set_index("territory_id", inplace=True)
+        with stage_timer("population", region_id):
+            population_data_df = await pop_frame_model_api_service.get_territories_population(
+                territories_ids=cities_gdf.index.to_list(),
+                region_id=region_id,
+            )
         logger.info(f"Successfully retrieved population data for region {region_id}")
+        logger.info(f"Started matrix retrieval for region {region_id}")
+        with stage_timer("matrix", region_id):
+            matrix = await pop_frame_model_api_service.get_matrix_for_region(
+                region_id=region_id,
+                graph_type="car",
+                max_travel_time=matrix_max_travel_time,
+            )
+            logger.info(f"Retrieved matrix for region {region_id}")
+            if not isinstance(matrix, SparseAccessibilityMatrix):
+                matrix = CompactAccessibilityMatrix.from_frame(matrix, dtype=matrix_storage_dtype)
+        return RegionInputs(
+            region_borders=region_borders,
+            towns=cities_gdf,
+            population=population_data_df,
+            accessibility_matrix=matrix,
+        )
+
+    async def calculate_model(self, region_id: int) -> None:
+        """
+        Function calculates popframe model for region
+        Args:
+            region_id (int): region id
+        Returns:
+            None
+        """
+        logger.info(f"Started model calculation for the region {region_id}")
+        with stage_timer("total", region_id):
+            inputs = await self.fetch_region_inputs(region_id)
+            if snapshots_enabled:
+                try:
+                    with stage_timer("snapshot", region_id):
+                        await region_snapshot_store.save_inputs(region_id, inputs)
+                except Exception as e:
+                    logger.exception(e)
+            await self.build_model_from_inputs(region_id, inputs)
+
+    async def rebuild_model(
+            self,
+            region_id: int,
+            snapshot_version: str | None = None,
+            publish: bool = False,
+    ) -> None:
+        """
+        Function recalculates popframe model for region from inputs snapshot without upstream requests
+        Args:
+            region_id (int): region id
+            snapshot_version (str | None): snapshot version, the newest one is used if not provided
+            publish (bool): whether to upload indicators and geoserver layers after rebuild
+        Returns:
+            None
+        """
+
+        logger.info(f"Started model rebuild from snapshot for the region {region_id}")
+        inputs = await region_snapshot_store.load_inputs(region_id, snapshot_version)
+        await self.build_model_from_inputs(region_id, inputs, publish=publish)
+
+    async def rebuild_all_models(self, publish: bool = False) -> None:
+        """
+        Function rebuilds models for all regions with inputs snapshots
+        Args:
+            publish (bool): whether to upload indicators and geoserver layers after rebuild
+        Returns:
+            None
+        """
+
+        for region_id in region_snapshot_store.get_available_regions():
+            try:
+                await self.rebuild_model(region_id=region_id, publish=publish)
+            except Exception as e:
+                logger.exception(e)
+
+    async def build_model_from_inputs(
+            self,
+            region_id: int,
+            inputs: RegionInputs,
+            publish: bool = True,
+    ) -> None:
+        """
+        Function builds and caches popframe model from raw inputs
+        Args:
+            region_id (int): region id
+            inputs (RegionInputs): raw model inputs
+            publish (bool): whether to upload indicators and geoserver layers
+        Returns:
+            None
+        """
+
+        population_data_df = inputs.population.set_index("territory_id")
         cities_gdf = pd.merge(
-            cities_gdf,
+            inputs.towns,
             population_data_df,
             left_index=True,
             right_index=True
         )
         # cities_gdf.set_index("territory_id", inplace=True)
         cities_gdf = gpd.GeoDataFrame(cities_gdf, geometry="geometry", crs=4326)
-        level_filler = LevelFiller(towns=cities_gdf)
-        towns = level_filler.fill_levels()
+        with stage_timer("level_filling", region_id):
+            level_filler = popframe_methods.LevelFiller(towns=cities_gdf)
+            towns = level_filler.fill_levels()
         logger.info(f"Loaded cities for region {region_id}")
-        logger.info(f"Started matrix retrieval for region {region_id}")
-        matrix = await pop_frame_model_api_service.get_matrix_for_region(region_id=region_id, graph_type="car")
-        logger.info(f"Retrieved matrix for region {region_id}")
-        matrix = matrix.loc[towns.index, towns.index]
+        compact_matrix = inputs.accessibility_matrix.select(towns.index)
         logger.info(f"Loaded matrix for region {region_id}")
-        model = await self.create_model(
-            region_borders=region_borders,
-            towns=towns,
-            adj_mx=matrix,
-            region_id=region_id,
-        )
-        await pop_frame_caching_service.cache_model_to_pickle(
-            region_model=model,
-            region_id=region_id,
-        )
-        frame_method = PopulationFrame(region=model)
-        gdf_frame = frame_method.build_circle_frame()
-        builder = AgglomerationBuilder(region=model)
-        agglomeration_gdf = builder.get_agglomerations()
-        towns_with_status = builder.evaluate_city_agglomeration_status(gdf_frame, agglomeration_gdf)
+        with stage_timer("model_init", region_id):
+            model = await self.create_model(
+                region_borders=inputs.region_borders,
+                towns=towns,
+                adj_mx=compact_matrix.to_frame(),
+                region_id=region_id,
+            )
+        with stage_timer("pickle", region_id):
+            await pop_frame_caching_service.cache_model_to_pickle(
+                region_model=model,
+                region_id=region_id,
+                accessibility_matrix=compact_matrix,
+            )
+        try:
+            with stage_timer("reachability_index", region_id):
+                await asyncio.to_thread(
+                    self._load_or_build,
+                    pop_frame_caching_service.get_reachability_path(region_id),
+                    pop_frame_caching_service.get_model_version(region_id),
+                    ReachabilityIndex.load,
+                    lambda version: self.build_reachability_index(model, version),
+                )
+        except Exception as e:
+            # index is optional for model, it is built again on the first request
+            logger.exception(e)
+        if not publish:
+            logger.info(f"Rebuilt model for region {region_id} without publishing")
+            return
+        with stage_timer("frame", region_id):
+            frame_method = popframe_methods.PopulationFrame(region=model)
+            gdf_frame = frame_method.build_circle_frame()
+        with stage_timer("agglomerations", region_id):
+            builder = popframe_methods.AgglomerationBuilder(region=model)
+            agglomeration_gdf = builder.get_agglomerations()
+            towns_with_status = builder.evaluate_city_agglomeration_status(gdf_frame, agglomeration_gdf)
         agglomeration_indicators = towns_with_status["agglomeration_status"].value_counts()
-        await pop_frame_model_api_service.upload_popframe_indicators(
-            agglomeration_indicators,
-            region_id
-        )
+        with stage_timer("indicator_upload", region_id):
+            await pop_frame_model_api_service.upload_popframe_indicators(
+                agglomeration_indicators,
+                region_id
+            )
         await geoserver_storage.delete_geoserver_cached_layers(region_id)
         logger.info(f"All old .gpkg layer for region {region_id} are deleted")
         agglomeration_gdf.to_crs(4326, inplace=True)
-        await geoserver_storage.save_gdf_to_geoserver(
-            layer=agglomeration_gdf,
-            name="popframe",
-            region_id=region_id,
-            layer_type="agglomerations",
-        )
-        logger.info(f"Loaded agglomerations for region {region_id} on geoserver")
         towns_with_status.to_crs(4326, inplace=True)
-        await geoserver_storage.save_gdf_to_geoserver(
-            layer=towns_with_status,
-            name="popframe",
-            region_id=region_id,
-            layer_type="cities",
-        )
-        logger.info(f"Loaded cities for region {region_id} on geoserver")
+        with stage_timer("geoserver_publish", region_id):
+            await geoserver_storage.publish_layers(
+                layers={"agglomerations": agglomeration_gdf, "cities": towns_with_status},
+                name="popframe",
+                region_id=region_id,
+            )
+        logger.info(f"Loaded agglomerations and cities for region {region_id} on geoserver")
 
     async def load_and_cache_all_models(self):
         """
@@ -185,7 +317,7 @@ class PopFrameModelsService:
     async def get_model(
             self,
             region_id: int,
-    ) -> Region:
+    ) -> "Region":
         """
         Function gets model for region
         Args:
@@ -200,6 +332,244 @@ class PopFrameModelsService:
         await self.calculate_model(region_id=region_id)
         return await self.get_model(region_id=region_id)
 
+    @staticmethod
+    def _load_or_build(path: Path, version: tuple | None, load: Callable, build: Callable):
+        """
+        Function loads artifact derived from model if it was built from the same model version,
+        otherwise builds and stores it. Every builder writes its own temporary file, so concurrent builds
+        in one or several workers only replace the artifact with the same content
+        Args:
+            path (Path): artifact path
+            version (tuple | None): model version
+            load (Callable): function loading artifact from path
+            build (Callable): function building artifact for version
+        Returns:
+            artifact
+        """
+
+        if path.exists():
+            try:
+                artifact = load(path)
+                if artifact.version == version:
+                    return artifact
+            except Exception as e:
+                logger.warning(f"Failed to load {path.name}: {e}")
+        artifact = build(version)
+        tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.{uuid.uuid4().hex}.tmp{path.suffix}")
+        try:
+            artifact.save(tmp_path)
+            tmp_path.replace(path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        logger.info(f"Built {path.name}")
+        return artifact
+
+    @staticmethod
+    def get_towns_population(region_model: "Region") -> pd.Series:
+        """
+        Function returns population of model towns keyed by towns ids as model accessibility matrix is
+        Args:
+            region_model (Region): PopFrame regional model
+        Returns:
+            pd.Series: population by town id
+        """
+
+        towns = region_model.get_towns_gdf()
+        if "id" in towns.columns:
+            towns = towns.set_index("id")
+        return towns["population"]
+
+    @staticmethod
+    def check_travel_time(time: float) -> None:
+        """
+        Function checks travel time against matrix cutoff. Pairs above cutoff are missing in sparse mode matrix,
+        so results for longer times would silently miss towns
+        Args:
+            time (float): travel time in minutes
+        Returns:
+            None
+        Raises:
+            400, time is above matrix cutoff
+        """
+
+        if matrix_max_travel_time is not None and time > matrix_max_travel_time:
+            raise http_exception(
+                400,
+                "Travel time is above accessibility matrix cutoff",
+                _input={"time": time},
+                _detail={"max_travel_time": matrix_max_travel_time},
+            )
+
+    def build_reachability_index(self, region_model: "Region", version: tuple | None) -> ReachabilityIndex:
+        """
+        Function builds towns reachability index from model, blocking, should be called in worker thread
+        Args:
+            region_model (Region): PopFrame regional model
+            version (tuple | None): model version
+        Returns:
+            ReachabilityIndex: towns reachable from every town with cumulative population
+        Raises:
+            ValueError, if population is missing for matrix towns
+        """
+
+        return ReachabilityIndex.from_frame(
+            region_model.accessibility_matrix,
+            self.get_towns_population(region_model),
+            reachability_max_travel_time,
+            version,
+        )
+
+    async def get_reachability_index(self, region_id: int) -> ReachabilityIndex:
+        """
+        Function gets towns reachability index for region, it is built on model calculation, stored next to the model
+        and kept with resident model. Index is built from loaded model if it's missing or outdated
+        Args:
+            region_id (int): region id
+        Returns:
+            ReachabilityIndex: towns reachable from every town with cumulative population
+        """
+
+        region_model = await self.get_model(region_id)
+        index = pop_frame_caching_service.resident_models.get_derived(region_id, "reachability_index")
+        if index is not None:
+            return index
+        index = await asyncio.to_thread(
+            self._load_or_build,
+            pop_frame_caching_service.get_reachability_path(region_id),
+            pop_frame_caching_service.get_model_version(region_id),
+            ReachabilityIndex.load,
+            lambda version: self.build_reachability_index(region_model, version),
+        )
+        pop_frame_caching_service.resident_models.set_derived(region_id, "reachability_index", index)
+        return index
+
+    @staticmethod
+    def make_landuse_assessment(region_model: "Region", fetch: Callable | None = None):
+        """
+        Function creates popframe landuse assessment
+        Args:
+            region_model (Region): PopFrame regional model
+            fetch (Callable | None): function answering assessment OSM features requests for polygon and tags,
+            features are requested from OSM if not provided
+        Returns:
+            LandUseAssessment: assessment
+        Raises:
+            AttributeError, if assessment doesn't request OSM features with fetch_osm_data
+        """
+
+        assessment = popframe_methods.LandUseAssessment(region=region_model)
+        if fetch is not None:
+            if not callable(getattr(assessment, "fetch_osm_data", None)):
+                raise AttributeError("LandUseAssessment doesn't request OSM features with fetch_osm_data")
+            # assessment is pydantic model, so method is replaced on the instance only
+            object.__setattr__(assessment, "fetch_osm_data", fetch)
+        return assessment
+
+    def get_landuse_tag_filters(self, region_model: "Region", coverage: BaseGeometry) -> list[dict]:
+        """
+        Function collects OSM tag filters landuse assessment requests, so they are taken from popframe as they are.
+        Assessment is run for tiny polygon inside coverage with requests recorded and answered with no features
+        Args:
+            region_model (Region): PopFrame regional model
+            coverage (BaseGeometry): region territory in 4326
+        Returns:
+            list[dict]: unique tag filters
+        Raises:
+            ValueError, if assessment requested no OSM features
+        """
+
+        tag_filters = []
+
+        def record(polygon: BaseGeometry, tags: dict) -> gpd.GeoDataFrame:
+            tag_filters.append(dict(tags))
+            return gpd.GeoDataFrame(geometry=[], crs=4326)
+
+        probe = gpd.GeoDataFrame(geometry=[coverage.representative_point().buffer(1e-4)], crs=4326)
+        try:
+            self.make_landuse_assessment(region_model, record).get_landuse_data(territories=probe)
+        except Exception as e:
+            # only requested tag filters are needed, assessment of no features can fail afterwards
+            logger.debug(f"Landuse assessment of probe polygon failed after recording tag filters: {e}")
+        tag_filters = list({LanduseLayer.get_filter_id(i): i for i in tag_filters}.values())
+        if not tag_filters:
+            raise ValueError("Landuse assessment requested no OSM features")
+        return tag_filters
+
+    def build_landuse_layer(
+            self,
+            region_model: "Region",
+            coverage: BaseGeometry,
+            version: tuple | None,
+    ) -> LanduseLayer:
+        """
+        Function fetches OSM features landuse assessment requests for the whole region, blocking,
+        should be called in worker thread
+        Args:
+            region_model (Region): PopFrame regional model
+            coverage (BaseGeometry): region territory in 4326
+            version (tuple | None): model version
+        Returns:
+            LanduseLayer: region landuse features with spatial index
+        """
+
+        tag_filters = self.get_landuse_tag_filters(region_model, coverage)
+        # features are requested with popframe's own request and retries for the region instead of project
+        fetch = self.make_landuse_assessment(region_model).fetch_osm_data
+        return LanduseLayer.build(coverage, tag_filters, fetch, version)
+
+    async def get_landuse_layer(self, region_id: int) -> LanduseLayer:
+        """
+        Function gets region-wide landuse layer, it is built on the first landuse request for model version,
+        stored next to the model and kept with resident model
+        Args:
+            region_id (int): region id
+        Returns:
+            LanduseLayer: region landuse features with spatial index
+        """
+
+        region_model = await self.get_model(region_id)
+        layer = pop_frame_caching_service.resident_models.get_derived(region_id, "landuse_layer")
+        if layer is not None:
+            return layer
+        # region fetch takes minutes, concurrent first requests wait for one build
+        async with self._landuse_layer_locks.setdefault(region_id, asyncio.Lock()):
+            layer = pop_frame_caching_service.resident_models.get_derived(region_id, "landuse_layer")
+            if layer is not None:
+                return layer
+            region_borders = await pop_frame_model_api_service.get_region_borders(region_id)
+            coverage = region_borders.to_crs(4326).union_all()
+            layer = await asyncio.to_thread(
+                self._load_or_build,
+                pop_frame_caching_service.get_landuse_layer_path(region_id),
+                pop_frame_caching_service.get_model_version(region_id),
+                LanduseLayer.load,
+                lambda version: self.build_landuse_layer(region_model, coverage, version),
+            )
+            pop_frame_caching_service.resident_models.set_derived(region_id, "landuse_layer", layer)
+        return layer
+
+    def assess_landuse(
+            self,
+            region_model: "Region",
+            territories: gpd.GeoDataFrame,
+            layer: LanduseLayer | None = None,
+    ) -> gpd.GeoDataFrame:
+        """
+        Function assesses landuse of territories, blocking, should be called in worker thread. Features of territories
+        covered by region layer are clipped from it, other territories are requested from OSM
+        Args:
+            region_model (Region): PopFrame regional model
+            territories (gpd.GeoDataFrame): territories to assess
+            layer (LanduseLayer | None): region landuse layer
+        Returns:
+            gpd.GeoDataFrame: landuse indicators with geometries
+        """
+
+        fetch = None
+        if layer is not None and layer.covers(territories.to_crs(4326).union_all()):
+            fetch = layer.fetch
+        return self.make_landuse_assessment(region_model, fetch).get_landuse_data(territories=territories)
+
     @staticmethod
     async def get_available_regions() -> list[int]:
         """
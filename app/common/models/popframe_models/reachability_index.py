@@ -0,0 +1,224 @@
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+
+class ReachabilityIndex:
+    """
+    Class for towns reachable from every town within travel time. For every town neighbours are stored
+    sorted by travel time in compressed rows with cumulative population, so towns and population within
+    any time are found with binary search instead of matrix and towns table scans
+    """
+
+    def __init__(
+            self,
+            labels: Iterable,
+            indptr: np.ndarray,
+            neighbours: np.ndarray,
+            times: np.ndarray,
+            cumulative_population: np.ndarray,
+            max_time: float,
+            version: tuple | None = None,
+    ) -> None:
+        """
+        Initialisation function for reachability index
+        Args:
+            labels (Iterable): towns ids
+            indptr (np.ndarray): rows bounds in neighbours arrays, one more than towns
+            neighbours (np.ndarray): positions of reachable towns sorted by travel time within every row
+            times (np.ndarray): travel times to neighbours in minutes
+            cumulative_population (np.ndarray): population of neighbours accumulated within every row
+            max_time (float): maximum stored travel time in minutes
+            version (tuple | None): version of model index is built from
+        Returns:
+            None
+        """
+
+        self.labels = pd.Index(labels)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.neighbours = np.asarray(neighbours, dtype=np.int32)
+        self.times = np.asarray(times, dtype=np.float32)
+        self.cumulative_population = np.asarray(cumulative_population, dtype=np.int64)
+        self.max_time = float(max_time)
+        self.version = None if version is None else tuple(int(i) for i in version)
+
+    @classmethod
+    def from_matrix(
+            cls,
+            matrix: np.ndarray,
+            labels: Iterable,
+            population: np.ndarray,
+            max_time: float,
+            version: tuple | None = None,
+            block_size: int = 256,
+    ) -> "ReachabilityIndex":
+        """
+        Function builds index from dense travel times matrix by blocks of rows, so only the index and one block
+        of temporary arrays are held. Times above max time, missing or infinite ones aren't stored
+        Args:
+            matrix (np.ndarray): square travel times matrix in minutes, rows are origins
+            labels (Iterable): towns ids in matrix order
+            population (np.ndarray): towns population in matrix order
+            max_time (float): maximum stored travel time in minutes
+            version (tuple | None): version of model index is built from
+            block_size (int): rows processed at once
+        Returns:
+            ReachabilityIndex: index
+        """
+
+        population = np.asarray(population, dtype=np.int64)
+        counts, neighbours, times, cumulative = [], [], [], []
+        for start in range(0, len(matrix), block_size):
+            block = np.asarray(matrix[start:start + block_size])
+            with np.errstate(invalid="ignore"):
+                mask = np.isfinite(block) & (block <= max_time)
+            rows, cols = np.nonzero(mask)
+            block_times = block[rows, cols].astype(np.float32)
+            order = np.lexsort((block_times, rows))
+            cols, block_times = cols[order].astype(np.int32), block_times[order]
+            row_counts = mask.sum(axis=1)
+            block_cumulative = np.cumsum(population[cols])
+            row_starts = np.concatenate([[0], block_cumulative])[np.cumsum(row_counts) - row_counts]
+            block_cumulative -= np.repeat(row_starts, row_counts)
+            counts.append(row_counts)
+            neighbours.append(cols)
+            times.append(block_times)
+            cumulative.append(block_cumulative)
+        indptr = np.zeros(len(matrix) + 1, dtype=np.int64)
+        if counts:
+            np.cumsum(np.concatenate(counts), out=indptr[1:])
+        return cls(
+            labels,
+            indptr,
+            np.concatenate(neighbours) if neighbours else np.zeros(0, dtype=np.int32),
+            np.concatenate(times) if times else np.zeros(0, dtype=np.float32),
+            np.concatenate(cumulative) if cumulative else np.zeros(0, dtype=np.int64),
+            max_time,
+            version,
+        )
+
+    @classmethod
+    def from_frame(
+            cls,
+            adj_mx: pd.DataFrame,
+            population: pd.Series,
+            max_time: float,
+            version: tuple | None = None,
+    ) -> "ReachabilityIndex":
+        """
+        Function builds index from matrix frame
+        Args:
+            adj_mx (pd.DataFrame): travel times matrix in minutes with towns ids as index
+            population (pd.Series): towns population indexed by towns ids
+            max_time (float): maximum stored travel time in minutes
+            version (tuple | None): version of model index is built from
+        Returns:
+            ReachabilityIndex: index
+        Raises:
+            ValueError: if population is missing for matrix towns
+        """
+
+        missing = adj_mx.index.difference(population.index)
+        if len(missing):
+            raise ValueError(f"Population is missing for {len(missing)} matrix towns, e.g. {missing[:10].tolist()}")
+        return cls.from_matrix(
+            adj_mx.to_numpy(), adj_mx.index, population.loc[adj_mx.index].to_numpy(), max_time, version
+        )
+
+    def positions(self, towns: Iterable) -> np.ndarray:
+        """
+        Function returns towns positions in index
+        Args:
+            towns (Iterable): towns ids
+        Returns:
+            np.ndarray: positions
+        Raises:
+            KeyError: if any town isn't in index
+        """
+
+        positions = self.labels.get_indexer(towns)
+        if (positions < 0).any():
+            raise KeyError(f"Towns {list(pd.Index(towns)[positions < 0])} are not in reachability index")
+        return positions
+
+    def count_within(self, positions: np.ndarray, time: float) -> np.ndarray:
+        """
+        Function returns number of towns reachable within travel time from every town, town itself included.
+        Rows are searched with vectorized binary search over all requested towns at once
+        Args:
+            positions (np.ndarray): towns positions
+            time (float): travel time in minutes
+        Returns:
+            np.ndarray: number of reachable towns
+        Raises:
+            ValueError: if time is above maximum stored travel time
+        """
+
+        if time > self.max_time:
+            raise ValueError(f"Time {time} is above maximum stored travel time {self.max_time}")
+        positions = np.asarray(positions, dtype=np.int64)
+        low, high = self.indptr[positions], self.indptr[positions + 1]
+        starts = low.copy()
+        while (active := low < high).any():
+            middle = (low + high) // 2
+            within = active & (self.times[np.minimum(middle, len(self.times) - 1)] <= time)
+            low = np.where(within, middle + 1, low)
+            high = np.where(active & ~within, middle, high)
+        return low - starts
+
+    def population_within(self, positions: np.ndarray, time: float) -> np.ndarray:
+        """
+        Function returns population reachable within travel time from every town, town itself included
+        Args:
+            positions (np.ndarray): towns positions
+            time (float): travel time in minutes
+        Returns:
+            np.ndarray: reachable population
+        """
+
+        positions = np.asarray(positions, dtype=np.int64)
+        counts = self.count_within(positions, time)
+        last = self.indptr[positions] + counts - 1
+        return np.where(counts > 0, self.cumulative_population[np.maximum(last, 0)], 0)
+
+    def neighbours_within(self, position: int, time: float) -> tuple[pd.Index, np.ndarray]:
+        """
+        Function returns towns reachable within travel time from town
+        Args:
+            position (int): town position
+            time (float): travel time in minutes
+        Returns:
+            tuple[pd.Index, np.ndarray]: towns ids and travel times sorted by travel time
+        """
+
+        start = self.indptr[position]
+        end = start + int(self.count_within(np.array([position]), time)[0])
+        return self.labels[self.neighbours[start:end]], self.times[start:end]
+
+    def save(self, path: Path) -> None:
+        np.savez(
+            path,
+            labels=self.labels.to_numpy(),
+            indptr=self.indptr,
+            neighbours=self.neighbours,
+            times=self.times,
+            cumulative_population=self.cumulative_population,
+            max_time=np.float64(self.max_time),
+            version=np.asarray(self.version if self.version is not None else [], dtype=np.int64),
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "ReachabilityIndex":
+        with np.load(path, allow_pickle=False) as npz:
+            version = npz["version"]
+            return cls(
+                npz["labels"],
+                npz["indptr"],
+                npz["neighbours"],
+                npz["times"],
+                npz["cumulative_population"],
+                float(npz["max_time"]),
+                tuple(version.tolist()) if len(version) else None,
+            )
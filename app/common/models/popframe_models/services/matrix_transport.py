@@ -0,0 +1,126 @@
+import ast
+import io
+from typing import Awaitable, Callable
+
+import aiohttp
+import numpy as np
+import pandas as pd
+
+from app.common.api_handler.api_handler import APIHandler
+from ..accessibility_matrix import SparseAccessibilityMatrix
+
+NPY_CONTENT_TYPE = "application/x-npy"
+MATRIX_ACCEPT_HEADER = f"{NPY_CONTENT_TYPE}, application/json;q=0.5"
+STREAM_CHUNK_SIZE = 1024 ** 2
+
+
+async def read_npy_header(stream: aiohttp.StreamReader) -> tuple[np.dtype, tuple[int, ...], bool]:
+    """
+    Function reads .npy header from stream
+    Args:
+        stream (aiohttp.StreamReader): response body stream
+    Returns:
+        tuple[np.dtype, tuple[int, ...], bool]: array dtype, shape and fortran order flag
+    """
+
+    magic = await stream.readexactly(8)
+    major, _ = np.lib.format.read_magic(io.BytesIO(magic))
+    length_size = 2 if major == 1 else 4
+    header_length = int.from_bytes(await stream.readexactly(length_size), "little")
+    header = ast.literal_eval((await stream.readexactly(header_length)).decode("latin1"))
+    return np.dtype(header["descr"]), tuple(header["shape"]), header["fortran_order"]
+
+
+async def read_npy_array(stream: aiohttp.StreamReader) -> np.ndarray:
+    """
+    Function streams .npy array into preallocated array
+    Args:
+        stream (aiohttp.StreamReader): response body stream
+    Returns:
+        np.ndarray: array read from stream
+    """
+
+    dtype, shape, fortran_order = await read_npy_header(stream)
+    array = np.empty(shape, dtype=dtype, order="F" if fortran_order else "C")
+    buffer = memoryview(array.reshape(-1, order="A").view(np.uint8))
+    offset = 0
+    while offset < array.nbytes:
+        chunk = await stream.readexactly(min(STREAM_CHUNK_SIZE, array.nbytes - offset))
+        buffer[offset: offset + len(chunk)] = chunk
+        offset += len(chunk)
+    return array
+
+
+async def read_npy_row_blocks(stream: aiohttp.StreamReader):
+    """
+    Function streams C-ordered 2d .npy array as row blocks not larger than stream chunk
+    Args:
+        stream (aiohttp.StreamReader): response body stream
+    Yields:
+        np.ndarray: consecutive row blocks
+    """
+
+    dtype, shape, fortran_order = await read_npy_header(stream)
+    if fortran_order:
+        raise ValueError("Fortran ordered matrix can't be read by row blocks")
+    row_size = shape[1] * dtype.itemsize
+    rows_per_block = max(1, STREAM_CHUNK_SIZE // max(row_size, 1))
+    block = np.empty((rows_per_block, shape[1]), dtype=dtype)
+    buffer = memoryview(block.reshape(-1).view(np.uint8))
+    rows_left = shape[0]
+    while rows_left > 0:
+        rows = min(rows_per_block, rows_left)
+        buffer[: rows * row_size] = await stream.readexactly(rows * row_size)
+        rows_left -= rows
+        yield block[:rows]
+
+
+def make_matrix_reader(
+        max_travel_time: float | None = None,
+) -> Callable[[aiohttp.ClientResponse], Awaitable[pd.DataFrame | SparseAccessibilityMatrix | None]]:
+    """
+    Function creates accessibility matrix response reader
+    Args:
+        max_travel_time (float | None): cutoff in minutes, if provided matrix is read as threshold-sparse
+    Returns:
+        Callable: response reader for APIHandler.get_raw
+    """
+
+    async def read_response(response: aiohttp.ClientResponse) -> pd.DataFrame | SparseAccessibilityMatrix | None:
+        if max_travel_time is None or response.status != 200:
+            return await read_matrix_response(response)
+        if response.content_type == NPY_CONTENT_TYPE:
+            index = await read_npy_array(response.content)
+            parts = [
+                SparseAccessibilityMatrix.threshold_block(block, max_travel_time)
+                async for block in read_npy_row_blocks(response.content)
+            ]
+            return SparseAccessibilityMatrix.from_parts(parts, index, max_travel_time)
+        adj_mx = await read_matrix_response(response)
+        return SparseAccessibilityMatrix.from_frame(adj_mx, max_travel_time)
+
+    return read_response
+
+
+async def read_matrix_response(response: aiohttp.ClientResponse) -> pd.DataFrame | None:
+    """
+    Function reads accessibility matrix from TransportFrame response.
+    Binary body is two consecutive .npy arrays: towns index and square matrix, json body is
+    pandas split orientation with values, index and columns
+    Args:
+        response (aiohttp.ClientResponse): response object
+    Returns:
+        pd.DataFrame | None: matrix, None if request should be retried
+    Raises:
+        Any, error from TransportFrame api
+    """
+
+    if response.status != 200:
+        return await APIHandler._check_response_status(response)
+    if response.content_type == NPY_CONTENT_TYPE:
+        index = await read_npy_array(response.content)
+        values = await read_npy_array(response.content)
+        return pd.DataFrame(values, index=index, columns=index, copy=False)
+    data = await response.json(content_type=None)
+    values = np.asarray(data["values"], dtype=np.float64)
+    return pd.DataFrame(values, index=data["index"], columns=data["columns"], copy=False)
@@ -1,20 +1,36 @@
 import asyncio
-import json
-import pickle
 from typing import Literal
 
-import requests
 import aiohttp
 import numpy as np
 import geopandas as gpd
 import pandas as pd
+from fastapi import HTTPException
 from shapely.geometry import shape
 from loguru import logger
 
+from app.common.api_handler.adaptive_fetcher import AdaptiveFetcher
 from app.dependences import (
     urban_api_handler,
     transportframe_api_handler,
     http_exception,
+    get_config_value,
+)
+from ..accessibility_matrix import SparseAccessibilityMatrix
+from .matrix_transport import make_matrix_reader, MATRIX_ACCEPT_HEADER
+from .towns_transport import (
+    read_towns_response,
+    decode_towns,
+    TOWNS_ACCEPT_HEADER,
+    LEGACY_TOWNS_ACCEPT_HEADER,
+)
+
+bulk_indicators_endpoint = get_config_value("URBAN_API_BULK_INDICATORS_ENDPOINT")
+# legacy pickle towns are accepted until TransportFrame serves GeoParquet
+allow_pickle_towns = get_config_value("TRANSPORTFRAME_ALLOW_PICKLE", "true").lower() == "true"
+population_fetcher = AdaptiveFetcher(
+    initial_limit=15,
+    max_limit=int(get_config_value("POPULATION_MAX_CONCURRENCY", "64")),
 )
 
 
@@ -39,6 +55,47 @@ class PopFrameModelApiService:
         regions_id_list = [i["territory_id"] for i in response]
         return regions_id_list
 
+    @staticmethod
+    async def get_scenario_territory(
+            scenario_id: int,
+            token: str,
+    ) -> gpd.GeoDataFrame:
+        """
+        Function retrieves territory of project the scenario belongs to
+        Args:
+            scenario_id (int): project scenario id in urban db
+            token (str): user token
+        Returns:
+            gpd.GeoDataFrame: project territory in 4326
+        Raises:
+            404, project is missing in scenario data,
+            Any, error from urban api
+        """
+
+        headers = {"Authorization": f"Bearer {token}"}
+        async with aiohttp.ClientSession() as session:
+            scenario = await urban_api_handler.get(
+                endpoint_url=f"/scenarios/{scenario_id}",
+                headers=headers,
+                session=session,
+                use_cache=False,
+            )
+            project_id = (scenario.get("project") or {}).get("project_id")
+            if project_id is None:
+                raise http_exception(
+                    status_code=404,
+                    msg=f"Project ID is missing in scenario {scenario_id} data",
+                    _input={"scenario_id": scenario_id},
+                    _detail={},
+                )
+            territory = await urban_api_handler.get(
+                endpoint_url=f"/projects/{project_id}/territory",
+                headers=headers,
+                session=session,
+                use_cache=False,
+            )
+        return gpd.GeoDataFrame(geometry=[shape(territory["geometry"])], crs=4326)
+
     @staticmethod
     async def get_region_borders(
             region_id: int,
@@ -74,34 +131,82 @@ class PopFrameModelApiService:
             )
 
     @staticmethod
-    async def get_territories_population(territories_ids: list[int]) -> pd.DataFrame:
+    async def get_territories_population_bulk(region_id: int) -> dict[int, int]:
+        """
+        Function retrieves population data for all region territories with bulk indicators endpoint
+        Args:
+            region_id (int): region id
+        Returns:
+            dict[int, int]: population by territory id
+        Raises:
+            Any, error from urban api
+        """
+
+        response = await urban_api_handler.get(
+            endpoint_url=bulk_indicators_endpoint,
+            params={
+                "parent_id": region_id,
+                "indicator_ids": 1,
+                "last_only": "true",
+            }
+        )
+        features = response["features"] if isinstance(response, dict) else response
+        population = {}
+        for feature in features:
+            properties = feature.get("properties", feature)
+            values = [
+                i["value"] for i in properties.get("indicators", []) if i.get("indicator_id") == 1
+            ]
+            if values:
+                population[int(properties["territory_id"])] = int(values[0])
+        return population
+
+    @staticmethod
+    async def get_territories_population(
+            territories_ids: list[int],
+            region_id: int | None = None,
+    ) -> pd.DataFrame:
         """
         Function retrieves population data for provided territories
         Args:
             territories_ids (list): list of territories ids
+            region_id (int | None): region id, used for bulk retrieval if bulk endpoint is configured
         Returns:
             pd.DataFrame with id and population data
         Raises:
             500, internal error in case population data parsing fails
         """
 
-        population_list = []
+        territories_ids = list(dict.fromkeys(territories_ids))
+        population = {}
+        if bulk_indicators_endpoint and region_id is not None:
+            try:
+                bulk_population = await pop_frame_model_api_service.get_territories_population_bulk(region_id)
+                population = {i: bulk_population[i] for i in territories_ids if i in bulk_population}
+                logger.info(
+                    f"Retrieved population for {len(population)} of {len(territories_ids)} territories "
+                    f"with bulk request for region {region_id}"
+                )
+            except Exception as e:
+                logger.warning(f"Bulk population retrieval failed for region {region_id}, fetching by territory: {e}")
+        ids_to_fetch = [i for i in territories_ids if i not in population]
+        population_limiter = population_fetcher.make_limiter()
         async with aiohttp.ClientSession() as session:
-            for item in range(0, len(territories_ids), 15):
-                current_ids = territories_ids[item: item + 15]
-                task_list = [
-                    urban_api_handler.get(
-                        session=session,
-                        endpoint_url=f"/api/v1/territory/{ter_id}/indicator_values",
-                        params={
-                            "indicator_ids": 1
-                        }
-                    ) for ter_id in current_ids
-                ]
-                results = await asyncio.gather(*task_list)
-                pop_to_add = [i[0]["value"] if len(i) > 0 else 1 for i in results]
-                pop_to_add = [int(i) for i in pop_to_add]
-                population_list += pop_to_add
+            async def fetch_population(ter_id: int) -> int:
+                result = await urban_api_handler.get(
+                    session=session,
+                    endpoint_url=f"/api/v1/territory/{ter_id}/indicator_values",
+                    params={
+                        "indicator_ids": 1
+                    }
+                )
+                return int(result[0]["value"]) if len(result) > 0 else 1
+
+            population.update(
+                await population_fetcher.fetch_all(ids_to_fetch, fetch_population, limiter=population_limiter)
+            )
+        logger.info(f"Population retrieval window state: {population_limiter.get_metrics()}")
+        population_list = [population[i] for i in territories_ids]
         try:
             population_df = pd.DataFrame(
                 np.array([territories_ids, population_list]).T,
@@ -122,48 +227,52 @@ class PopFrameModelApiService:
     @staticmethod
     async def get_matrix_for_region(
             region_id: int,
-            graph_type: Literal["car", "walk", "intermodal"]
-    ) -> pd.DataFrame:
+            graph_type: Literal["car", "walk", "intermodal"],
+            max_travel_time: float | None = None,
+    ) -> pd.DataFrame | SparseAccessibilityMatrix:
         """
         Function retrieves matrix for region
         Args:
             region_id (int): region id
             graph_type (Literal["", ""]): graph type
+            max_travel_time (float | None): cutoff in minutes, if provided only pairs within it are kept
         Returns:
-            pd.DataFrame: matrix index-values
+            pd.DataFrame | SparseAccessibilityMatrix: matrix index-values, sparse matrix if cutoff is provided
         Raises:
             404, not found, got empty matrix
             500, internal error, matrix parsing fails
         """
 
-        response = await transportframe_api_handler.get(
-            endpoint_url=f"/{region_id}/get_matrix",
-            params={
-                "graph_type": graph_type,
-            },
-        )
         try:
-            adj_mx = pd.DataFrame(response['values'], index=response['index'], columns=response['columns'])
+            adj_mx = await transportframe_api_handler.get_raw(
+                endpoint_url=f"/{region_id}/get_matrix",
+                response_reader=make_matrix_reader(max_travel_time),
+                headers={"Accept": MATRIX_ACCEPT_HEADER},
+                params={
+                    "graph_type": graph_type,
+                },
+            )
+        except HTTPException as e:
+            raise e
         except Exception as e:
             logger.exception(e)
             raise http_exception(
                 status_code=500,
                 msg=f"error during matrix parsing",
-                _input=response,
+                _input={"region_id": region_id, "graph_type": graph_type},
                 _detail={"Error": str(e)}
             )
-        if adj_mx.empty:
+        if adj_mx.shape[0] == 0:
             logger.warning(f"matrix for region {region_id} is empty")
             raise http_exception(
                 status_code=404,
                 msg=f"matrix for region {region_id} not found",
-                _input=response,
+                _input={"region_id": region_id, "graph_type": graph_type},
                 _detail={}
             )
         return adj_mx
 
 
-    #ToDo Rewrite to api handler
     @staticmethod
     async def get_tf_cities(region_id: int) -> gpd.GeoDataFrame:
         """
@@ -177,19 +286,21 @@ class PopFrameModelApiService:
             500, internal error, matrix parsing fails
         """
 
-        response = requests.get(
-            url=f"{transportframe_api_handler.base_url}/{region_id}/get_towns",
+        content_type, body = await transportframe_api_handler.get_raw(
+            endpoint_url=f"/{region_id}/get_towns",
+            response_reader=read_towns_response,
+            headers={"Accept": LEGACY_TOWNS_ACCEPT_HEADER if allow_pickle_towns else TOWNS_ACCEPT_HEADER},
         )
-        if response.status_code != 200:
-            tmp = json.loads(response.text)
+        try:
+            towns_gdf = await asyncio.to_thread(decode_towns, content_type, body, allow_pickle_towns)
+        except Exception as e:
+            logger.exception(e)
             raise http_exception(
-                response.status_code,
+                status_code=500,
                 msg=f"error during cities parsing",
-                _input=response.request.url,
-                _detail=tmp if tmp is not dict and "detail" not in tmp else tmp["detail"]
+                _input={"region_id": region_id, "content_type": content_type},
+                _detail={"Error": str(e)}
             )
-
-        towns_gdf = pickle.loads(response.content)
         return towns_gdf
 
     # ToDo Rewrite to hash object
@@ -0,0 +1,55 @@
+import io
+import pickle
+
+import aiohttp
+import geopandas as gpd
+
+from app.common.api_handler.api_handler import APIHandler
+
+PARQUET_CONTENT_TYPES = ("application/vnd.apache.parquet", "application/x-parquet")
+PICKLE_CONTENT_TYPE = "application/python-pickle"
+TOWNS_ACCEPT_HEADER = f"{PARQUET_CONTENT_TYPES[0]}, {PARQUET_CONTENT_TYPES[1]};q=0.9"
+LEGACY_TOWNS_ACCEPT_HEADER = f"{TOWNS_ACCEPT_HEADER}, {PICKLE_CONTENT_TYPE};q=0.1"
+PARQUET_MAGIC = b"PAR1"
+
+
+async def read_towns_response(response: aiohttp.ClientResponse) -> tuple[str, bytes] | None:
+    """
+    Function reads towns layer body from TransportFrame response without decoding it
+    Args:
+        response (aiohttp.ClientResponse): response object
+    Returns:
+        tuple[str, bytes] | None: content type and body, None if request should be retried
+    Raises:
+        Any, error from TransportFrame api
+    """
+
+    if response.status != 200:
+        return await APIHandler._check_response_status(response)
+    return response.content_type, await response.read()
+
+
+def decode_towns(content_type: str, body: bytes, allow_pickle: bool = True) -> gpd.GeoDataFrame:
+    """
+    Function decodes towns layer, blocking, should be called in worker thread
+    Args:
+        content_type (str): response content type
+        body (bytes): response body
+        allow_pickle (bool): whether legacy pickle body can be unpickled, allowed until TransportFrame serves GeoParquet
+    Returns:
+        gpd.GeoDataFrame: towns layer
+    Raises:
+        ValueError, if body format is not supported or pickle is not allowed,
+        only bodies declared as application/python-pickle are unpickled
+    """
+
+    if content_type in PARQUET_CONTENT_TYPES or body[:4] == PARQUET_MAGIC:
+        return gpd.read_parquet(io.BytesIO(body))
+    if content_type != PICKLE_CONTENT_TYPE:
+        raise ValueError(f"Towns layer is received as unsupported {content_type}")
+    if not allow_pickle:
+        raise ValueError(
+            f"Towns layer is received as {content_type}, only GeoParquet is accepted. "
+            f"Set TRANSPORTFRAME_ALLOW_PICKLE=true to accept legacy pickle responses"
+        )
+    return pickle.loads(body)
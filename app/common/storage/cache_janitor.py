@@ -0,0 +1,214 @@
+import asyncio
+import shutil
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+from loguru import logger
+
+
+@dataclass
+class CacheArtifact:
+    """Class for unit of cache eviction, all paths are removed together"""
+
+    name: str
+    paths: list[Path]
+    size: int
+    mtime: float
+    protected: bool = False
+
+    @classmethod
+    def from_paths(cls, name: str, paths: list[Path], protected: bool = False) -> "CacheArtifact":
+        """
+        Function builds artifact from existing files and directories
+        Args:
+            name (str): artifact name for reports
+            paths (list[Path]): files and directories of artifact
+            protected (bool): whether artifact is current and can't be evicted
+        Returns:
+            CacheArtifact: artifact with total size and the newest modification time
+        """
+
+        size, mtime = 0, 0.0
+        for path in paths:
+            files = [path] if path.is_file() else [path, *path.rglob("*")]
+            for file in files:
+                try:
+                    stat = file.stat()
+                except FileNotFoundError:
+                    continue
+                size += stat.st_size if file.is_file() else 0
+                mtime = max(mtime, stat.st_mtime)
+        return cls(name=name, paths=paths, size=size, mtime=mtime, protected=protected)
+
+
+@dataclass
+class CacheBudget:
+    """Class for cache retention limits, None means unbounded"""
+
+    max_bytes: int | None = None
+    max_age: float | None = None
+
+
+@dataclass
+class CacheReport:
+    """Class for janitor report of one cache"""
+
+    evicted: int = 0
+    reclaimed_bytes: int = 0
+    total_evicted: int = 0
+    total_reclaimed_bytes: int = 0
+    remaining_bytes: int = 0
+    remaining_artifacts: int = 0
+    last_run: float | None = None
+    last_error: str | None = None
+    evicted_names: list[str] = field(default_factory=list)
+
+
+class CacheJanitor:
+    """Background janitor evicting cache artifacts oldest-first by size and age budgets"""
+
+    def __init__(self, interval: float = 3600, grace_period: float = 3600) -> None:
+        """
+        Initialisation function for cache janitor
+        Args:
+            interval (float): seconds between sweeps
+            grace_period (float): artifacts younger than this are never evicted, protects files being written
+        Returns:
+            None
+        """
+
+        self.interval = interval
+        self.grace_period = grace_period
+        self.caches: dict[str, tuple[Callable[[], list[CacheArtifact]], CacheBudget]] = {}
+        self.reports: dict[str, CacheReport] = {}
+        self._task: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+
+    def register(
+            self,
+            name: str,
+            collect: Callable[[], list[CacheArtifact]],
+            budget: CacheBudget,
+    ) -> None:
+        """
+        Function registers cache for sweeping
+        Args:
+            name (str): cache name
+            collect (Callable[[], list[CacheArtifact]]): function listing cache artifacts, called in worker thread
+            budget (CacheBudget): retention limits
+        Returns:
+            None
+        """
+
+        self.caches[name] = (collect, budget)
+        self.reports[name] = CacheReport()
+
+    @staticmethod
+    def _remove(artifact: CacheArtifact) -> None:
+        for path in artifact.paths:
+            if path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                path.unlink(missing_ok=True)
+
+    def select_evictions(self, artifacts: list[CacheArtifact], budget: CacheBudget, now: float) -> list[CacheArtifact]:
+        """
+        Function selects artifacts to evict: expired ones first, then the oldest until size budget is met
+        Args:
+            artifacts (list[CacheArtifact]): cache artifacts
+            budget (CacheBudget): retention limits
+            now (float): current timestamp
+        Returns:
+            list[CacheArtifact]: artifacts to evict
+        """
+
+        evictable = sorted(
+            (i for i in artifacts if not i.protected and now - i.mtime >= self.grace_period),
+            key=lambda i: i.mtime,
+        )
+        evictions = [i for i in evictable if budget.max_age is not None and now - i.mtime > budget.max_age]
+        if budget.max_bytes is not None:
+            evicted_ids = {id(i) for i in evictions}
+            total = sum(i.size for i in artifacts) - sum(i.size for i in evictions)
+            for artifact in evictable:
+                if total <= budget.max_bytes:
+                    break
+                if id(artifact) not in evicted_ids:
+                    evictions.append(artifact)
+                    total -= artifact.size
+        return evictions
+
+    def _sweep(self, name: str) -> CacheReport:
+        collect, budget = self.caches[name]
+        report = self.reports[name]
+        artifacts = collect()
+        evictions = self.select_evictions(artifacts, budget, time.time())
+        for artifact in evictions:
+            self._remove(artifact)
+        reclaimed = sum(i.size for i in evictions)
+        report.evicted = len(evictions)
+        report.reclaimed_bytes = reclaimed
+        report.total_evicted += len(evictions)
+        report.total_reclaimed_bytes += reclaimed
+        report.remaining_bytes = sum(i.size for i in artifacts) - reclaimed
+        report.remaining_artifacts = len(artifacts) - len(evictions)
+        report.evicted_names = [i.name for i in evictions]
+        report.last_run = time.time()
+        report.last_error = None
+        return report
+
+    async def run_once(self) -> dict[str, dict]:
+        """
+        Function sweeps all registered caches once
+        Returns:
+            dict[str, dict]: reports by cache name
+        """
+
+        async with self._lock:
+            for name in self.caches:
+                try:
+                    report = await asyncio.to_thread(self._sweep, name)
+                    if report.evicted:
+                        logger.info(
+                            f"Cache janitor evicted {report.evicted} artifacts from {name}, "
+                            f"reclaimed {report.reclaimed_bytes / 1024 ** 2:.1f} MB"
+                        )
+                except Exception as e:
+                    logger.exception(f"Cache janitor failed to sweep {name}: {e}")
+                    self.reports[name].last_error = str(e)
+        return self.get_report()
+
+    def get_report(self) -> dict[str, dict]:
+        return {name: report.__dict__.copy() for name, report in self.reports.items()}
+
+    async def _run_forever(self) -> None:
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """
+        Function starts background sweeping in running event loop
+        Returns:
+            None
+        """
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        """
+        Function stops background sweeping
+        Returns:
+            None
+        """
+
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,45 @@
+from app.dependences import geoserver_storage, get_config_value
+from .cache_janitor import CacheJanitor, CacheBudget
+from .models.pop_frame_caching_service import pop_frame_caching_service
+from .snapshots.region_snapshot_store import region_snapshot_store
+
+
+def budget_from_config(prefix: str, max_mb: str | None, max_age_hours: str | None) -> CacheBudget:
+    """
+    Function reads cache budget from config, empty or zero values mean unbounded
+    Args:
+        prefix (str): config keys prefix, keys are {prefix}_MAX_MB and {prefix}_MAX_AGE_HOURS
+        max_mb (str | None): default size budget in megabytes
+        max_age_hours (str | None): default age budget in hours
+    Returns:
+        CacheBudget: cache budget
+    """
+
+    max_mb = float(get_config_value(f"{prefix}_MAX_MB", max_mb) or 0)
+    max_age_hours = float(get_config_value(f"{prefix}_MAX_AGE_HOURS", max_age_hours) or 0)
+    return CacheBudget(
+        max_bytes=int(max_mb * 1024 ** 2) if max_mb > 0 else None,
+        max_age=max_age_hours * 3600 if max_age_hours > 0 else None,
+    )
+
+
+cache_janitor_enabled = get_config_value("CACHE_JANITOR_ENABLED", "true").lower() == "true"
+cache_janitor = CacheJanitor(
+    interval=float(get_config_value("CACHE_JANITOR_INTERVAL_MINUTES", "60")) * 60,
+    grace_period=float(get_config_value("CACHE_JANITOR_GRACE_MINUTES", "60")) * 60,
+)
+cache_janitor.register(
+    "geoserver_layers",
+    geoserver_storage.get_cache_artifacts,
+    budget_from_config("GEOSERVER_CACHE", "5120", "168"),
+)
+cache_janitor.register(
+    "snapshots",
+    region_snapshot_store.get_cache_artifacts,
+    budget_from_config("POPFRAME_SNAPSHOTS", "10240", "720"),
+)
+cache_janitor.register(
+    "models",
+    pop_frame_caching_service.get_cache_artifacts,
+    budget_from_config("POPFRAME_MODEL_CACHE", "20480", None),
+)
@@ -6,10 +6,13 @@ from typing import Any
 import geopandas as gpd
 from idustorage import Cacheable
 
+from .layer_writers import LayerWriter, LAYER_WRITERS
+
 
 class CacheableGeopackageObject(Cacheable):
-    def __init__(self, to_cache: gpd.GeoDataFrame):
+    def __init__(self, to_cache: gpd.GeoDataFrame, writer: LayerWriter = LAYER_WRITERS["gpkg"]):
         self.object = to_cache
+        self.writer = writer
 
     def to_file(
             self,
@@ -26,7 +29,8 @@ class CacheableGeopackageObject(Cacheable):
         filepath += ext
         path_to_file = path / filepath
         try:
-            self.object.to_file(path_to_file)
-        except Exception as error:
-            print(error)
+            self.writer.write(self.object, path_to_file)
+        except Exception:
+            path_to_file.unlink(missing_ok=True)
+            raise
         return filepath
@@ -1,17 +1,37 @@
-import os
+import asyncio
 from datetime import datetime
 from http.client import HTTPException
 from pathlib import Path
 from typing import Literal
 
+import aiofiles
 import geopandas as gpd
+from loguru import logger
 
 from iduconfig import Config
 from idustorage.storage.storage import Storage
 from idugeoserverclient import IduGeoserverClient
 
+from ..cache_janitor import CacheArtifact
 from .geopackage_cacheable import CacheableGeopackageObject
 from .geoserver_dto import PopFrameGeoserverDTO
+from .layer_registry import LayerRegistry
+from .layer_writers import get_layer_writer
+
+
+class AsyncLayerFileStream:
+    """Class for streaming staged layer file to geoserver in chunks without blocking event loop"""
+
+    def __init__(self, path: Path, chunk_size: int = 1024 ** 2) -> None:
+        self.path = path
+        self.name = str(path)
+        self.chunk_size = chunk_size
+
+    async def __aiter__(self):
+        async with aiofiles.open(self.path, "rb") as fin:
+            while chunk := await fin.read(self.chunk_size):
+                yield chunk
+
 
 class GeoserverStorage:
     """
@@ -22,12 +42,14 @@ class GeoserverStorage:
             self,
             cache_path: Path,
             config: Config,
+            staging_format: str = "gpkg",
     ) -> None:
         """
         Initialisation function gor geoserver storage class
         Args:
             cache_path (Path): Path to the cache file
             config (Config): Config
+            staging_format (str): format layers are serialized to before upload
         """
 
         self.config = config
@@ -38,6 +60,10 @@ class GeoserverStorage:
         self.geoserver_client = IduGeoserverClient(
             config=config,
         )
+        self.layer_writer = get_layer_writer(staging_format, target="geoserver")
+        self.layer_registry = LayerRegistry(cache_path)
+        self._layers_cache: dict[tuple[int, str], PopFrameGeoserverDTO] = {}
+        self._layers_cache_revision = self.layer_registry.revision
 
     async def save_gdf_to_geoserver(
             self,
@@ -46,38 +72,117 @@ class GeoserverStorage:
             region_id: int,
             layer_type: Literal["cities", "agglomerations"],
     ) -> None:
+        """
+        Function serializes layer in worker thread and streams it to geoserver
+        Args:
+            layer (gpd.GeoDataFrame): layer to publish
+            name (str): layer name
+            region_id (int): Region ID
+            layer_type (Literal["cities", "agglomerations"]): layer type
+        Returns:
+            None
+        Raises:
+            Any, serialization or upload error, staged file is removed
+        """
 
+        self._layers_cache.pop((region_id, layer_type), None)
         created_at = datetime.now()
-        frame = CacheableGeopackageObject(layer)
-        geopackage_name = self.storage.save(
+        frame = CacheableGeopackageObject(layer, self.layer_writer)
+        geopackage_name = await asyncio.to_thread(
+            self.storage.save,
             frame,
             name,
-            ".gpkg",
+            self.layer_writer.ext,
             created_at,
             region_id,
             layer_type
         )
-
+        geopackage_path = self.storage.cache_path / geopackage_name
         try:
-            with open(self.storage.cache_path / geopackage_name, "rb") as fin:
-                await self.geoserver_client.upload_layer(
-                    self.config.get("GEOSERVER_WORKSPACE"),
-                    fin,
-                    "popframe",
-                    created_at,
-                    True,
-                    None,
-                    region_id,
-                    layer_type
-                )
+            await self.geoserver_client.upload_layer(
+                self.config.get("GEOSERVER_WORKSPACE"),
+                AsyncLayerFileStream(geopackage_path),
+                "popframe",
+                created_at,
+                True,
+                None,
+                region_id,
+                layer_type
+            )
         except Exception as e:
-            print(e)
+            logger.exception(f"Failed to upload {layer_type} layer for region {region_id} to geoserver: {e}")
+            geopackage_path.unlink(missing_ok=True)
+            raise
+        self.layer_registry.register(region_id, layer_type, geopackage_name, created_at)
+
+    async def publish_layers(
+            self,
+            layers: dict[Literal["cities", "agglomerations"], gpd.GeoDataFrame],
+            name: str,
+            region_id: int,
+    ) -> None:
+        """
+        Function publishes several layers of region concurrently
+        Args:
+            layers (dict[Literal["cities", "agglomerations"], gpd.GeoDataFrame]): layers by layer type
+            name (str): layers name
+            region_id (int): Region ID
+        Returns:
+            None
+        Raises:
+            Any, first publishing error after all layers are finished
+        """
+
+        results = await asyncio.gather(
+            *[
+                self.save_gdf_to_geoserver(layer=layer, name=name, region_id=region_id, layer_type=layer_type)
+                for layer_type, layer in layers.items()
+            ],
+            return_exceptions=True,
+        )
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            raise errors[0]
+
+    @staticmethod
+    def _dto_from_href(href: str) -> PopFrameGeoserverDTO:
+        split_layer = '.'.join(href.split('.')[:-1]).split('/')[2:]
+        return PopFrameGeoserverDTO(
+            f"http://{split_layer[0]}",
+            split_layer[4],
+            split_layer[6],
+            href
+        )
 
     async def get_layer_from_geoserver(
             self,
             region_id: int,
             layer_type: Literal["cities", "agglomerations"]
     ) -> PopFrameGeoserverDTO:
+        """
+        Function returns published layer href, resolved hrefs are cached until layer is republished
+        Args:
+            region_id (int): Region ID
+            layer_type (Literal["cities", "agglomerations"]): layer type
+        Returns:
+            PopFrameGeoserverDTO: layer data
+        Raises:
+            404, layer not found
+            500, multiple layers found
+        """
+
+        key = (region_id, layer_type)
+        record = self.layer_registry.get(region_id, layer_type)
+        if self.layer_registry.revision != self._layers_cache_revision:
+            # registry was changed by another worker, resolved layers may be outdated
+            self._layers_cache.clear()
+            self._layers_cache_revision = self.layer_registry.revision
+        if key in self._layers_cache:
+            return self._layers_cache[key]
+        if record is not None and record.href is not None:
+            self._layers_cache[key] = self._dto_from_href(record.href)
+            return self._layers_cache[key]
+
         layer = await self.geoserver_client.get_layers(
             self.config.get("GEOSERVER_WORKSPACE"), "popframe", region_id, layer_type
         )
@@ -87,13 +192,27 @@ class GeoserverStorage:
             raise HTTPException(404, "LAYER_NOT_FOUND")
 
         target_layer = layer[0]
-        split_layer = '.'.join(target_layer.href.split('.')[:-1]).split('/')[2:]
-        return PopFrameGeoserverDTO(
-            f"http://{split_layer[0]}",
-            split_layer[4],
-            split_layer[6],
-            target_layer.href
-        )
+        self.layer_registry.set_href(region_id, layer_type, target_layer.href)
+        self._layers_cache[key] = self._dto_from_href(target_layer.href)
+        return self._layers_cache[key]
+
+    async def get_layers_from_geoserver(
+            self,
+            region_id: int,
+            layer_types: list[Literal["cities", "agglomerations"]],
+    ) -> list[PopFrameGeoserverDTO]:
+        """
+        Function resolves several layers of region concurrently
+        Args:
+            region_id (int): Region ID
+            layer_types (list[Literal["cities", "agglomerations"]]): layer types
+        Returns:
+            list[PopFrameGeoserverDTO]: layers data in order of layer types
+        """
+
+        return list(await asyncio.gather(
+            *[self.get_layer_from_geoserver(region_id, layer_type) for layer_type in layer_types]
+        ))
 
     async def check_cached_layers(
             self,
@@ -108,18 +227,31 @@ class GeoserverStorage:
             bool: weather model exists
         """
 
-        files = list(self.storage.cache_path.iterdir())
-        filenames = [os.path.split(i)[-1] for i in files]
-        for filename in filenames:
-            file_name_list = filename.split("_")
-            if file_name_list[2] == str(region_id) and file_name_list[3].split(".")[0] == layer_type:
-                return True
-        return False
+        return self.layer_registry.get(region_id, layer_type) is not None
+
+    def get_cache_artifacts(self) -> list[CacheArtifact]:
+        """
+        Function lists staged layers files, currently registered layers are protected from eviction
+        Returns:
+            list[CacheArtifact]: staged layers files
+        """
+
+        current = {record.path for record in list(self.layer_registry.records.values())}
+        return [
+            CacheArtifact.from_paths(file.name, [file], protected=file.name in current)
+            for file in self.storage.cache_path.iterdir()
+            if file.is_file() and file != self.layer_registry.registry_path and not file.name.startswith(".")
+        ]
 
     async def delete_geoserver_cached_layers(self, region_id: int) -> None:
+        """
+        Function deletes staged layers files of region
+        Args:
+            region_id (int): Region ID
+        Returns:
+            None
+        """
 
-        files = list(self.storage.cache_path.iterdir())
-        filenames = [os.path.split(i)[-1] for i in files]
-        for filename in filenames:
-            if filename.split("_")[2] == str(region_id):
-                os.remove(self.storage.cache_path / filename)
+        for key in [key for key in self._layers_cache if key[0] == region_id]:
+            self._layers_cache.pop(key)
+        self.layer_registry.delete_region(region_id)
@@ -0,0 +1,229 @@
+import json
+import os
+import re
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator
+
+from loguru import logger
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+REGISTRY_FORMAT_VERSION = 1
+LEGACY_LAYER_FILENAME = re.compile(
+    r"^(?P<date>\d{4}-\d{2}-\d{2}-\d{2}-\d{2}-\d{2})_.+_(?P<region_id>\d+)_(?P<layer_type>[a-z]+)\.[a-z]+$"
+)
+
+
+@dataclass
+class LayerRecord:
+    """Class for registry record of the current layer of region"""
+
+    path: str
+    uploaded_at: str
+    href: str | None = None
+
+
+class LayerRegistry:
+    """
+    Registry of published geoserver layers persisted alongside layers cache.
+    Maps (region_id, layer_type) to the current staged file, upload time and resolved href.
+    Registry is shared by workers: file is re-read when it changes and is modified under file lock
+    """
+
+    def __init__(self, cache_path: Path, registry_name: str = "layers_registry.json") -> None:
+        """
+        Initialisation function for layer registry
+        Args:
+            cache_path (Path): path to layers cache directory
+            registry_name (str): registry file name inside cache directory
+        Returns:
+            None
+        """
+
+        self.cache_path = cache_path
+        self.registry_path = cache_path / registry_name
+        self.lock_path = cache_path / f".{registry_name}.lock"
+        self.revision = 0
+        self._records: dict[tuple[int, str], LayerRecord] | None = None
+        self._stat: tuple[int, int, int] | None = None
+
+    @property
+    def records(self) -> dict[tuple[int, str], LayerRecord]:
+        if self._records is None or self._file_stat() != self._stat:
+            with self._locked():
+                self._reload()
+        return self._records
+
+    def _file_stat(self) -> tuple[int, int, int] | None:
+        try:
+            stat = os.stat(self.registry_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _reload(self) -> None:
+        """
+        Function reads registry if file was changed by any worker since the last read, should be called under lock
+        Returns:
+            None
+        """
+
+        stat = self._file_stat()
+        if self._records is not None and stat is not None and stat == self._stat:
+            return
+        self._records = self._load()
+        self._stat = self._file_stat()
+        self.revision += 1
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        self.cache_path.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _load(self) -> dict[tuple[int, str], LayerRecord]:
+        if not self.registry_path.exists():
+            records = self._migrate_legacy_files()
+            self._write(records)
+            return records
+        try:
+            data = json.loads(self.registry_path.read_text(encoding="utf-8"))
+            return {
+                (int(record.pop("region_id")), record.pop("layer_type")): LayerRecord(**record)
+                for record in data["layers"]
+            }
+        except Exception as e:
+            logger.exception(f"Layer registry {self.registry_path} is corrupted, rebuilding from cache files: {e}")
+            records = self._migrate_legacy_files()
+            self._write(records)
+            return records
+
+    def _migrate_legacy_files(self) -> dict[tuple[int, str], LayerRecord]:
+        """
+        Function builds registry from staged files named by date_name_regionid_layertype pattern.
+        Only the newest file per region and layer type is registered, older duplicates are removed
+        Returns:
+            dict[tuple[int, str], LayerRecord]: registry records
+        """
+
+        records = {}
+        for file in sorted(self.cache_path.iterdir()):
+            matched = LEGACY_LAYER_FILENAME.match(file.name)
+            if not matched:
+                continue
+            key = (int(matched["region_id"]), matched["layer_type"])
+            if key in records:
+                self._remove_file(records[key].path)
+            uploaded_at = datetime.strptime(matched["date"], "%Y-%m-%d-%H-%M-%S").isoformat()
+            records[key] = LayerRecord(path=file.name, uploaded_at=uploaded_at)
+        logger.info(f"Migrated {len(records)} cached layers to registry {self.registry_path}")
+        return records
+
+    def _write(self, records: dict[tuple[int, str], LayerRecord]) -> None:
+        data = {
+            "version": REGISTRY_FORMAT_VERSION,
+            "layers": [
+                {"region_id": region_id, "layer_type": layer_type, **asdict(record)}
+                for (region_id, layer_type), record in sorted(records.items())
+            ],
+        }
+        tmp_path = self.registry_path.with_name(f".{self.registry_path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp_path, self.registry_path)
+        self._stat = self._file_stat()
+
+    def _remove_file(self, filename: str) -> None:
+        try:
+            (self.cache_path / filename).unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning(f"Failed to remove cached layer {filename}: {e}")
+
+    def get(self, region_id: int, layer_type: str) -> LayerRecord | None:
+        """
+        Function returns current record for region layer
+        Args:
+            region_id (int): region id
+            layer_type (str): layer type
+        Returns:
+            LayerRecord | None: record, None if layer is not registered or its file is missing
+        """
+
+        record = self.records.get((region_id, layer_type))
+        if record is None or not (self.cache_path / record.path).exists():
+            return None
+        return record
+
+    def register(self, region_id: int, layer_type: str, path: str, uploaded_at: datetime) -> LayerRecord:
+        """
+        Function registers newly uploaded layer, previous staged file for the same layer is removed
+        Args:
+            region_id (int): region id
+            layer_type (str): layer type
+            path (str): staged file name inside cache directory
+            uploaded_at (datetime): upload time
+        Returns:
+            LayerRecord: new record
+        """
+
+        record = LayerRecord(path=path, uploaded_at=uploaded_at.isoformat())
+        with self._locked():
+            self._reload()
+            previous = self._records.get((region_id, layer_type))
+            self._records[(region_id, layer_type)] = record
+            self._write(self._records)
+            if previous is not None and previous.path != path:
+                self._remove_file(previous.path)
+        return record
+
+    def set_href(self, region_id: int, layer_type: str, href: str) -> None:
+        """
+        Function stores resolved geoserver href for registered layer
+        Args:
+            region_id (int): region id
+            layer_type (str): layer type
+            href (str): geoserver href
+        Returns:
+            None
+        """
+
+        with self._locked():
+            self._reload()
+            record = self._records.get((region_id, layer_type))
+            if record is None or record.href == href:
+                return
+            record.href = href
+            self._write(self._records)
+
+    def delete_region(self, region_id: int) -> list[str]:
+        """
+        Function removes all registered layers of region with their staged files
+        Args:
+            region_id (int): region id
+        Returns:
+            list[str]: removed file names
+        """
+
+        with self._locked():
+            self._reload()
+            keys = [key for key in self._records if key[0] == region_id]
+            if not keys:
+                return []
+            removed = [self._records.pop(key).path for key in keys]
+            self._write(self._records)
+            for filename in removed:
+                self._remove_file(filename)
+        return removed
@@ -0,0 +1,72 @@
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import Callable
+
+import geopandas as gpd
+
+
+@dataclass(frozen=True)
+class LayerWriter:
+    """Class for layer staging format"""
+
+    name: str
+    ext: str
+    write: Callable[[gpd.GeoDataFrame, Path], None]
+
+
+def write_ogr(gdf: gpd.GeoDataFrame, path: Path, driver: str, **layer_options) -> None:
+    """
+    Function writes layer through pyogrio arrow path, avoiding per feature python inserts
+    Args:
+        gdf (gpd.GeoDataFrame): layer to write
+        path (Path): output file path
+        driver (str): OGR driver name
+        **layer_options: OGR layer creation options
+    Returns:
+        None
+    """
+
+    gdf.to_file(path, driver=driver, engine="pyogrio", use_arrow=True, **layer_options)
+
+
+def write_parquet(gdf: gpd.GeoDataFrame, path: Path) -> None:
+    gdf.to_parquet(path)
+
+
+LAYER_WRITERS = {
+    writer.name: writer
+    for writer in [
+        LayerWriter("gpkg", ".gpkg", partial(write_ogr, driver="GPKG")),
+        LayerWriter("gpkg_no_index", ".gpkg", partial(write_ogr, driver="GPKG", SPATIAL_INDEX="NO")),
+        LayerWriter("fgb", ".fgb", partial(write_ogr, driver="FlatGeobuf")),
+        LayerWriter("parquet", ".parquet", write_parquet),
+    ]
+}
+
+# formats accepted by upload targets, geoserver client publishes only geopackages
+UPLOAD_TARGET_FORMATS = {
+    "geoserver": ("gpkg", "gpkg_no_index"),
+}
+
+
+def get_layer_writer(staging_format: str, target: str | None = None) -> LayerWriter:
+    """
+    Function returns layer writer for staging format
+    Args:
+        staging_format (str): format name from LAYER_WRITERS
+        target (str | None): upload target name, if provided format is validated against it
+    Returns:
+        LayerWriter: layer writer
+    Raises:
+        ValueError, if format is unknown or not accepted by target
+    """
+
+    if staging_format not in LAYER_WRITERS:
+        raise ValueError(f"Unknown layer staging format {staging_format}, available: {list(LAYER_WRITERS)}")
+    if target is not None and staging_format not in UPLOAD_TARGET_FORMATS.get(target, LAYER_WRITERS):
+        raise ValueError(
+            f"Layer staging format {staging_format} is not accepted by {target}, "
+            f"available: {list(UPLOAD_TARGET_FORMATS[target])}"
+        )
+    return LAYER_WRITERS[staging_format]
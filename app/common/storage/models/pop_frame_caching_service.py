@@ -1,18 +1,40 @@
 import asyncio
+import os
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 from loguru import logger
 
-from popframe.models.region import Region
-from app.dependences import http_exception, config
+from app.dependences import http_exception, config, get_config_value
+from app.common.models.popframe_models import popframe_methods
+from app.common.models.popframe_models.accessibility_matrix import (
+    CompactAccessibilityMatrix,
+    SparseAccessibilityMatrix,
+    load_accessibility_matrix,
+)
+from ..cache_janitor import CacheArtifact
 from .caching_serivce import CachingService
+from .resident_models import ResidentModelCache, measure_model
+
+if TYPE_CHECKING:
+    from popframe.models.region import Region
 
 class PopFrameCachingService(CachingService):
     """Popframe model caching service"""
 
-    def __init(self, popframe_cache_path: Path):
+    def __init__(self, popframe_cache_path: Path, resident_models: ResidentModelCache | None = None) -> None:
+        """
+        Function initialize popframe caching service
+        Args:
+            popframe_cache_path (Path): path to models cache directory
+            resident_models (ResidentModelCache | None): in-memory cache of loaded models, disabled if not provided
+        Returns:
+            None
+        """
 
         super().__init__(popframe_cache_path)
+        self.resident_models = resident_models or ResidentModelCache(max_models=0)
+        self._load_locks: dict[int, asyncio.Lock] = {}
 
     async def check_path(self, region_id: int) -> bool:
         """
@@ -36,26 +58,135 @@ class PopFrameCachingService(CachingService):
         Function returns all cached models
         """
 
-        files = list(self.caching_path.iterdir())
+        files = list(self.caching_path.glob("*.pkl"))
         if len(files) > 0:
             regions = [int(file.name.split(".")[0]) for file in files]
         else:
             regions = []
         return regions
 
-    async def cache_model_to_pickle(self, region_model: Region, region_id: int) -> None:
+    def get_matrix_path(self, region_id: int) -> Path:
+        """
+        Function returns path to compact accessibility matrix stored next to the model
+        Args:
+            region_id (int): region id
+        Returns:
+            Path: path to .npz file
+        """
+
+        return self.caching_path.joinpath(f"{region_id}.matrix.npz")
+
+    def get_reachability_path(self, region_id: int) -> Path:
+        """
+        Function returns path to towns reachability index derived from the model
+        Args:
+            region_id (int): region id
+        Returns:
+            Path: path to .npz file
+        """
+
+        return self.caching_path.joinpath(f"{region_id}.reachability.npz")
+
+    def get_landuse_layer_path(self, region_id: int) -> Path:
+        """
+        Function returns path to region landuse layer stored with the model
+        Args:
+            region_id (int): region id
+        Returns:
+            Path: path to .parquet file
+        """
+
+        return self.caching_path.joinpath(f"{region_id}.landuse.parquet")
+
+    def get_model_version(self, region_id: int) -> tuple[int, int] | None:
+        """
+        Function returns version of stored model, files are replaced atomically on recalculation,
+        so version changes when any worker recalculates the model
+        Args:
+            region_id (int): region id
+        Returns:
+            tuple[int, int] | None: modification times of pickle and matrix in ns, None if model isn't stored
+        """
+
+        try:
+            model_mtime = os.stat(self.caching_path.joinpath(f"{region_id}.pkl")).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        try:
+            matrix_mtime = os.stat(self.get_matrix_path(region_id)).st_mtime_ns
+        except FileNotFoundError:
+            matrix_mtime = 0
+        return model_mtime, matrix_mtime
+
+    def get_cache_artifacts(self) -> list[CacheArtifact]:
+        """
+        Function lists cached models with their matrix and derived files as one artifact. Evicted models are
+        recalculated on the next request, so only models resident in memory are protected and the rest are evicted
+        by budgets from the oldest built. Temporary files of interrupted writes and matrix or derived files
+        without model are evictable leftovers
+        Returns:
+            list[CacheArtifact]: cached models and leftovers
+        """
+
+        artifacts, model_paths = [], set()
+        for file in self.caching_path.glob("*.pkl"):
+            if not file.stem.isdigit():
+                continue
+            region_id = int(file.stem)
+            paths = [
+                path for path in (
+                    file,
+                    self.get_matrix_path(region_id),
+                    self.get_reachability_path(region_id),
+                    self.get_landuse_layer_path(region_id),
+                ) if path.exists()
+            ]
+            model_paths.update(paths)
+            artifacts.append(CacheArtifact.from_paths(
+                file.name,
+                paths,
+                protected=self.resident_models.peek(region_id) is not None,
+            ))
+        for file in self.caching_path.iterdir():
+            if file.is_file() and file not in model_paths and (
+                    ".tmp" in file.name or file.suffix in (".npz", ".parquet")
+            ):
+                artifacts.append(CacheArtifact.from_paths(file.name, [file]))
+        return artifacts
+
+    async def cache_model_to_pickle(
+            self,
+            region_model: "Region",
+            region_id: int,
+            accessibility_matrix: CompactAccessibilityMatrix | SparseAccessibilityMatrix | None = None,
+    ) -> None:
         """
         Function caches popframe model to pickle
         Args:
             region_model (Region): popframe region model to cache
             region_id (int): region id
+            accessibility_matrix (CompactAccessibilityMatrix | SparseAccessibilityMatrix | None): compact or sparse
+            model matrix, if provided it is stored next to the model instead of pickling dense matrix
         Returns:
             None
         """
 
         string_path = self.caching_path.joinpath(".".join([str(region_id), "pkl"])).__str__()
+        matrix_path = self.get_matrix_path(region_id)
+        dense_matrix = getattr(region_model, "accessibility_matrix", None)
         try:
-            region_model.to_pickle(string_path),
+            # files are written aside and replaced, so other workers never load partially written model
+            if accessibility_matrix is not None and dense_matrix is not None:
+                tmp_matrix_path = matrix_path.with_name(f"{region_id}.matrix.tmp.npz")
+                accessibility_matrix.save(tmp_matrix_path)
+                os.replace(tmp_matrix_path, matrix_path)
+                region_model.accessibility_matrix = None
+            elif matrix_path.exists():
+                matrix_path.unlink()
+            region_model.to_pickle(f"{string_path}.tmp")
+            os.replace(f"{string_path}.tmp", string_path)
+            self.get_reachability_path(region_id).unlink(missing_ok=True)
+            self.get_landuse_layer_path(region_id).unlink(missing_ok=True)
             logger.info(f"Cached file {region_id} to {string_path}")
         except Exception as e:
             logger.exception(e)
@@ -68,13 +199,79 @@ class PopFrameCachingService(CachingService):
                     "available_files": await self.get_available_models()
                 }
             )
+        finally:
+            if dense_matrix is not None:
+                region_model.accessibility_matrix = dense_matrix
+            self.resident_models.invalidate(region_id)
+
+    def _load_model(self, model_path: str, region_id: int) -> "Region":
+        """
+        Function loads model from pickle and attaches compact matrix if it is stored separately
+        Args:
+            model_path (str): path to pickle
+            region_id (int): region id
+        Returns:
+            Region: popframe region model
+        """
+
+        model = popframe_methods.Region.from_pickle(model_path)
+        matrix_path = self.get_matrix_path(region_id)
+        if getattr(model, "accessibility_matrix", True) is None and matrix_path.exists():
+            model.accessibility_matrix = load_accessibility_matrix(matrix_path).to_frame()
+        return model
+
+    def _load_resident_model(self, model_path: str, region_id: int) -> tuple["Region", dict[str, int] | None]:
+        model = self._load_model(model_path, region_id)
+        return model, measure_model(model) if self.resident_models.enabled else None
+
+    def preload_models(self, region_ids: list[int]) -> list[int]:
+        """
+        Function synchronously loads models into resident cache, e.g. in gunicorn master before workers are forked,
+        so workers share them copy-on-write
+        Args:
+            region_ids (list[int]): regions to preload, only as many as resident cache keeps are loaded
+        Returns:
+            list[int]: preloaded regions
+        """
+
+        loaded = []
+        for region_id in region_ids[:self.resident_models.max_models]:
+            version = self.get_model_version(region_id)
+            if version is None:
+                logger.warning(f"No cached model to preload for region {region_id}")
+                continue
+            model_path = self.caching_path.joinpath(f"{region_id}.pkl").__str__()
+            try:
+                model, parts = self._load_resident_model(model_path, region_id)
+            except Exception as e:
+                logger.exception(f"Failed to preload model for region {region_id}: {e}")
+                continue
+            self.resident_models.put(region_id, model, parts, version)
+            loaded.append(region_id)
+        return loaded
+
+    def get_preload_regions(self, setting: str | None) -> list[int]:
+        """
+        Function resolves regions to preload
+        Args:
+            setting (str | None): comma separated regions ids, all for every cached model,
+            if empty the most recently calculated models are preloaded
+        Returns:
+            list[int]: regions ids
+        """
+
+        if setting and setting.strip().lower() != "all":
+            return [int(i) for i in setting.split(",") if i.strip()]
+        files = sorted(self.caching_path.glob("*.pkl"), key=lambda i: i.stat().st_mtime, reverse=True)
+        return [int(file.stem) for file in files]
 
     async def load_cached_model(
             self,
             region_id: int
     ):
         """
-        Function loads model from cache
+        Function loads model from cache, resident models are returned without reading pickle unless
+        stored model was recalculated since, concurrent loads of the same region are done once
         Args:
             region_id (int): region id
         Returns:
@@ -83,9 +280,18 @@ class PopFrameCachingService(CachingService):
             500, Error during model loading
         """
 
+        version = self.get_model_version(region_id)
+        model = self.resident_models.get(region_id, version)
+        if model is not None:
+            return model
         model_to_load = self.caching_path.joinpath(".".join([str(region_id), "pkl"])).__str__()
         try:
-            model = await asyncio.to_thread(Region.from_pickle, model_to_load)
+            async with self._load_locks.setdefault(region_id, asyncio.Lock()):
+                model = self.resident_models.peek(region_id, version)
+                if model is not None:
+                    return model
+                model, parts = await asyncio.to_thread(self._load_resident_model, model_to_load, region_id)
+                self.resident_models.put(region_id, model, parts, version)
             logger.info(f"Loaded file {region_id} to {model_to_load}")
             return model
         except Exception as e:
@@ -97,6 +303,14 @@ class PopFrameCachingService(CachingService):
             )
 
 
+resident_models_max_mb = float(get_config_value("POPFRAME_RESIDENT_MODELS_MAX_MB", "4096") or 0)
+resident_derived_max_mb = float(get_config_value("POPFRAME_RESIDENT_DERIVED_MAX_MB", "512") or 0)
 pop_frame_caching_service = PopFrameCachingService(
-    Path().absolute() / config.get("POPFRAME_MODEL_CACHE")
+    Path().absolute() / config.get("POPFRAME_MODEL_CACHE"),
+    ResidentModelCache(
+        max_models=int(get_config_value("POPFRAME_RESIDENT_MODELS", "2")),
+        max_bytes=int(resident_models_max_mb * 1024 ** 2) if resident_models_max_mb > 0 else None,
+        max_derived=int(get_config_value("POPFRAME_RESIDENT_DERIVED_MAX", "64")),
+        max_derived_bytes=int(resident_derived_max_mb * 1024 ** 2) if resident_derived_max_mb > 0 else None,
+    ),
 )
@@ -0,0 +1,320 @@
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+import pandas as pd
+import shapely
+from geopandas.array import GeometryDtype
+from shapely.geometry.base import BaseGeometry
+
+GEOMETRY_OVERHEAD_BYTES = 112
+COORDINATE_BYTES = 16
+
+
+def geometry_nbytes(geometries: np.ndarray) -> int:
+    """
+    Function estimates memory held by GEOS geometries, which sys.getsizeof doesn't see
+    Args:
+        geometries (np.ndarray): array of shapely geometries
+    Returns:
+        int: estimated size in bytes
+    """
+
+    geometries = geometries[~shapely.is_missing(geometries)]
+    return int(shapely.get_num_coordinates(geometries).sum()) * COORDINATE_BYTES + len(geometries) * GEOMETRY_OVERHEAD_BYTES
+
+
+def _pandas_nbytes(obj: pd.DataFrame | pd.Series | pd.Index) -> int:
+    if isinstance(obj, pd.DataFrame):
+        size = int(obj.memory_usage(deep=True, index=True).sum())
+        columns = [obj.iloc[:, i] for i, dtype in enumerate(obj.dtypes) if isinstance(dtype, GeometryDtype)]
+    else:
+        size = int(obj.memory_usage(deep=True))
+        columns = [obj] if isinstance(obj.dtype, GeometryDtype) else []
+    for column in columns:
+        size += geometry_nbytes(np.asarray(column.values, dtype=object))
+    return size
+
+
+def deep_sizeof(obj: Any, seen: set[int] | None = None) -> int:
+    """
+    Function estimates memory retained by object graph, shared objects are counted once per seen set
+    Args:
+        obj (Any): object to measure
+        seen (set[int] | None): ids of already counted objects, shared between calls to attribute shared data
+    Returns:
+        int: size in bytes
+    """
+
+    seen = set() if seen is None else seen
+    size = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, type):
+            continue
+        seen.add(id(current))
+        if isinstance(current, np.ndarray):
+            if current.base is None:
+                size += sys.getsizeof(current) if current.flags.owndata else current.nbytes
+            else:
+                stack.append(current.base)
+            if current.dtype == object:
+                stack.extend(current.ravel())
+        elif isinstance(current, (pd.DataFrame, pd.Series, pd.Index)):
+            size += _pandas_nbytes(current)
+        elif isinstance(current, BaseGeometry):
+            size += geometry_nbytes(np.array([current], dtype=object))
+        elif isinstance(current, (str, bytes, bytearray, int, float, bool, complex)) or current is None:
+            size += sys.getsizeof(current)
+        elif isinstance(current, dict):
+            size += sys.getsizeof(current)
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            size += sys.getsizeof(current)
+            stack.extend(current)
+        else:
+            size += sys.getsizeof(current)
+            if hasattr(current, "__dict__"):
+                stack.append(vars(current))
+            for slot in getattr(type(current), "__slots__", ()):
+                if hasattr(current, slot):
+                    stack.append(getattr(current, slot))
+    return size
+
+
+def measure_model(model: Any) -> dict[str, int]:
+    """
+    Function measures memory of model attributes, e.g. towns, borders and accessibility matrix
+    Args:
+        model (Any): popframe region model
+    Returns:
+        dict[str, int]: size in bytes by attribute name, data shared between attributes is counted once
+    """
+
+    seen = {id(model)}
+    parts = {name: deep_sizeof(value, seen) for name, value in vars(model).items()}
+    parts["object"] = sys.getsizeof(model)
+    return parts
+
+
+@dataclass
+class ResidentModel:
+    """Class for model kept in memory with its derived results"""
+
+    model: Any
+    parts: dict[str, int]
+    version: Any = None
+    derived: OrderedDict[str, Any] = field(default_factory=OrderedDict)
+    derived_sizes: dict[str, int] = field(default_factory=dict)
+    loaded_at: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.time)
+    hits: int = 0
+
+    @property
+    def derived_bytes(self) -> int:
+        return sum(self.derived_sizes.values())
+
+    @property
+    def size(self) -> int:
+        return sum(self.parts.values()) + self.derived_bytes
+
+    def pop_oldest_derived(self) -> None:
+        key, _ = self.derived.popitem(last=False)
+        self.derived_sizes.pop(key)
+
+
+class ResidentModelCache:
+    """LRU cache of loaded models and their derived results with memory accounting"""
+
+    def __init__(
+            self,
+            max_models: int = 4,
+            max_bytes: int | None = None,
+            max_derived: int = 64,
+            max_derived_bytes: int | None = None,
+    ) -> None:
+        """
+        Initialisation function for resident models cache
+        Args:
+            max_models (int): number of models kept in memory, 0 disables cache
+            max_bytes (int | None): memory budget, the least recently used models are evicted above it,
+            then derived results of the most recent model, the most recent model itself is always kept
+            max_derived (int): number of derived results kept per model, the least recently used are dropped
+            max_derived_bytes (int | None): memory budget of derived results per model
+        Returns:
+            None
+        """
+
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self.max_derived = max_derived
+        self.max_derived_bytes = max_derived_bytes
+        self.entries: OrderedDict[int, ResidentModel] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale = 0
+        self.derived_hits = 0
+        self.derived_misses = 0
+        self.derived_evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_models > 0
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(entry.size for entry in self.entries.values())
+
+    def get(self, region_id: int, version: Any = None) -> Any | None:
+        """
+        Function returns resident model and marks it as recently used
+        Args:
+            region_id (int): region id
+            version (Any): current version of stored model, resident model of other version is dropped as stale
+        Returns:
+            Any | None: model or None if it isn't loaded or is stale
+        """
+
+        entry = self.entries.get(region_id)
+        if entry is not None and version is not None and entry.version != version:
+            self.entries.pop(region_id)
+            self.stale += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        entry.hits += 1
+        entry.last_used = time.time()
+        self.entries.move_to_end(region_id)
+        return entry.model
+
+    def peek(self, region_id: int, version: Any = None) -> Any | None:
+        entry = self.entries.get(region_id)
+        if entry is None or (version is not None and entry.version != version):
+            return None
+        return entry.model
+
+    def put(self, region_id: int, model: Any, parts: dict[str, int] | None = None, version: Any = None) -> None:
+        """
+        Function keeps model in memory, previous model and its derived results for region are dropped
+        Args:
+            region_id (int): region id
+            model (Any): loaded model
+            parts (dict[str, int] | None): model memory by attribute, measured if not provided
+            version (Any): version of stored model the resident one was loaded from
+        Returns:
+            None
+        """
+
+        if not self.enabled:
+            return
+        self.entries.pop(region_id, None)
+        self.entries[region_id] = ResidentModel(
+            model=model,
+            parts=parts if parts is not None else measure_model(model),
+            version=version,
+        )
+        self._enforce_budget()
+
+    def invalidate(self, region_id: int) -> None:
+        self.entries.pop(region_id, None)
+
+    def get_derived(self, region_id: int, key: str) -> Any | None:
+        """
+        Function returns cached result derived from resident model
+        Args:
+            region_id (int): region id
+            key (str): result key, e.g. method name with parameters
+        Returns:
+            Any | None: result or None if it isn't cached
+        """
+
+        entry = self.entries.get(region_id)
+        if entry is None or key not in entry.derived:
+            self.derived_misses += 1
+            return None
+        self.derived_hits += 1
+        entry.derived.move_to_end(key)
+        return entry.derived[key]
+
+    def set_derived(self, region_id: int, key: str, value: Any) -> None:
+        """
+        Function caches result derived from resident model, it lives as long as the model
+        or until it is the least recently used one above derived results budget
+        Args:
+            region_id (int): region id
+            key (str): result key
+            value (Any): result
+        Returns:
+            None
+        """
+
+        entry = self.entries.get(region_id)
+        if entry is None:
+            return
+        entry.derived.pop(key, None)
+        entry.derived[key] = value
+        entry.derived_sizes[key] = deep_sizeof(value)
+        while len(entry.derived) > 1 and (
+                len(entry.derived) > self.max_derived
+                or (self.max_derived_bytes is not None and entry.derived_bytes > self.max_derived_bytes)
+        ):
+            entry.pop_oldest_derived()
+            self.derived_evictions += 1
+        self._enforce_budget()
+
+    def _enforce_budget(self) -> None:
+        while len(self.entries) > 1 and (
+                len(self.entries) > self.max_models
+                or (self.max_bytes is not None and self.total_bytes > self.max_bytes)
+        ):
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        if self.max_bytes is None or not self.entries:
+            return
+        entry = next(iter(self.entries.values()))
+        while entry.derived and self.total_bytes > self.max_bytes:
+            entry.pop_oldest_derived()
+            self.derived_evictions += 1
+
+    def get_report(self) -> dict:
+        """
+        Function returns cache counters and memory of every resident model
+        Returns:
+            dict: cache report
+        """
+
+        return {
+            "enabled": self.enabled,
+            "max_models": self.max_models,
+            "max_bytes": self.max_bytes,
+            "max_derived": self.max_derived,
+            "max_derived_bytes": self.max_derived_bytes,
+            "total_bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "stale": self.stale,
+            "derived_hits": self.derived_hits,
+            "derived_misses": self.derived_misses,
+            "derived_evictions": self.derived_evictions,
+            "models": {
+                region_id: {
+                    "bytes": entry.size,
+                    "parts": entry.parts,
+                    "derived": entry.derived_sizes,
+                    "hits": entry.hits,
+                    "version": entry.version,
+                    "loaded_at": entry.loaded_at,
+                    "last_used": entry.last_used,
+                }
+                for region_id, entry in self.entries.items()
+            },
+        }
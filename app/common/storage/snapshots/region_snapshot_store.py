@@ -0,0 +1,192 @@
+import asyncio
+import json
+import shutil
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from importlib.metadata import version, PackageNotFoundError
+from pathlib import Path
+
+import geopandas as gpd
+import pandas as pd
+from loguru import logger
+
+from app.dependences import http_exception, get_config_value
+from app.common.models.popframe_models.accessibility_matrix import (
+    CompactAccessibilityMatrix,
+    SparseAccessibilityMatrix,
+    load_accessibility_matrix,
+)
+from ..cache_janitor import CacheArtifact
+from ..models.caching_serivce import CachingService
+
+SNAPSHOT_FORMAT_VERSION = 1
+SNAPSHOT_INDEX_COLUMN = "__snapshot_index__"
+
+
+@dataclass
+class RegionInputs:
+    """Class for raw upstream inputs of region model"""
+
+    region_borders: gpd.GeoDataFrame
+    towns: gpd.GeoDataFrame
+    population: pd.DataFrame
+    accessibility_matrix: CompactAccessibilityMatrix | SparseAccessibilityMatrix
+
+
+class RegionSnapshotStore(CachingService):
+    """Class for versioned local store of raw region model inputs"""
+
+    @staticmethod
+    def _write_gdf(gdf: gpd.GeoDataFrame, path: Path) -> None:
+        gdf = gdf.reset_index(names=SNAPSHOT_INDEX_COLUMN)
+        path.write_text(gdf.to_json(drop_id=True), encoding="utf-8")
+
+    @staticmethod
+    def _read_gdf(path: Path, crs: str | None) -> gpd.GeoDataFrame:
+        features = json.loads(path.read_text(encoding="utf-8"))["features"]
+        gdf = gpd.GeoDataFrame.from_features(features, crs=crs).set_index(SNAPSHOT_INDEX_COLUMN)
+        gdf.index.name = None
+        return gdf
+
+    def get_versions(self, region_id: int) -> list[str]:
+        """
+        Function returns available snapshot versions for region
+        Args:
+            region_id (int): region id
+        Returns:
+            list[str]: versions sorted from the oldest to the newest
+        """
+
+        region_path = self.caching_path / str(region_id)
+        if not region_path.exists():
+            return []
+        return sorted(i.name for i in region_path.iterdir() if (i / "manifest.json").exists())
+
+    def get_available_regions(self) -> list[int]:
+        """
+        Function returns regions with at least one snapshot
+        Returns:
+            list[int]: regions ids
+        """
+
+        return sorted(
+            int(i.name) for i in self.caching_path.iterdir()
+            if i.is_dir() and i.name.isdigit() and self.get_versions(int(i.name))
+        )
+
+    def get_cache_artifacts(self) -> list[CacheArtifact]:
+        """
+        Function lists snapshot versions, the newest version of each region is protected from eviction.
+        Unfinished temporary snapshots are listed as evictable, directories which aren't regions are skipped
+        Returns:
+            list[CacheArtifact]: snapshot versions directories
+        """
+
+        artifacts = []
+        for region_path in self.caching_path.iterdir():
+            if not region_path.is_dir() or not region_path.name.isdigit():
+                continue
+            versions = self.get_versions(int(region_path.name))
+            for version_path in region_path.iterdir():
+                artifacts.append(CacheArtifact.from_paths(
+                    f"{region_path.name}/{version_path.name}",
+                    [version_path],
+                    protected=bool(versions) and version_path.name == versions[-1],
+                ))
+        return artifacts
+
+    def _save_inputs(self, region_id: int, inputs: RegionInputs) -> str:
+        # microseconds keep versions of snapshots taken within one second apart and sortable by name
+        snapshot_version = datetime.now().strftime("%Y-%m-%d-%H-%M-%S-%f")
+        snapshot_path = self.caching_path / str(region_id) / snapshot_version
+        tmp_path = snapshot_path.with_name(f".{snapshot_version}.{uuid.uuid4().hex}.tmp")
+        snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path.mkdir(exist_ok=False)
+        try:
+            self._write_gdf(inputs.region_borders, tmp_path / "borders.geojson")
+            self._write_gdf(inputs.towns, tmp_path / "towns.geojson")
+            inputs.population.to_csv(tmp_path / "population.csv", index=False)
+            inputs.accessibility_matrix.save(tmp_path / "matrix.npz")
+            try:
+                popframe_version = version("popframe")
+            except PackageNotFoundError:
+                popframe_version = None
+            manifest = {
+                "format_version": SNAPSHOT_FORMAT_VERSION,
+                "region_id": region_id,
+                "version": snapshot_version,
+                "popframe_version": popframe_version,
+                "borders_crs": inputs.region_borders.crs.to_string() if inputs.region_borders.crs else None,
+                "towns_crs": inputs.towns.crs.to_string() if inputs.towns.crs else None,
+                "matrix_type": type(inputs.accessibility_matrix).__name__,
+            }
+            (tmp_path / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+            tmp_path.rename(snapshot_path)
+        except Exception:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+        return snapshot_version
+
+    async def save_inputs(self, region_id: int, inputs: RegionInputs) -> str:
+        """
+        Function saves raw region inputs as a new snapshot version
+        Args:
+            region_id (int): region id
+            inputs (RegionInputs): raw upstream inputs
+        Returns:
+            str: snapshot version
+        """
+
+        snapshot_version = await asyncio.to_thread(self._save_inputs, region_id, inputs)
+        logger.info(f"Saved inputs snapshot {snapshot_version} for region {region_id}")
+        return snapshot_version
+
+    def _load_inputs(self, region_id: int, snapshot_version: str) -> RegionInputs:
+        snapshot_path = self.caching_path / str(region_id) / snapshot_version
+        manifest = json.loads((snapshot_path / "manifest.json").read_text(encoding="utf-8"))
+        return RegionInputs(
+            region_borders=self._read_gdf(snapshot_path / "borders.geojson", manifest["borders_crs"]),
+            towns=self._read_gdf(snapshot_path / "towns.geojson", manifest["towns_crs"]),
+            population=pd.read_csv(snapshot_path / "population.csv"),
+            accessibility_matrix=load_accessibility_matrix(snapshot_path / "matrix.npz"),
+        )
+
+    async def load_inputs(self, region_id: int, snapshot_version: str | None = None) -> RegionInputs:
+        """
+        Function loads raw region inputs from snapshot
+        Args:
+            region_id (int): region id
+            snapshot_version (str | None): snapshot version, the newest one is used if not provided
+        Returns:
+            RegionInputs: raw upstream inputs
+        Raises:
+            404, snapshot not found
+            500, error during snapshot reading
+        """
+
+        versions = self.get_versions(region_id)
+        snapshot_version = snapshot_version if snapshot_version else (versions[-1] if versions else None)
+        if snapshot_version not in versions:
+            raise http_exception(
+                status_code=404,
+                msg=f"Inputs snapshot for region {region_id} not found",
+                _input={"region_id": region_id, "version": snapshot_version},
+                _detail={"available_versions": versions},
+            )
+        try:
+            return await asyncio.to_thread(self._load_inputs, region_id, snapshot_version)
+        except Exception as e:
+            logger.exception(e)
+            raise http_exception(
+                status_code=500,
+                msg=f"Failed to load inputs snapshot for region {region_id}",
+                _input={"region_id": region_id, "version": snapshot_version},
+                _detail={"Error": str(e)},
+            )
+
+
+snapshots_enabled = get_config_value("POPFRAME_SNAPSHOTS_ENABLED", "true").lower() == "true"
+region_snapshot_store = RegionSnapshotStore(
+    Path().absolute() / get_config_value("POPFRAME_SNAPSHOTS_PATH", "popframe_snapshots")
+)
@@ -3,16 +3,53 @@ from pathlib import Path
 from iduconfig import Config
 
 from app.common.api_handler.api_handler import APIHandler
+from app.common.api_handler.response_cache import ResponseCache
 from app.common.exceptions.http_exception_wrapper import http_exception
 from app.common.storage.geoserver.goserver import GeoserverStorage
 
 
 config = Config()
 
-urban_api_handler = APIHandler(config.get("URBAN_API"))
-transportframe_api_handler = APIHandler(config.get("TRANSPORTFRAME_API"))
+
+def get_config_value(key: str, default: str | None = None) -> str | None:
+    """
+    Function gets optional config value
+    Args:
+        key (str): env variable name
+        default (str | None): value returned if variable is not set
+    Returns:
+        str | None: config value
+    """
+
+    try:
+        return config.get(key)
+    except ValueError:
+        return default
+
+
+urban_api_response_cache = None
+if get_config_value("URBAN_API_CACHE_ENABLED", "true").lower() == "true":
+    urban_api_response_cache = ResponseCache(
+        ttl_rules=[
+            (r"/api/v1/all_territories_without_geometry", 24 * 3600),
+            (r"/api/v1/territory/\d+", 24 * 3600),
+            (r"/api/v1/indicators_by_parent", 24 * 3600),
+            (r"/api/v1/territory/\d+/indicator_values", 6 * 3600),
+        ],
+        cache_path=Path().absolute() / get_config_value("URBAN_API_CACHE_PATH", "urban_api_cache"),
+        max_memory_bytes=int(get_config_value("URBAN_API_CACHE_MEMORY_MB", "64")) * 1024 ** 2,
+        max_disk_bytes=int(get_config_value("URBAN_API_CACHE_DISK_MB", "1024")) * 1024 ** 2,
+    )
+
+urban_api_handler = APIHandler(
+    config.get("URBAN_API"),
+    name="urban_api",
+    response_cache=urban_api_response_cache,
+)
+transportframe_api_handler = APIHandler(config.get("TRANSPORTFRAME_API"), name="transportframe_api")
 
 geoserver_storage = GeoserverStorage(
     cache_path=Path().absolute() / config.get("GEOSERVER_CACHE_PATH"),
-    config=config
+    config=config,
+    staging_format=get_config_value("GEOSERVER_STAGING_FORMAT", "gpkg"),
 )
@@ -1,28 +1,87 @@
+import asyncio
+import os
 import sys
+import time
 from contextlib import asynccontextmanager
+from pathlib import Path
 
-from fastapi import FastAPI
-from fastapi.responses import RedirectResponse, FileResponse
+from fastapi import FastAPI, Request, Query, Header, HTTPException
+from fastapi.responses import RedirectResponse, FileResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from loguru import logger
+from prometheus_client import REGISTRY, CollectorRegistry, generate_latest, multiprocess, CONTENT_TYPE_LATEST
 
 from app.routers import router_territory, router_population, router_frame, router_agglomeration, router_popframe
 from app.routers import router_landuse
 from app.routers.router_popframe_models import model_calculator_router
+from app.routers.router_profiling import (
+    profiling_router, profiling_token, profiling_sample_all, request_profile_store,
+)
+from app.common.metrics.request_profiler import ProfilingMiddleware
+from app.common.models.popframe_models import popframe_methods
 from app.common.models.popframe_models.popframe_models_service import pop_frame_model_service
+from app.common.metrics.prometheus_metrics import (
+    HTTP_REQUEST_SECONDS, UpstreamMetricsCollector, ResidentModelsMetricsCollector,
+)
+from app.common.logs.log_reader import parse_range, read_range, read_tail, follow
+from app.common.metrics.loop_watchdog import LoopWatchdog
+from app.common.storage.models.pop_frame_caching_service import pop_frame_caching_service
+from app.common.storage.cache_janitor_service import cache_janitor, cache_janitor_enabled
+from app.common.storage.leader_lock import LeaderLock
 from .common.exceptions.http_exception_wrapper import http_exception
-from .dependences import config
+from .dependences import config, urban_api_handler, transportframe_api_handler, get_config_value
 
 logger.remove()
 log_level = "DEBUG"
 log_format = "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | <yellow>Line {line: >4} ({file}):</yellow> <b>{message}</b>"
-logger.add(sys.stderr, level=log_level, format=log_format, colorize=True, backtrace=True, diagnose=True)
-logger.add(config.get("LOGS_FILE"), level=log_level, format=log_format, colorize=False, backtrace=True, diagnose=True)
+log_file = Path(config.get("LOGS_FILE"))
+logger.add(sys.stderr, level=log_level, format=log_format, colorize=True, backtrace=True, diagnose=True, enqueue=True)
+logger.add(
+    log_file,
+    level=log_level,
+    format=log_format,
+    colorize=False,
+    backtrace=True,
+    diagnose=True,
+    enqueue=True,
+    rotation=get_config_value("LOGS_ROTATION", "100 MB"),
+    retention=get_config_value("LOGS_RETENTION", "14 days"),
+    compression=get_config_value("LOGS_COMPRESSION", "gz"),
+)
+
+if get_config_value("PRELOAD_POPFRAME", "false").lower() == "true":
+    popframe_methods.preload()
+
+metrics_registry = REGISTRY
+if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    # histograms and counters of all gunicorn workers are aggregated from files, collectors below read
+    # in-process state and report the worker serving the scrape
+    metrics_registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(metrics_registry)
+metrics_registry.register(UpstreamMetricsCollector([urban_api_handler, transportframe_api_handler]))
+metrics_registry.register(ResidentModelsMetricsCollector(pop_frame_caching_service.resident_models))
+
+loop_watchdog_enabled = get_config_value("LOOP_WATCHDOG_ENABLED", "true").lower() == "true"
+loop_watchdog = LoopWatchdog(
+    interval=float(get_config_value("LOOP_WATCHDOG_INTERVAL_MS", "100")) / 1000,
+    threshold=float(get_config_value("LOOP_WATCHDOG_THRESHOLD_MS", "250")) / 1000,
+)
+# with several gunicorn workers only one calculates missing models on startup and sweeps caches
+leader_lock = LeaderLock(pop_frame_caching_service.caching_path / ".leader.lock")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    await pop_frame_model_service.load_and_cache_all_models_on_startup()
+    if loop_watchdog_enabled:
+        loop_watchdog.start()
+    if leader_lock.acquire():
+        await pop_frame_model_service.load_and_cache_all_models_on_startup()
+        if cache_janitor_enabled:
+            cache_janitor.start()
     yield
+    await cache_janitor.stop()
+    leader_lock.release()
+    await loop_watchdog.stop()
+    await logger.complete()
 
 app = FastAPI(
     lifespan=lifespan,
@@ -40,38 +99,154 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def observe_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.labels(
+            route.tags[0] if getattr(route, "tags", None) else "app",
+            request.method,
+            route.path if route else "unmatched",
+            str(status),
+        ).observe(time.perf_counter() - start)
+
+app.add_middleware(
+    ProfilingMiddleware,
+    token=profiling_token,
+    store=request_profile_store,
+    sample_all=profiling_sample_all,
+)
+
 # Root endpoint
 @app.get("/", response_model=dict[str, str])
 def read_root():
     return RedirectResponse(url='/docs')
 
 @app.get("/logs")
-async def get_logs():
+async def get_logs(
+        tail: int | None = Query(None, ge=1, le=100000, description="Return only last N lines"),
+        range_header: str | None = Header(None, alias="Range"),
+):
     """
-    Get logs file from app
+    Get logs file from app, whole file, byte range from Range header or last lines with tail
     """
 
     try:
-        return FileResponse(
-            f"{config.get('LOG_FILE')}.log",
+        if tail is not None:
+            content = await asyncio.to_thread(read_tail, log_file, tail)
+            return Response(content, media_type="text/plain; charset=utf-8")
+        if range_header is None:
+            return FileResponse(
+                log_file,
+                media_type='application/octet-stream',
+                filename=log_file.name,
+                headers={"Accept-Ranges": "bytes"},
+            )
+        size = (await asyncio.to_thread(log_file.stat)).st_size
+        try:
+            start, end = parse_range(range_header, size)
+        except ValueError as e:
+            raise http_exception(
+                status_code=416,
+                msg="Requested range is not satisfiable",
+                _input={"range": range_header, "size": size},
+                _detail={"error": e.__str__()}
+            )
+        return StreamingResponse(
+            read_range(log_file, start, end),
+            status_code=206,
             media_type='application/octet-stream',
-            filename=f"{config.get('LOG_FILE')}.log",
+            headers={
+                "Accept-Ranges": "bytes",
+                "Content-Range": f"bytes {start}-{end}/{size}",
+                "Content-Length": str(end - start + 1),
+            },
         )
     except FileNotFoundError as e:
         raise http_exception(
             status_code=404,
             msg="Log file not found",
-            _input={"lof_file_name": f"{config.get('LOG_FILE')}.log"},
+            _input={"lof_file_name": str(log_file)},
             _detail={"error": e.__str__()}
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise http_exception(
             status_code=500,
             msg="Internal server error during reading logs",
-            _input={"lof_file_name": f"{config.get('LOG_FILE')}.log"},
+            _input={"lof_file_name": str(log_file)},
             _detail={"error": e.__str__()}
         )
 
+@app.get("/logs/stream")
+async def stream_logs(tail: int = Query(0, ge=0, le=10000, description="Send last N lines first")):
+    """
+    Get live tail of logs file as server-sent events
+    """
+
+    if not log_file.exists():
+        raise http_exception(
+            status_code=404,
+            msg="Log file not found",
+            _input={"lof_file_name": str(log_file)},
+            _detail={}
+        )
+    return StreamingResponse(
+        follow(log_file, tail_lines=tail),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/upstreams/metrics")
+async def get_upstreams_metrics():
+    """
+    Get retry and circuit breaker metrics for upstream APIs
+    """
+
+    return {
+        handler.name: handler.get_metrics()
+        for handler in (urban_api_handler, transportframe_api_handler)
+    }
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """
+    Get prometheus metrics
+    """
+
+    return Response(generate_latest(metrics_registry), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/cache/janitor")
+async def get_cache_janitor_report():
+    """
+    Get cache janitor report with reclaimed space and remaining size per cache
+    """
+
+    return cache_janitor.get_report()
+
+@app.put("/cache/janitor/run")
+async def run_cache_janitor():
+    """
+    Run cache janitor sweep immediately
+    """
+
+    return await cache_janitor.run_once()
+
+@app.get("/loop/watchdog")
+async def get_loop_watchdog_report():
+    """
+    Get event loop stalls over threshold with blocking call sites and their last stacks
+    """
+
+    return loop_watchdog.get_report()
+
 
 app.include_router(model_calculator_router)
 # Include routers
@@ -81,4 +256,5 @@ app.include_router(router_frame.network_router)
 app.include_router(router_agglomeration.agglomeration_router)
 app.include_router(router_landuse.landuse_router)
 app.include_router(router_popframe.popframe_router)
+app.include_router(profiling_router)
 app.include_router(model_calculator_router)
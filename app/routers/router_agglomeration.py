@@ -1,10 +1,9 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
 
 import json
-from popframe.method.aglomeration import AgglomerationBuilder
-from popframe.method.popuation_frame import PopulationFrame
 from typing import Any, Dict, Annotated
 
+from app.common.models.popframe_models import popframe_methods
 from app.common.models.popframe_models.popframe_models_service import pop_frame_model_service
 from app.dependences import geoserver_storage
 from app.common.storage.geoserver.geoserver_dto import PopFrameGeoserverDTO
@@ -27,15 +26,10 @@ async def get_href(
             layer_type="cities"
         )
         if agglomeration_check and cities_check:
-            agglomerations = await geoserver_storage.get_layer_from_geoserver(
+            return await geoserver_storage.get_layers_from_geoserver(
                 region_id=region_id,
-                layer_type="agglomerations",
+                layer_types=["agglomerations", "cities"],
             )
-            cities = await geoserver_storage.get_layer_from_geoserver(
-                region_id=region_id,
-                layer_type="cities",
-            )
-            return [agglomerations, cities]
         else:
             await pop_frame_model_service.calculate_model(region_id)
             result = await get_href(region_id)
@@ -48,12 +42,15 @@ async def get_agglomeration_endpoint(
         agglomerations_params: Annotated[RegionAgglomerationDTO, Depends(RegionAgglomerationDTO)]
 ):
     try:
+        pop_frame_model_service.check_travel_time(agglomerations_params.time)
         region_model = await pop_frame_model_service.get_model(agglomerations_params.region_id)
-        builder = AgglomerationBuilder(region=region_model)
+        builder = popframe_methods.AgglomerationBuilder(region=region_model)
         agglomeration_gdf = builder.get_agglomerations(time=agglomerations_params.time)
         agglomeration_gdf.to_crs(4326, inplace=True)
         result = json.loads(agglomeration_gdf.to_json())
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error during agglomeration processing: {str(e)}")
 
@@ -63,14 +60,17 @@ async def evaluate_cities_in_agglomeration(
         agglomerations_params: Annotated[RegionAgglomerationDTO, Depends(RegionAgglomerationDTO)]
 ):
     try:
+        pop_frame_model_service.check_travel_time(agglomerations_params.time)
         region_model = await pop_frame_model_service.get_model(agglomerations_params.region_id)
-        frame_method = PopulationFrame(region=region_model)
+        frame_method = popframe_methods.PopulationFrame(region=region_model)
         gdf_frame = frame_method.build_circle_frame()
-        builder = AgglomerationBuilder(region=region_model)
+        builder = popframe_methods.AgglomerationBuilder(region=region_model)
         agglomeration_gdf = builder.get_agglomerations(time=agglomerations_params.time)
         towns_with_status = builder.evaluate_city_agglomeration_status(gdf_frame, agglomeration_gdf)
         towns_with_status.to_crs(4326, inplace=True)
         result = json.loads(towns_with_status.to_json())
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error during city evaluation processing: {str(e)}")
@@ -1,59 +1,52 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Header, BackgroundTasks, Request
+import asyncio
+import hashlib
 import json
-import geopandas as gpd
+from collections import OrderedDict
 from typing import Any, Dict
-from popframe.method.landuse_assessment import LandUseAssessment
-from popframe.models.region import Region
+from loguru import logger
 from app.common.models.popframe_models.popframe_models_service import pop_frame_model_service
-from app.dependences import config
+from app.common.models.popframe_models.services.popframe_models_api_service import pop_frame_model_api_service
+from app.common.storage.models.pop_frame_caching_service import pop_frame_caching_service
+from app.dependences import get_config_value
 from app.utils.auth import verify_token
-import requests
 
 landuse_router = APIRouter(prefix="/landuse", tags=["Landuse data"])
+landuse_memo_scenarios = int(get_config_value("LANDUSE_MEMO_SCENARIOS", "32"))
 
 # Land Use Data Endpoints
 @landuse_router.post("/get_landuse_data", response_model=Dict[str, Any])
 async def get_landuse_data_endpoint(
-    region_model: Region = Depends(pop_frame_model_service.get_model),
+    region_id: int,
     project_scenario_id: int | None = Query(None, description="ID сценария cценария"),
     token: str = Depends(verify_token)
     ):
     try:
-        # Getting project_id and additional information based on scenario_id
-        scenario_response = requests.get(
-            f"{config.get('URBAN_API')}/scenarios/{project_scenario_id}",
-            headers={"Authorization": f"Bearer {token}"}
+        region_model = await pop_frame_model_service.get_model(region_id)
+        polygon_gdf = await pop_frame_model_api_service.get_scenario_territory(project_scenario_id, token)
+        # responses live with resident model, so they are recalculated with the model or changed project territory,
+        # only the last LANDUSE_MEMO_SCENARIOS responses are kept
+        key = (project_scenario_id, hashlib.sha1(polygon_gdf.geometry.iloc[0].wkb).hexdigest())
+        memo = pop_frame_caching_service.resident_models.get_derived(region_id, "landuse") or OrderedDict()
+        if key in memo:
+            memo.move_to_end(key)
+            return memo[key]
+        try:
+            landuse_layer = await pop_frame_model_service.get_landuse_layer(region_id)
+        except Exception as e:
+            logger.warning(f"Region {region_id} landuse layer is unavailable, requesting project features: {e}")
+            landuse_layer = None
+        landuse_data = await asyncio.to_thread(
+            pop_frame_model_service.assess_landuse, region_model, polygon_gdf, landuse_layer
         )
-        if scenario_response.status_code != 200:
-            raise Exception("Error retrieving scenario information")
-
-        scenario_data = scenario_response.json()
-        project_id = scenario_data.get("project", {}).get("project_id")
-        if project_id is None:
-            raise Exception("Project ID is missing in scenario data.")
-
-        # Retrieving territory geometry
-        territory_response = requests.get(
-            f"{config.get('URBAN_API')}/projects/{project_id}/territory",
-            headers={"Authorization": f"Bearer {token}"}
-        )
-        if territory_response.status_code != 200:
-            raise Exception("Error retrieving territory geometry")
-
-        # Extracting only the polygon geometry
-        territory_data = territory_response.json()
-        territory_geometry = territory_data["geometry"]
-
-        # Converting the territory geometry to GeoDataFrame
-        territory_feature = {
-            'type': 'Feature',
-            'geometry': territory_geometry,
-            'properties': {}
-        }
-        urbanisation = LandUseAssessment(region=region_model)
-        polygon_gdf = gpd.GeoDataFrame.from_features([territory_feature], crs=4326)
-        landuse_data = urbanisation.get_landuse_data(territories=polygon_gdf)
-        return json.loads(landuse_data.to_json())
+        result = json.loads(landuse_data.to_json())
+        memo = pop_frame_caching_service.resident_models.get_derived(region_id, "landuse") or OrderedDict()
+        memo[key] = result
+        while len(memo) > landuse_memo_scenarios:
+            memo.popitem(last=False)
+        pop_frame_caching_service.resident_models.set_derived(region_id, "landuse", memo)
+        return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
-
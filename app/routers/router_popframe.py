@@ -1,30 +1,22 @@
 from fastapi import APIRouter, Depends, BackgroundTasks, Query
 import geopandas as gpd
 import requests
-from popframe.method.territory_evaluation import TerritoryEvaluation
-
-from popframe.models.region import Region
+from typing import TYPE_CHECKING
 
+from app.common.models.popframe_models import popframe_methods
 from app.common.models.popframe_models.popframe_models_service import pop_frame_model_service
 from loguru import logger
-import sys
 from app.dependences import config
 from app.utils.auth import verify_token
 
+if TYPE_CHECKING:
+    from popframe.models.region import Region
 
 popframe_router = APIRouter(prefix="/popframe", tags=["PopFrame Evaluation"])
 
-logger.remove()
-logger.add(
-    sys.stdout,
-    format="<green>{time:MM-DD HH:mm}</green> | <level>{level: <8}</level> | <cyan>{message}</cyan>",
-    level="INFO",
-    colorize=True
-)
-
 
 async def process_combined_evaluation(
-    region_model: Region,
+    region_model: "Region",
     project_scenario_id: int,
     token: str
 ):
@@ -60,7 +52,7 @@ async def process_combined_evaluation(
         polygon_gdf = polygon_gdf.to_crs(region_model.crs)
 
         # Оценка территории
-        evaluation = TerritoryEvaluation(region=region_model)
+        evaluation = popframe_methods.TerritoryEvaluation(region=region_model)
 
         # Выполнение первой оценки
         location_results = evaluation.evaluate_territory_location(territories_gdf=polygon_gdf)
@@ -126,7 +118,7 @@ async def process_combined_evaluation(
 @popframe_router.put("/save_popframe_evaluation")
 async def save_popframe_evaluation_endpoint(
     background_tasks: BackgroundTasks,
-    region_model: Region = Depends(pop_frame_model_service.get_model),
+    region_model: "Region" = Depends(pop_frame_model_service.get_model),
     project_scenario_id: int | None = Query(None, description="ID сценария проекта, если имеется"),
     token: str = Depends(verify_token)
 ):
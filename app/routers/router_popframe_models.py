@@ -4,6 +4,8 @@ from fastapi import APIRouter, BackgroundTasks
 from loguru import logger
 
 from app.common.models.popframe_models.popframe_models_service import pop_frame_model_service
+from app.common.storage.models.pop_frame_caching_service import pop_frame_caching_service
+from app.common.storage.snapshots.region_snapshot_store import region_snapshot_store
 
 recalculating = False
 
@@ -23,8 +25,42 @@ async def recalculate_region(region_id: int):
     logger.info(f"Successfully calculated model for region with id {region_id}")
     return {"msg": f"successfully calculated model for region with id {region_id}"}
 
+@model_calculator_router.put("/rebuild/all")
+async def rebuild_all_popframe_models(publish: bool = False):
+    """Router starts rebuild of all models from latest inputs snapshots"""
+
+    asyncio.create_task(pop_frame_model_service.rebuild_all_models(publish=publish))
+    return {"msg": "started rebuild from snapshots"}
+
+@model_calculator_router.put("/rebuild/{region_id}")
+async def rebuild_region(region_id: int, version: str | None = None, publish: bool = False):
+    """Router rebuilds model for region from inputs snapshot without upstream requests"""
+
+    await pop_frame_model_service.rebuild_model(region_id, snapshot_version=version, publish=publish)
+    logger.info(f"Successfully rebuilt model for region with id {region_id} from snapshot")
+    return {"msg": f"successfully rebuilt model for region with id {region_id} from snapshot"}
+
+@model_calculator_router.get("/snapshots/{region_id}", response_model=list[str])
+async def get_region_snapshots(region_id: int) -> list[str]:
+    """Router returns inputs snapshot versions for region"""
+
+    return region_snapshot_store.get_versions(region_id)
+
 @model_calculator_router.get("/available_regions", response_model=list[int])
 async def get_available_regions() -> list[int]:
     """Router returns calculated and cached models"""
 
     return await pop_frame_model_service.get_available_regions()
+
+@model_calculator_router.get("/memory")
+async def get_models_memory() -> dict:
+    """Router returns resident models cache counters and estimated memory of every loaded model part"""
+
+    return pop_frame_caching_service.resident_models.get_report()
+
+@model_calculator_router.delete("/memory/{region_id}")
+async def drop_resident_model(region_id: int):
+    """Router drops resident model and its derived results from memory"""
+
+    pop_frame_caching_service.resident_models.invalidate(region_id)
+    return {"msg": f"dropped resident model for region with id {region_id}"}
@@ -3,32 +3,27 @@ import requests
 import geopandas as gpd
 from pydantic_geojson import PolygonModel
 from loguru import logger
-import sys
-from popframe.method.territory_evaluation import TerritoryEvaluation
-from popframe.models.region import Region
+from typing import TYPE_CHECKING
 
 from app.dependences import config
+from app.common.models.popframe_models import popframe_methods
 from app.common.models.popframe_models.popframe_models_service import pop_frame_model_service
 from app.models.models import PopulationCriterionResult
 from app.utils.auth import verify_token
 
+if TYPE_CHECKING:
+    from popframe.models.region import Region
+
 population_router = APIRouter(prefix="/population", tags=["Population Criterion"])
 
-logger.remove()
-logger.add(
-    sys.stdout,
-    format="<green>{time:MM-DD HH:mm}</green> | <level>{level: <8}</level> | <cyan>{message}</cyan>",
-    level="INFO",
-    colorize=True
-)
 
 # Population Criterion Endpoints
 @population_router.post("/test_population_criterion", response_model=list[PopulationCriterionResult])
 async def test_population_criterion_endpoint(
         polygon: PolygonModel,
-        region_model: Region = Depends(pop_frame_model_service.get_model), token: str = Depends(verify_token)):
+        region_model: "Region" = Depends(pop_frame_model_service.get_model), token: str = Depends(verify_token)):
     try:
-        evaluation = TerritoryEvaluation(region=region_model)
+        evaluation = popframe_methods.TerritoryEvaluation(region=region_model)
         polygon_feature = {
             'type': 'Feature',
             'geometry': polygon.model_dump(),
@@ -44,10 +39,10 @@ async def test_population_criterion_endpoint(
 @population_router.post("/get_population_criterion_score", response_model=list[float])
 async def get_population_criterion_score_endpoint(
     geojson_data: dict,
-    region_model: Region = Depends(pop_frame_model_service.get_model),
+    region_model: "Region" = Depends(pop_frame_model_service.get_model),
 ):
     try:
-        evaluation = TerritoryEvaluation(region=region_model)
+        evaluation = popframe_methods.TerritoryEvaluation(region=region_model)
 
         if geojson_data.get("type") != "FeatureCollection":
             raise HTTPException(status_code=400, detail="Неверный формат GeoJSON, ожидался FeatureCollection")
@@ -69,7 +64,7 @@ async def get_population_criterion_score_endpoint(
         raise HTTPException(status_code=400, detail=str(e))
 
 async def process_population_criterion(
-    region_model: Region,
+    region_model: "Region",
     project_scenario_id: int,
     token: str
 ):
@@ -103,7 +98,7 @@ async def process_population_criterion(
         polygon_gdf = gpd.GeoDataFrame.from_features([territory_feature], crs=4326)
         polygon_gdf = polygon_gdf.to_crs(region_model.crs)
 
-        evaluation = TerritoryEvaluation(region=region_model)
+        evaluation = popframe_methods.TerritoryEvaluation(region=region_model)
         result = evaluation.population_criterion(territories_gdf=polygon_gdf)
 
         for res in result:
@@ -133,7 +128,7 @@ async def process_population_criterion(
 @population_router.post("/save_population_criterion")
 async def save_population_criterion_endpoint(
     background_tasks: BackgroundTasks,
-    region_model: Region = Depends(pop_frame_model_service.get_model),
+    region_model: "Region" = Depends(pop_frame_model_service.get_model),
     project_scenario_id: int | None = Query(None, description="ID сценария проекта, если имеется"),
     token: str = Depends(verify_token)
     ):
@@ -0,0 +1,71 @@
+import hmac
+from typing import Annotated, Literal
+
+from fastapi import APIRouter, Header
+from fastapi.responses import HTMLResponse, Response
+
+from app.common.metrics.request_profiler import RequestProfileStore, PROFILE_TOKEN_HEADER
+from app.dependences import http_exception, get_config_value
+
+profiling_token = get_config_value("PROFILING_TOKEN")
+profiling_sample_all = get_config_value("PROFILING_SAMPLE_ALL", "false").lower() == "true"
+request_profile_store = RequestProfileStore(size=int(get_config_value("PROFILING_STORE_SIZE", "20")))
+
+profiling_router = APIRouter(prefix="/profiling", tags=["Profiling"])
+
+
+def check_profiling_token(token: str | None) -> None:
+    """
+    Function checks profiling token
+    Args:
+        token (str | None): token from request
+    Returns:
+        None
+    Raises:
+        403, profiling is disabled or token is invalid
+    """
+
+    if not profiling_token or token is None or not hmac.compare_digest(token, profiling_token):
+        raise http_exception(
+            status_code=403,
+            msg="Profiling is disabled or token is invalid",
+            _input={"header": PROFILE_TOKEN_HEADER},
+            _detail={},
+        )
+
+
+@profiling_router.get("/profiles")
+async def get_profiles(x_profile_token: Annotated[str | None, Header()] = None):
+    """Router returns stored recently requested and the slowest request profiles"""
+
+    check_profiling_token(x_profile_token)
+    return {
+        "recent": [profile.to_dict() for profile in reversed(request_profile_store.recent)],
+        "slowest": [profile.to_dict() for profile in request_profile_store.slowest],
+    }
+
+
+@profiling_router.get("/profiles/{profile_id}")
+async def get_profile(
+        profile_id: str,
+        profile_format: Literal["speedscope", "html"] = "speedscope",
+        x_profile_token: Annotated[str | None, Header()] = None,
+):
+    """Router returns profile as speedscope flamegraph json or pyinstrument html report"""
+
+    check_profiling_token(x_profile_token)
+    profile = request_profile_store.get(profile_id)
+    if profile is None:
+        raise http_exception(
+            status_code=404,
+            msg=f"Profile {profile_id} not found",
+            _input={"profile_id": profile_id},
+            _detail={},
+        )
+    if profile_format == "html":
+        return HTMLResponse(profile.render("html"))
+    return Response(
+        profile.render("speedscope"),
+        media_type="application/json",
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.speedscope.json"'},
+    )
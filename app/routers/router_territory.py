@@ -2,35 +2,30 @@ from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Query, H
 import geopandas as gpd
 from pydantic_geojson import PolygonModel
 import requests
-from popframe.method.territory_evaluation import TerritoryEvaluation
-from popframe.models.region import Region
 
+from app.common.models.popframe_models import popframe_methods
 from app.common.models.popframe_models.popframe_models_service import pop_frame_model_service
 from app.models.models import EvaluateTerritoryLocationResult
 from loguru import logger
-import sys
+from typing import TYPE_CHECKING
 from app.utils.auth import verify_token
-from app.dependences import config
+from app.dependences import config, http_exception
+
+if TYPE_CHECKING:
+    from popframe.models.region import Region
 
 territory_router = APIRouter(prefix="/territory", tags=["Territory Evaluation"])
 
-logger.remove()
-logger.add(
-    sys.stdout,
-    format="<green>{time:MM-DD HH:mm}</green> | <level>{level: <8}</level> | <cyan>{message}</cyan>",
-    level="INFO",
-    colorize=True
-)
 
 @territory_router.post("/evaluate_location_test", response_model=list[EvaluateTerritoryLocationResult])
 async def evaluate_territory_location_endpoint(
     polygon: PolygonModel,
-    region_model: Region = Depends(pop_frame_model_service.get_model),
+    region_model: "Region" = Depends(pop_frame_model_service.get_model),
     project_scenario_id: int | None = Query(None, description="ID сценария проекта, если имеется"),
     token: str = Depends(verify_token)  # Добавляем токен для аутентификации
 ):
     try:
-        evaluation = TerritoryEvaluation(region=region_model)
+        evaluation = popframe_methods.TerritoryEvaluation(region=region_model)
         polygon_feature = {
             'type': 'Feature',
             'geometry': polygon.model_dump(),
@@ -45,7 +40,7 @@ async def evaluate_territory_location_endpoint(
 
 
 async def process_evaluation(
-    region_model: Region,
+    region_model: "Region",
     project_scenario_id: int,
     token: str
 ):
@@ -85,7 +80,7 @@ async def process_evaluation(
         polygon_gdf = polygon_gdf.to_crs(region_model.crs)
 
         # Territory evaluation
-        evaluation = TerritoryEvaluation(region=region_model)
+        evaluation = popframe_methods.TerritoryEvaluation(region=region_model)
         result = evaluation.evaluate_territory_location(territories_gdf=polygon_gdf)
 
         # Saving the evaluation to the database
@@ -124,7 +119,7 @@ async def process_evaluation(
 @territory_router.post("/save_evaluate_location")
 async def save_evaluate_location_endpoint(
     background_tasks: BackgroundTasks,
-    region_model: Region = Depends(pop_frame_model_service.get_model),
+    region_model: "Region" = Depends(pop_frame_model_service.get_model),
     project_scenario_id: int | None = Query(None, description="Project scenario ID, if available"),
     token: str = Depends(verify_token)  # Добавляем токен для аутентификации
     ):
@@ -132,3 +127,67 @@ async def save_evaluate_location_endpoint(
     background_tasks.add_task(process_evaluation, region_model, project_scenario_id, token)
 
     return {"message": "Population criterion processing started", "status": "processing"}
+
+
+@territory_router.get("/reachable_population")
+async def get_reachable_population(
+    region_id: int,
+    time: int = Query(60, ge=0, description="Travel time in minutes"),
+    territory_ids: list[int] | None = Query(None, description="Towns territory ids, all towns if not provided"),
+):
+    """Router returns number of towns and population reachable within travel time from towns"""
+
+    index = await pop_frame_model_service.get_reachability_index(region_id)
+    try:
+        positions = index.positions(territory_ids or index.labels)
+        counts = index.count_within(positions, time)
+        population = index.population_within(positions, time)
+    except (KeyError, ValueError) as e:
+        raise http_exception(
+            status_code=400,
+            msg=str(e),
+            _input={"region_id": region_id, "time": time, "territory_ids": territory_ids},
+            _detail={"max_time": index.max_time},
+        )
+    return {
+        "region_id": region_id,
+        "time": time,
+        "towns": {
+            territory_id: {"towns": towns, "population": town_population}
+            for territory_id, towns, town_population in zip(
+                index.labels[positions].tolist(), counts.tolist(), population.tolist()
+            )
+        },
+    }
+
+
+@territory_router.get("/reachable_towns")
+async def get_reachable_towns(
+    region_id: int,
+    territory_id: int,
+    time: int = Query(60, ge=0, description="Travel time in minutes"),
+):
+    """Router returns towns reachable within travel time from town sorted by travel time"""
+
+    index = await pop_frame_model_service.get_reachability_index(region_id)
+    try:
+        position = int(index.positions([territory_id])[0])
+        towns, times = index.neighbours_within(position, time)
+        population = int(index.population_within([position], time)[0])
+    except (KeyError, ValueError) as e:
+        raise http_exception(
+            status_code=400,
+            msg=str(e),
+            _input={"region_id": region_id, "time": time, "territory_id": territory_id},
+            _detail={"max_time": index.max_time},
+        )
+    return {
+        "region_id": region_id,
+        "territory_id": territory_id,
+        "time": time,
+        "population": population,
+        "towns": [
+            {"territory_id": town, "time": round(town_time, 2)}
+            for town, town_time in zip(towns.tolist(), times.tolist())
+        ],
+    }
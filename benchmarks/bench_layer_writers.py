@@ -0,0 +1,88 @@
+"""
+Benchmark of layer staging formats.
+
+Measures write time and file size of every writer from LAYER_WRITERS for given layers,
+e.g. staged geoserver layers of several regions:
+
+    python -m benchmarks.bench_layer_writers geoserver_cache/*_cities.gpkg
+    python -m benchmarks.bench_layer_writers --synthetic 10000 100000
+"""
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+from app.common.storage.geoserver.layer_writers import LAYER_WRITERS
+
+
+def make_synthetic_layer(size: int, seed: int = 0) -> gpd.GeoDataFrame:
+    """
+    Function generates cities-like point layer
+    Args:
+        size (int): number of features
+        seed (int): random seed
+    Returns:
+        gpd.GeoDataFrame: layer
+    """
+
+    rng = np.random.default_rng(seed)
+    return gpd.GeoDataFrame(
+        {
+            "name": [f"town_{i}" for i in range(size)],
+            "population": rng.integers(100, 1_000_000, size),
+            "level": rng.choice(["small", "medium", "large"], size),
+            "agglomeration_status": rng.choice(["in", "out"], size),
+        },
+        geometry=shapely.points(rng.uniform([30, 55], [40, 65], (size, 2))),
+        crs=4326,
+    )
+
+
+def bench_layer(layer: gpd.GeoDataFrame, repeat: int) -> dict[str, dict]:
+    """
+    Function writes layer with every writer
+    Args:
+        layer (gpd.GeoDataFrame): layer to write
+        repeat (int): number of writes per writer, the best time is reported
+    Returns:
+        dict[str, dict]: write time in seconds and size in bytes by writer
+    """
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, writer in LAYER_WRITERS.items():
+            path = Path(tmp) / f"layer{writer.ext}"
+            timings = []
+            for _ in range(repeat):
+                path.unlink(missing_ok=True)
+                start = time.perf_counter()
+                writer.write(layer, path)
+                timings.append(time.perf_counter() - start)
+            results[name] = {"seconds": round(min(timings), 4), "bytes": path.stat().st_size}
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("layers", nargs="*", type=Path, help="layer files readable by geopandas")
+    parser.add_argument("--synthetic", nargs="*", type=int, default=[], help="sizes of synthetic layers")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    report = {}
+    for path in args.layers:
+        layer = gpd.read_parquet(path) if path.suffix == ".parquet" else gpd.read_file(path)
+        report[path.name] = {"features": len(layer), "writers": bench_layer(layer, args.repeat)}
+    for size in args.synthetic:
+        report[f"synthetic_{size}"] = {"features": size, "writers": bench_layer(make_synthetic_layer(size), args.repeat)}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
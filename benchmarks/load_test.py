@@ -0,0 +1,308 @@
+"""
+Load test of router endpoints at increasing concurrency on synthetic regions.
+
+App runs in-process against local upstream stand-ins, closed-loop workers replay a request mix,
+so the event loop lag is measured in the same loop serving requests:
+
+    python -m benchmarks.load_test --towns 500 --concurrency 1 4 16 64 --duration 20
+    python -m benchmarks.load_test --mix traffic.jsonl --output load_report.json
+
+Mix file is JSONL, one request per line, either built-in endpoint of benchmarked region
+    {"endpoint": "territory.evaluate_location_test", "weight": 5}
+or recorded request
+    {"method": "GET", "url": "/agglomeration/build_agglomeration", "params": {"region_id": 1}, "weight": 1}
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from .run_benchmarks import REPO_ROOT, get_endpoints, get_git_commit, prepare_workdir
+from .standins import StandinServers, StandinState
+from .synthetic import SyntheticRegion
+
+REQUEST_KEYS = ("method", "url", "params", "json", "headers")
+DEFAULT_MIX = {
+    "territory.evaluate_location_test": 4,
+    "population.test_population_criterion": 2,
+    "population.get_population_criterion_score": 2,
+    "agglomeration.build_agglomeration": 1,
+    "agglomeration.evaluate_city_agglomeration_status": 1,
+    "population.build_city_frame": 1,
+    "agglomeration.get_href": 1,
+}
+
+
+@dataclass
+class MixRequest:
+    """Class for weighted request of load mix"""
+
+    name: str
+    request: dict
+    weight: float = 1.0
+
+
+@dataclass
+class LevelResult:
+    """Class for raw measurements of one concurrency level"""
+
+    concurrency: int
+    elapsed: float = 0.0
+    latencies: dict[str, list[float]] = field(default_factory=dict)
+    statuses: dict[str, dict[int, int]] = field(default_factory=dict)
+    errors: dict[str, int] = field(default_factory=dict)
+    loop_lags: list[float] = field(default_factory=list)
+
+    def record(self, name: str, latency: float, status: int | None) -> None:
+        self.latencies.setdefault(name, []).append(latency)
+        if status is None:
+            self.errors[name] = self.errors.get(name, 0) + 1
+        else:
+            statuses = self.statuses.setdefault(name, {})
+            statuses[status] = statuses.get(status, 0) + 1
+
+
+def load_mix(path: Path | None, region: SyntheticRegion) -> list[MixRequest]:
+    """
+    Function loads request mix
+    Args:
+        path (Path | None): JSONL mix file, DEFAULT_MIX is used if not set
+        region (SyntheticRegion): region built-in endpoints are requested for
+    Returns:
+        list[MixRequest]: weighted requests
+    Raises:
+        ValueError: if line references unknown endpoint or has no url
+    """
+
+    endpoints = get_endpoints(region)
+    if path is None:
+        return [MixRequest(name, endpoints[name], weight) for name, weight in DEFAULT_MIX.items()]
+
+    mix = []
+    for line_number, line in enumerate(path.read_text().splitlines(), start=1):
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        weight = float(item.get("weight", 1))
+        if "endpoint" in item:
+            if item["endpoint"] not in endpoints:
+                raise ValueError(f"Unknown endpoint {item['endpoint']} in line {line_number}")
+            mix.append(MixRequest(item["endpoint"], endpoints[item["endpoint"]], weight))
+        elif "url" in item:
+            request = {key: item[key] for key in REQUEST_KEYS if key in item}
+            request.setdefault("method", "GET")
+            mix.append(MixRequest(item.get("name", f"{request['method']} {request['url']}"), request, weight))
+        else:
+            raise ValueError(f"Line {line_number} has neither endpoint nor url")
+    return mix
+
+
+def percentiles(values: list[float]) -> dict[str, float]:
+    if not values:
+        return {}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "p50": round(float(p50), 6),
+        "p95": round(float(p95), 6),
+        "p99": round(float(p99), 6),
+        "max": round(max(values), 6),
+    }
+
+
+def summarize_level(result: LevelResult) -> dict:
+    """
+    Function summarizes concurrency level measurements
+    Args:
+        result (LevelResult): level measurements
+    Returns:
+        dict: throughput, latency percentiles, loop lag and per endpoint stats
+    """
+
+    latencies = [i for values in result.latencies.values() for i in values]
+    total = len(latencies)
+    return {
+        "concurrency": result.concurrency,
+        "requests": total,
+        "errors": sum(result.errors.values()),
+        "throughput": round(total / result.elapsed, 3) if result.elapsed else 0.0,
+        "latency": percentiles(latencies),
+        "loop_lag": percentiles(result.loop_lags),
+        "endpoints": {
+            name: {
+                "requests": len(values),
+                "statuses": result.statuses.get(name, {}),
+                "errors": result.errors.get(name, 0),
+                **percentiles(values),
+            }
+            for name, values in sorted(result.latencies.items())
+        },
+    }
+
+
+async def monitor_loop_lag(lags: list[float], interval: float) -> None:
+    """
+    Function samples event loop lag as oversleep of ticker until cancelled
+    Args:
+        lags (list[float]): list lags in seconds are appended to
+        interval (float): ticker interval in seconds
+    Returns:
+        None
+    """
+
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        try:
+            await asyncio.sleep(interval)
+        finally:
+            lags.append(max(0.0, loop.time() - start - interval))
+
+
+async def run_level(
+        client,
+        mix: list[MixRequest],
+        concurrency: int,
+        duration: float,
+        seed: int,
+        lag_interval: float,
+) -> LevelResult:
+    """
+    Function replays mix with closed-loop workers for given duration
+    Args:
+        client (httpx.AsyncClient): client of app
+        mix (list[MixRequest]): weighted requests
+        concurrency (int): number of workers
+        duration (float): level duration in seconds
+        seed (int): random seed of requests order
+        lag_interval (float): loop lag ticker interval in seconds
+    Returns:
+        LevelResult: level measurements
+    """
+
+    result = LevelResult(concurrency=concurrency)
+    weights = [i.weight for i in mix]
+    monitor = asyncio.create_task(monitor_loop_lag(result.loop_lags, lag_interval))
+
+    async def worker(worker_id: int) -> None:
+        rng = random.Random(seed * 100_003 + worker_id)
+        while time.perf_counter() < deadline:
+            item = rng.choices(mix, weights)[0]
+            start = time.perf_counter()
+            try:
+                response = await client.request(**item.request)
+                status = response.status_code
+            except Exception:
+                status = None
+            result.record(item.name, time.perf_counter() - start, status)
+            # in-process transport may complete request without suspending, yield as network would
+            await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    deadline = start + duration
+    try:
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    finally:
+        result.elapsed = time.perf_counter() - start
+        monitor.cancel()
+        await asyncio.gather(monitor, return_exceptions=True)
+    return result
+
+
+async def load_test(
+        region: SyntheticRegion,
+        mix: list[MixRequest],
+        levels: list[int],
+        duration: float,
+        warmup: float,
+        seed: int,
+        lag_interval: float,
+) -> list[dict]:
+    """
+    Function calculates model for region and runs load test levels
+    Args:
+        region (SyntheticRegion): benchmarked region
+        mix (list[MixRequest]): weighted requests
+        levels (list[int]): concurrency levels
+        duration (float): duration of each level in seconds
+        warmup (float): duration of single worker warmup in seconds
+        seed (int): random seed of requests order
+        lag_interval (float): loop lag ticker interval in seconds
+    Returns:
+        list[dict]: levels summaries
+    """
+
+    import httpx
+    from app.main import app
+    from app.common.models.popframe_models.popframe_models_service import pop_frame_model_service
+
+    await pop_frame_model_service.calculate_model(region.region_id)
+    results = []
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=None, limits=limits) as client:
+        if warmup:
+            await run_level(client, mix, 1, warmup, seed, lag_interval)
+        for concurrency in levels:
+            summary = summarize_level(await run_level(client, mix, concurrency, duration, seed, lag_interval))
+            results.append(summary)
+            print(
+                f"concurrency {concurrency}: {summary['throughput']} req/s, "
+                f"p95 {summary['latency'].get('p95')}s, loop lag p99 {summary['loop_lag'].get('p99')}s",
+                file=sys.stderr,
+            )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--towns", type=int, default=500, help="towns in synthetic region")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16, 64])
+    parser.add_argument("--duration", type=float, default=20, help="seconds per concurrency level")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds of single worker warmup")
+    parser.add_argument("--mix", type=Path, help="JSONL request mix")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--lag-interval", type=float, default=0.05, help="loop lag ticker interval in seconds")
+    parser.add_argument("--population-mode", choices=["per-territory", "bulk"], default="per-territory")
+    parser.add_argument("--output", type=Path, default=Path("load_report.json"))
+    args = parser.parse_args()
+    output = args.output.absolute()
+
+    region = SyntheticRegion(region_id=1, towns_count=args.towns, seed=args.seed)
+    mix = load_mix(args.mix.absolute() if args.mix else None, region)
+    state = StandinState()
+    state.add_region(region)
+
+    sys.path.insert(0, str(REPO_ROOT))
+    with tempfile.TemporaryDirectory(prefix="popframe_load_") as workdir, StandinServers(state) as servers:
+        prepare_workdir(Path(workdir), servers, args.population_mode, False)
+        levels = asyncio.run(
+            load_test(region, mix, args.concurrency, args.duration, args.warmup, args.seed, args.lag_interval)
+        )
+
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(),
+            "git_commit": get_git_commit(),
+            "towns": args.towns,
+            "duration": args.duration,
+            "seed": args.seed,
+            "mix": [{"name": i.name, "weight": i.weight} for i in mix],
+        },
+        "levels": levels,
+        "upstream_requests": state.requests,
+    }
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"Report written to {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
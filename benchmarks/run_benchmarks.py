@@ -0,0 +1,301 @@
+"""
+Offline benchmark of model calculation stages and router endpoints on synthetic regions.
+
+Upstreams are replaced by local stand-ins, app runs in a temporary working directory with its own
+caches, so runs are reproducible and don't touch real services:
+
+    python -m benchmarks.run_benchmarks --sizes 100 500 2000 --output benchmark_report.json
+    python -m benchmarks.run_benchmarks --sizes 100 500 --baseline benchmark_report.json
+
+With --baseline, metrics slower than baseline by more than --threshold are listed and exit code is 1.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from .standins import StandinServers, StandinState, standin_env, BULK_INDICATORS_ENDPOINT
+from .synthetic import SyntheticRegion
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+MODEL_STAGES = [
+    "borders", "towns", "population", "matrix", "snapshot", "level_filling", "model_init", "pickle",
+    "reachability_index", "frame", "agglomerations", "indicator_upload", "geoserver_publish", "total",
+]
+AUTH_HEADERS = {"Authorization": "Bearer bench"}
+
+
+def get_endpoints(region: SyntheticRegion) -> dict[str, dict]:
+    """
+    Function returns router endpoints requests for region
+    Args:
+        region (SyntheticRegion): benchmarked region
+    Returns:
+        dict[str, dict]: httpx request kwargs by endpoint name
+    """
+
+    region_id = region.region_id
+    polygon = region.project_territory()
+    feature_collection = {
+        "type": "FeatureCollection",
+        "features": [{"type": "Feature", "geometry": polygon, "properties": {}}],
+    }
+    scenario = {"region_id": region_id, "project_scenario_id": region_id}
+    return {
+        "agglomeration.get_href": {
+            "method": "GET", "url": "/agglomeration/geoserver/get_href", "params": {"region_id": region_id},
+        },
+        "agglomeration.build_agglomeration": {
+            "method": "GET", "url": "/agglomeration/build_agglomeration", "params": {"region_id": region_id, "time": 80},
+        },
+        "agglomeration.evaluate_city_agglomeration_status": {
+            "method": "GET",
+            "url": "/agglomeration/evaluate_city_agglomeration_status",
+            "params": {"region_id": region_id, "time": 80},
+        },
+        "population.build_city_frame": {
+            "method": "GET", "url": "/population/build_city_frame", "params": {"region_id": region_id},
+        },
+        "population.build_agglomeration_frames": {
+            "method": "GET", "url": "/population/build_agglomeration_frames", "params": {"region_id": region_id},
+        },
+        "population.test_population_criterion": {
+            "method": "POST", "url": "/population/test_population_criterion",
+            "params": {"region_id": region_id}, "json": polygon, "headers": AUTH_HEADERS,
+        },
+        "population.get_population_criterion_score": {
+            "method": "POST", "url": "/population/get_population_criterion_score",
+            "params": {"region_id": region_id}, "json": feature_collection,
+        },
+        "population.save_population_criterion": {
+            "method": "POST", "url": "/population/save_population_criterion", "params": scenario, "headers": AUTH_HEADERS,
+        },
+        "territory.evaluate_location_test": {
+            "method": "POST", "url": "/territory/evaluate_location_test",
+            "params": {"region_id": region_id}, "json": polygon, "headers": AUTH_HEADERS,
+        },
+        "territory.save_evaluate_location": {
+            "method": "POST", "url": "/territory/save_evaluate_location", "params": scenario, "headers": AUTH_HEADERS,
+        },
+        "popframe.save_popframe_evaluation": {
+            "method": "PUT", "url": "/popframe/save_popframe_evaluation", "params": scenario, "headers": AUTH_HEADERS,
+        },
+        "landuse.get_landuse_data": {
+            "method": "POST", "url": "/landuse/get_landuse_data", "params": scenario, "headers": AUTH_HEADERS,
+        },
+        "model_calculator.available_regions": {"method": "GET", "url": "/model_calculator/available_regions"},
+        "model_calculator.snapshots": {"method": "GET", "url": f"/model_calculator/snapshots/{region_id}"},
+    }
+
+
+def summarize(timings: list[float]) -> dict[str, float]:
+    return {
+        "min": round(min(timings), 6),
+        "median": round(statistics.median(timings), 6),
+        "mean": round(statistics.fmean(timings), 6),
+        "max": round(max(timings), 6),
+    }
+
+
+def get_stage_timings(region_id: int) -> dict[str, float]:
+    from prometheus_client import REGISTRY
+
+    timings = {}
+    for stage in MODEL_STAGES:
+        value = REGISTRY.get_sample_value(
+            "popframe_model_stage_seconds_sum",
+            {"stage": stage, "region_id": str(region_id), "outcome": "success"},
+        )
+        if value is not None:
+            timings[stage] = round(value, 6)
+    return timings
+
+
+async def bench_region(region: SyntheticRegion, repeat: int) -> dict:
+    """
+    Function calculates model for region and times router endpoints on it
+    Args:
+        region (SyntheticRegion): benchmarked region
+        repeat (int): number of timed requests per endpoint after warmup
+    Returns:
+        dict: region results
+    """
+
+    import httpx
+    from app.main import app
+    from app.common.models.popframe_models.popframe_models_service import pop_frame_model_service
+
+    start = time.perf_counter()
+    await pop_frame_model_service.calculate_model(region.region_id)
+    calculation_seconds = time.perf_counter() - start
+
+    endpoints = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for name, request in get_endpoints(region).items():
+            statuses, timings = set(), []
+            for attempt in range(repeat + 1):
+                start = time.perf_counter()
+                response = await client.request(**request)
+                elapsed = time.perf_counter() - start
+                statuses.add(response.status_code)
+                if attempt:
+                    timings.append(elapsed)
+            endpoints[name] = {"statuses": sorted(statuses), **summarize(timings)}
+    return {
+        "region_id": region.region_id,
+        "towns": region.towns_count,
+        "matrix_bytes": int(region.matrix.nbytes),
+        "calculate_model": {"seconds": round(calculation_seconds, 6), "stages": get_stage_timings(region.region_id)},
+        "endpoints": endpoints,
+    }
+
+
+async def bench_regions(regions: list[SyntheticRegion], repeat: int) -> dict[str, dict]:
+    """
+    Function benchmarks regions in one event loop, app keeps loop bound primitives between regions
+    Args:
+        regions (list[SyntheticRegion]): benchmarked regions
+        repeat (int): number of timed requests per endpoint after warmup
+    Returns:
+        dict[str, dict]: results by region size
+    """
+
+    results = {}
+    for region in regions:
+        results[str(region.towns_count)] = await bench_region(region, repeat)
+        print(f"Benchmarked region with {region.towns_count} towns", file=sys.stderr)
+    return results
+
+
+def get_git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def flatten(report: dict) -> dict[str, float]:
+    """
+    Function flattens report to comparable metrics
+    Args:
+        report (dict): benchmark report
+    Returns:
+        dict[str, float]: seconds by metric name
+    """
+
+    metrics = {}
+    for size, result in report["results"].items():
+        metrics[f"{size}.calculate_model"] = result["calculate_model"]["seconds"]
+        for stage, seconds in result["calculate_model"]["stages"].items():
+            metrics[f"{size}.stage.{stage}"] = seconds
+        for endpoint, timings in result["endpoints"].items():
+            metrics[f"{size}.endpoint.{endpoint}"] = timings["median"]
+    return metrics
+
+
+def compare(report: dict, baseline: dict, threshold: float, min_seconds: float = 0.01) -> list[dict]:
+    """
+    Function finds metrics slower than baseline
+    Args:
+        report (dict): current report
+        baseline (dict): baseline report
+        threshold (float): allowed relative slowdown
+        min_seconds (float): metrics faster than this in both reports are ignored as noise
+    Returns:
+        list[dict]: regressions
+    """
+
+    current, previous = flatten(report), flatten(baseline)
+    regressions = []
+    for name, seconds in current.items():
+        before = previous.get(name)
+        if before is None or max(before, seconds) < min_seconds:
+            continue
+        if seconds > before * (1 + threshold):
+            regressions.append({"metric": name, "baseline": before, "current": seconds, "ratio": round(seconds / before, 3)})
+    return regressions
+
+
+def prepare_workdir(workdir: Path, servers: StandinServers, population_mode: str, snapshots: bool) -> None:
+    env = {
+        **standin_env(servers),
+        "GEOSERVER_CACHE_PATH": "geoserver_cache",
+        "POPFRAME_MODEL_CACHE": "models_cache",
+        "POPFRAME_SNAPSHOTS_PATH": "snapshots",
+        "POPFRAME_SNAPSHOTS_ENABLED": str(snapshots).lower(),
+        "URBAN_API_CACHE_ENABLED": "false",
+        "CACHE_JANITOR_ENABLED": "false",
+        "LOGS_FILE": "app.log",
+        "REDIS_HOST": "127.0.0.1",
+        "REDIS_PORT": "6379",
+    }
+    if population_mode == "bulk":
+        env["URBAN_API_BULK_INDICATORS_ENDPOINT"] = BULK_INDICATORS_ENDPOINT
+    (workdir / ".env.bench").write_text("".join(f"{key}={value}\n" for key, value in env.items()))
+    os.environ["APP_ENV"] = "bench"
+    os.chdir(workdir)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100, 500, 2000], help="towns per region")
+    parser.add_argument("--repeat", type=int, default=3, help="timed requests per endpoint")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--population-mode", choices=["per-territory", "bulk"], default="per-territory")
+    parser.add_argument("--no-snapshots", action="store_true", help="disable inputs snapshots during calculation")
+    parser.add_argument("--output", type=Path, default=Path("benchmark_report.json"))
+    parser.add_argument("--baseline", type=Path, help="report to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown")
+    args = parser.parse_args()
+    output = args.output.absolute()
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else None
+
+    state = StandinState()
+    regions = [SyntheticRegion(region_id=i + 1, towns_count=size, seed=args.seed) for i, size in enumerate(args.sizes)]
+    for region in regions:
+        state.add_region(region)
+
+    sys.path.insert(0, str(REPO_ROOT))
+    with tempfile.TemporaryDirectory(prefix="popframe_bench_") as workdir, StandinServers(state) as servers:
+        prepare_workdir(Path(workdir), servers, args.population_mode, not args.no_snapshots)
+        results = asyncio.run(bench_regions(regions, args.repeat))
+
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(),
+            "git_commit": get_git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "sizes": args.sizes,
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "population_mode": args.population_mode,
+            "snapshots": not args.no_snapshots,
+        },
+        "results": results,
+        "upstream_requests": state.requests,
+    }
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"Report written to {output}", file=sys.stderr)
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.threshold)
+        print(json.dumps({"regressions": regressions}, indent=2))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+Local stand-ins for Urban API, TransportFrame and geoserver serving synthetic regions.
+
+Servers run in a separate thread with their own event loop, so blocking `requests` calls made
+by routers don't deadlock against them.
+"""
+
+import asyncio
+import io
+import threading
+from dataclasses import dataclass, field
+
+import numpy as np
+from aiohttp import web
+from shapely.geometry import mapping
+
+from .synthetic import SyntheticRegion
+
+BULK_INDICATORS_ENDPOINT = "/api/v1/bench/indicator_values"
+AGGLOMERATION_INDICATORS = [
+    {"indicator_id": 9001, "name_short": "Населенные пункты в агломерациях"},
+    {"indicator_id": 9002, "name_short": "Населенные пункты вне агломераций"},
+]
+
+
+@dataclass
+class StandinState:
+    """Class for data served and received by stand-ins"""
+
+    regions: dict[int, SyntheticRegion] = field(default_factory=dict)
+    town_population: dict[int, int] = field(default_factory=dict)
+    layers: dict[str, int] = field(default_factory=dict)
+    uploaded_indicators: list[dict] = field(default_factory=list)
+    requests: dict[str, int] = field(default_factory=dict)
+
+    def add_region(self, region: SyntheticRegion) -> None:
+        self.regions[region.region_id] = region
+        self.town_population.update(region.population)
+
+    def count(self, name: str) -> None:
+        self.requests[name] = self.requests.get(name, 0) + 1
+
+
+def npy_bytes(array: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    np.save(buffer, array, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def make_urban_api(state: StandinState) -> web.Application:
+    routes = web.RouteTableDef()
+
+    @routes.get("/api/v1/territory/{territory_id}")
+    async def get_territory(request: web.Request):
+        state.count("urban_api.territory")
+        region = state.regions.get(int(request.match_info["territory_id"]))
+        if region is None:
+            return web.json_response({"detail": "territory not found"}, status=404)
+        return web.json_response({
+            "territory_id": region.region_id,
+            "geometry": mapping(region.borders.geometry.iloc[0]),
+        })
+
+    @routes.get("/api/v1/territory/{territory_id}/indicator_values")
+    async def get_indicator_values(request: web.Request):
+        state.count("urban_api.indicator_values")
+        value = state.town_population.get(int(request.match_info["territory_id"]))
+        return web.json_response([] if value is None else [{"indicator_id": 1, "value": value}])
+
+    @routes.get(BULK_INDICATORS_ENDPOINT)
+    async def get_bulk_indicator_values(request: web.Request):
+        state.count("urban_api.bulk_indicator_values")
+        region = state.regions[int(request.query["parent_id"])]
+        return web.json_response({
+            "type": "FeatureCollection",
+            "features": [
+                {"properties": {"territory_id": ter_id, "indicators": [{"indicator_id": 1, "value": value}]}}
+                for ter_id, value in region.population.items()
+            ],
+        })
+
+    @routes.get("/api/v1/all_territories_without_geometry")
+    async def get_regions(request: web.Request):
+        state.count("urban_api.all_territories")
+        return web.json_response([{"territory_id": i} for i in state.regions])
+
+    @routes.get("/api/v1/indicators_by_parent")
+    async def get_indicators(request: web.Request):
+        state.count("urban_api.indicators_by_parent")
+        return web.json_response(AGGLOMERATION_INDICATORS)
+
+    @routes.put("/api/v1/indicator_value")
+    async def put_indicator_value(request: web.Request):
+        state.count("urban_api.indicator_value")
+        state.uploaded_indicators.append(await request.json())
+        return web.json_response({}, status=201)
+
+    @routes.get("/scenarios/{scenario_id}")
+    async def get_scenario(request: web.Request):
+        state.count("urban_api.scenario")
+        scenario_id = int(request.match_info["scenario_id"])
+        return web.json_response({"scenario_id": scenario_id, "project": {"project_id": scenario_id}})
+
+    @routes.get("/projects/{project_id}/territory")
+    async def get_project_territory(request: web.Request):
+        state.count("urban_api.project_territory")
+        region = state.regions[int(request.match_info["project_id"])]
+        return web.json_response({"geometry": region.project_territory()})
+
+    @routes.route("*", "/scenarios/indicators_values")
+    async def save_scenario_indicators(request: web.Request):
+        state.count("urban_api.scenario_indicators")
+        return web.json_response({}, status=201)
+
+    application = web.Application(client_max_size=1024 ** 3)
+    application.add_routes(routes)
+    return application
+
+
+def make_transportframe(state: StandinState) -> web.Application:
+    routes = web.RouteTableDef()
+
+    @routes.get("/{region_id}/get_towns")
+    async def get_towns(request: web.Request):
+        state.count("transportframe.towns")
+        region = state.regions[int(request.match_info["region_id"])]
+        buffer = io.BytesIO()
+        region.towns.to_parquet(buffer)
+        return web.Response(body=buffer.getvalue(), content_type="application/vnd.apache.parquet")
+
+    @routes.get("/{region_id}/get_matrix")
+    async def get_matrix(request: web.Request):
+        state.count("transportframe.matrix")
+        region = state.regions[int(request.match_info["region_id"])]
+        body = npy_bytes(region.towns.index.to_numpy()) + npy_bytes(region.matrix)
+        return web.Response(body=body, content_type="application/x-npy")
+
+    application = web.Application()
+    application.add_routes(routes)
+    return application
+
+
+def make_geoserver(state: StandinState, workspace: str) -> web.Application:
+    routes = web.RouteTableDef()
+
+    @routes.put("/geoserver/rest/workspaces/{workspace}/datastores/{name}/file.gpkg")
+    async def upload(request: web.Request):
+        state.count("geoserver.upload")
+        size = 0
+        async for chunk in request.content.iter_chunked(1024 ** 2):
+            size += len(chunk)
+        state.layers[request.match_info["name"]] = size
+        return web.Response(status=201)
+
+    @routes.post("/geoserver/gwc/rest/seed/{layer}")
+    async def seed(request: web.Request):
+        state.count("geoserver.seed")
+        return web.Response(status=200)
+
+    @routes.get("/geoserver/rest/workspaces/{workspace}/layers")
+    async def get_layers(request: web.Request):
+        state.count("geoserver.layers")
+        if not state.layers:
+            return web.json_response({"layers": ""})
+        host = request.host
+        return web.json_response({"layers": {"layer": [
+            {"name": name, "href": f"http://{host}/geoserver/rest/workspaces/{workspace}/layers/{name}.json"}
+            for name in state.layers
+        ]}})
+
+    @routes.delete("/geoserver/rest/workspaces/{workspace}/{kind}/{name}")
+    async def delete(request: web.Request):
+        state.count("geoserver.delete")
+        state.layers.pop(request.match_info["name"], None)
+        return web.Response(status=200)
+
+    application = web.Application(client_max_size=1024 ** 3)
+    application.add_routes(routes)
+    return application
+
+
+class StandinServers:
+    """Context manager running stand-ins on free local ports in background thread"""
+
+    def __init__(self, state: StandinState, geoserver_workspace: str = "bench") -> None:
+        self.state = state
+        self.geoserver_workspace = geoserver_workspace
+        self.ports: dict[str, int] = {}
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._runners: list[web.AppRunner] = []
+
+    async def _start(self) -> None:
+        applications = {
+            "urban_api": make_urban_api(self.state),
+            "transportframe": make_transportframe(self.state),
+            "geoserver": make_geoserver(self.state, self.geoserver_workspace),
+        }
+        for name, application in applications.items():
+            runner = web.AppRunner(application, access_log=None)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            self._runners.append(runner)
+            self.ports[name] = runner.addresses[0][1]
+
+    async def _stop(self) -> None:
+        for runner in self._runners:
+            await runner.cleanup()
+
+    def url(self, name: str) -> str:
+        return f"http://127.0.0.1:{self.ports[name]}"
+
+    def __enter__(self) -> "StandinServers":
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+        return self
+
+    def __exit__(self, *args) -> None:
+        asyncio.run_coroutine_threadsafe(self._stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+def standin_env(servers: StandinServers) -> dict[str, str]:
+    """
+    Function returns app config pointing upstreams to stand-ins
+    Args:
+        servers (StandinServers): running stand-ins
+    Returns:
+        dict[str, str]: env variables
+    """
+
+    return {
+        "URBAN_API": servers.url("urban_api"),
+        "TRANSPORTFRAME_API": servers.url("transportframe"),
+        "GEOSERVER_HOST": "127.0.0.1",
+        "GEOSERVER_PORT": str(servers.ports["geoserver"]),
+        "GEOSERVER_LOGIN": "bench",
+        "GEOSERVER_PASSWORD": "bench",
+        "GEOSERVER_WORKSPACE": servers.geoserver_workspace,
+    }
+
@@ -0,0 +1,90 @@
+from dataclasses import dataclass
+from functools import cached_property
+
+import geopandas as gpd
+import numpy as np
+import shapely
+from shapely.geometry import box, mapping
+
+EARTH_KM_PER_DEGREE = 111.32
+CAR_SPEED_KMH = 60
+DETOUR_FACTOR = 1.3
+
+
+@dataclass
+class SyntheticRegion:
+    """Class for reproducible synthetic region with upstream payloads for benchmarks"""
+
+    region_id: int
+    towns_count: int
+    seed: int = 0
+    first_town_id: int = 1_000_000
+
+    @cached_property
+    def _rng(self) -> np.random.Generator:
+        return np.random.default_rng(self.seed + self.region_id)
+
+    @cached_property
+    def center(self) -> tuple[float, float]:
+        return 30 + (self.region_id % 20), 55 + (self.region_id % 10)
+
+    @cached_property
+    def half_size(self) -> float:
+        """Half of region side in degrees, keeps towns density comparable between sizes"""
+
+        return max(0.5, np.sqrt(self.towns_count) * 0.08)
+
+    @cached_property
+    def borders(self) -> gpd.GeoDataFrame:
+        lon, lat = self.center
+        return gpd.GeoDataFrame(
+            geometry=[box(lon - self.half_size, lat - self.half_size, lon + self.half_size, lat + self.half_size)],
+            crs=4326,
+        )
+
+    @cached_property
+    def towns(self) -> gpd.GeoDataFrame:
+        lon, lat = self.center
+        coordinates = self._rng.uniform(
+            [lon - self.half_size * 0.95, lat - self.half_size * 0.95],
+            [lon + self.half_size * 0.95, lat + self.half_size * 0.95],
+            (self.towns_count, 2),
+        )
+        return gpd.GeoDataFrame(
+            {"name": [f"town_{i}" for i in range(self.towns_count)]},
+            geometry=shapely.points(coordinates),
+            index=np.arange(self.first_town_id, self.first_town_id + self.towns_count),
+            crs=4326,
+        )
+
+    @cached_property
+    def population(self) -> dict[int, int]:
+        values = np.clip(self._rng.lognormal(7, 1.5, self.towns_count), 10, 5_000_000).astype(int)
+        return dict(zip(self.towns.index.tolist(), values.tolist()))
+
+    @cached_property
+    def matrix(self) -> np.ndarray:
+        """Dense car travel times in minutes estimated from straight line distances"""
+
+        coordinates = shapely.get_coordinates(self.towns.geometry.values)
+        scale = np.array([np.cos(np.radians(self.center[1])), 1.0]) * EARTH_KM_PER_DEGREE
+        km = (coordinates * scale).astype(np.float32)
+        matrix = np.empty((len(km), len(km)), dtype=np.float32)
+        for start in range(0, len(km), 512):
+            block = km[start: start + 512]
+            matrix[start: start + 512] = np.sqrt(((block[:, None, :] - km[None, :, :]) ** 2).sum(axis=-1))
+        matrix *= DETOUR_FACTOR / CAR_SPEED_KMH * 60
+        return matrix
+
+    def project_territory(self, scale: float = 0.05) -> dict:
+        """
+        Function returns project territory geometry inside region
+        Args:
+            scale (float): territory side relative to region side
+        Returns:
+            dict: geojson geometry
+        """
+
+        lon, lat = self.center
+        half = self.half_size * scale
+        return mapping(box(lon - half, lat - half, lon + half, lat + half))
@@ -0,0 +1,49 @@
+"""
+Gunicorn config for multi-worker deployment.
+
+App is imported in master (preload_app), popframe methods and the most recent models
+(PRELOAD_REGIONS, up to POPFRAME_RESIDENT_MODELS) are loaded there, then objects are frozen out of
+garbage collector, so forked workers share them copy-on-write instead of holding own copies.
+Workers notice recalculated models by stored model version and reload them.
+
+With several workers prometheus client runs in multiprocess mode (PROMETHEUS_MULTIPROC_DIR), so /metrics
+aggregates histograms and counters of all workers. Collectors of in-process state (upstream circuit breakers,
+resident models cache) still report the worker serving the scrape.
+"""
+
+import gc
+import os
+import shutil
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:80")
+workers = int(os.getenv("GUNICORN_WORKERS", "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "1000"))
+preload_app = True
+
+if workers > 1:
+    os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/popframe_prometheus")
+if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    # config is loaded before app is imported, so metrics files of previous run are removed before new ones appear
+    shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+
+def when_ready(server):
+    from app.dependences import get_config_value
+    from app.common.storage.models.pop_frame_caching_service import pop_frame_caching_service
+
+    region_ids = pop_frame_caching_service.get_preload_regions(get_config_value("PRELOAD_REGIONS"))
+    loaded = pop_frame_caching_service.preload_models(region_ids)
+    server.log.info(f"Preloaded models for regions {loaded}")
+    # objects surviving till fork are moved to permanent generation, collections in workers
+    # don't touch their headers and don't copy shared pages
+    gc.collect()
+    gc.freeze()
+
+
+def child_exit(server, worker):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
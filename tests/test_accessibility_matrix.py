@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.common.models.popframe_models.accessibility_matrix import (
+    CompactAccessibilityMatrix,
+    SparseAccessibilityMatrix,
+    load_accessibility_matrix,
+)
+
+
+@pytest.fixture
+def adj_mx() -> pd.DataFrame:
+    values = np.array([
+        [0.0, 12.34, np.inf],
+        [12.5, 0.0, 40.0],
+        [np.nan, 41.0, 0.0],
+    ])
+    return pd.DataFrame(values, index=[10, 20, 30], columns=[10, 20, 30])
+
+
+@pytest.mark.parametrize("dtype", ["float32", "uint16"])
+def test_compact_matrix_keeps_values(adj_mx, dtype):
+    matrix = CompactAccessibilityMatrix.from_frame(adj_mx, dtype=dtype)
+    assert matrix.get(10, 20) == pytest.approx(12.34, abs=0.05)
+    assert matrix.get(10, 30) == np.inf
+    assert matrix.get(30, 10) == np.inf
+    assert matrix.nbytes == 9 * (4 if dtype == "float32" else 2)
+
+
+def test_select_is_view_with_label_order(adj_mx, tmp_path):
+    matrix = CompactAccessibilityMatrix.from_frame(adj_mx, dtype="uint16")
+    selected = matrix.select([30, 20])
+    assert selected.data is matrix.data
+    assert selected.get(30, 20) == pytest.approx(41.0)
+    frame = selected.to_frame()
+    assert frame.index.to_list() == [30, 20]
+    assert frame.values.dtype == np.float32
+
+    selected.save(tmp_path / "1.matrix.npz")
+    loaded = CompactAccessibilityMatrix.load(tmp_path / "1.matrix.npz")
+    assert loaded.labels.to_list() == [30, 20]
+    assert np.array_equal(loaded.to_numpy(), selected.to_numpy())
+
+
+@pytest.mark.parametrize("dtype", ["float32", "uint16"])
+def test_frame_for_region_keeps_unreachable_pairs_as_nan(adj_mx, dtype):
+    frame = CompactAccessibilityMatrix.from_frame(adj_mx, dtype=dtype).to_frame()
+    expected = adj_mx.where(np.isfinite(adj_mx), np.nan)
+    assert np.allclose(frame.values, expected.values, atol=0.05, equal_nan=True)
+    assert np.isinf(CompactAccessibilityMatrix.from_frame(adj_mx, dtype=dtype).to_frame(np.inf).values).sum() == 2
+
+
+def test_missing_towns_raise(adj_mx):
+    matrix = CompactAccessibilityMatrix.from_frame(adj_mx)
+    with pytest.raises(KeyError):
+        matrix.select([10, 40])
+
+
+def test_sparse_matrix_matches_dense_within_cutoff(adj_mx, tmp_path):
+    sparse = SparseAccessibilityMatrix.from_frame(adj_mx, max_travel_time=40)
+    assert len(sparse.data) == 6
+    assert sparse.get(20, 30) == 40
+    assert sparse.get(30, 20) == np.inf
+
+    selected = sparse.select([30, 10, 20])
+    expected = adj_mx.loc[[30, 10, 20], [30, 10, 20]].where(lambda df: df <= 40, np.nan)
+    assert np.allclose(selected.to_frame().values, expected.values, equal_nan=True)
+
+    selected.save(tmp_path / "1.matrix.npz")
+    loaded = load_accessibility_matrix(tmp_path / "1.matrix.npz")
+    assert isinstance(loaded, SparseAccessibilityMatrix)
+    assert np.array_equal(loaded.to_numpy(), selected.to_numpy())
+
+
+@pytest.mark.parametrize("dtype", ["float32", "uint16"])
+def test_frame_owns_materialized_float32_array(adj_mx, dtype, monkeypatch):
+    monkeypatch.setattr("app.common.models.popframe_models.accessibility_matrix.MATERIALIZE_BLOCK_ROWS", 2)
+    matrix = CompactAccessibilityMatrix.from_frame(adj_mx, dtype=dtype)
+    for selection in (matrix, matrix.select([30, 10, 20])):
+        frame = selection.to_frame()
+        assert frame.values.dtype == np.float32
+        assert not np.shares_memory(frame.values, matrix.data)
+        expected = adj_mx.loc[selection.labels, selection.labels].where(np.isfinite, np.nan)
+        assert np.allclose(frame.values, expected.values, atol=0.05, equal_nan=True)
@@ -0,0 +1,59 @@
+import asyncio
+
+from app.common.api_handler.adaptive_fetcher import AdaptiveConcurrencyLimiter, AdaptiveFetcher
+
+
+def test_fetch_all_deduplicates_and_respects_window():
+    calls = []
+    in_flight = []
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=3, max_limit=3)
+
+    async def fetch(key):
+        calls.append(key)
+        in_flight.append(limiter.in_flight)
+        await asyncio.sleep(0.001)
+        return key * 10
+
+    result = asyncio.run(AdaptiveFetcher().fetch_all([3, 1, 3, 2, 1, 4], fetch, limiter=limiter))
+    assert result == {3: 30, 1: 10, 2: 20, 4: 40}
+    assert sorted(calls) == [1, 2, 3, 4]
+    assert max(in_flight) <= 3
+
+
+def test_limiter_decreases_on_errors_and_grows_on_fast_responses():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=16, min_limit=2, latency_target=1.0)
+
+    async def scenario():
+        await limiter.acquire()
+        await limiter.release(latency=0.1, success=False)
+        decreased = limiter.limit
+        for _ in range(20):
+            await limiter.acquire()
+            await limiter.release(latency=0.1, success=True)
+        return decreased, limiter.limit
+
+    decreased, grown = asyncio.run(scenario())
+    assert decreased == 8
+    assert grown > decreased
+
+
+def test_fetches_get_own_window_and_bounded_workers():
+    fetcher = AdaptiveFetcher(initial_limit=4, max_limit=4)
+    tasks = []
+
+    async def fetch(key):
+        tasks.append(len(asyncio.all_tasks()))
+        await asyncio.sleep(0.001)
+        return key
+
+    async def scenario():
+        return await asyncio.gather(
+            fetcher.fetch_all(range(200), fetch),
+            fetcher.fetch_all(range(200, 400), fetch),
+        )
+
+    first = asyncio.run(scenario())
+    second = asyncio.run(fetcher.fetch_all(range(50), fetch))
+    assert list(first[0]) == list(range(200)) and list(first[1]) == list(range(200, 400))
+    assert list(second) == list(range(50))
+    assert max(tasks) <= 1 + 2 + 2 * 4
@@ -0,0 +1,189 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from fastapi import HTTPException
+
+from app.common.api_handler.api_handler import APIHandler
+from app.common.api_handler.response_cache import ResponseCache
+from app.common.api_handler.retry_policy import RetryPolicy, CircuitBreaker
+
+
+def run_with_server(routes: list[web.RouteDef], scenario):
+    async def runner():
+        application = web.Application()
+        application.add_routes(routes)
+        server = TestServer(application)
+        await server.start_server()
+        try:
+            return await scenario(str(server.make_url("")))
+        finally:
+            await server.close()
+
+    return asyncio.run(runner())
+
+
+def test_retries_transient_errors_and_keeps_body():
+    calls = []
+
+    async def flaky(request: web.Request):
+        calls.append(await request.json())
+        if len(calls) < 3:
+            return web.json_response({"error": "Connection reset by peer"}, status=500)
+        return web.json_response({"ok": True})
+
+    async def scenario(base_url):
+        handler = APIHandler(base_url, retry_policy=RetryPolicy(base_delay=0.01))
+        return await handler.put("/value", data={"value": 1}, retry=True), handler
+
+    result, handler = run_with_server([web.put("/value", flaky)], scenario)
+    assert result == {"ok": True}
+    assert calls == [{"value": 1}] * 3
+    assert handler.metrics.retries == 2
+
+
+def test_writes_are_not_retried_by_default():
+    calls = []
+
+    async def timeout(request: web.Request):
+        calls.append(await request.json())
+        return web.Response(status=504, text="gateway timeout")
+
+    async def scenario(base_url):
+        handler = APIHandler(
+            base_url,
+            retry_policy=RetryPolicy(base_delay=0.01),
+            circuit_breaker=CircuitBreaker(failure_threshold=10),
+        )
+        with pytest.raises(HTTPException) as error:
+            await handler.post("/values", data={"value": 1})
+        return error.value, handler
+
+    error, handler = run_with_server([web.post("/values", timeout)], scenario)
+    assert error.status_code == 504
+    assert calls == [{"value": 1}]
+    assert handler.metrics.retries == 0
+
+
+def test_retries_are_bounded():
+    async def unavailable(request: web.Request):
+        return web.Response(status=503, text="unavailable")
+
+    async def scenario(base_url):
+        handler = APIHandler(
+            base_url,
+            retry_policy=RetryPolicy(max_attempts=3, base_delay=0.01),
+            circuit_breaker=CircuitBreaker(failure_threshold=10),
+        )
+        with pytest.raises(HTTPException) as error:
+            await handler.get("/data")
+        return error.value, handler
+
+    error, handler = run_with_server([web.get("/data", unavailable)], scenario)
+    assert error.status_code == 503
+    assert handler.metrics.requests == 3
+
+
+def test_open_circuit_fails_fast():
+    async def unavailable(request: web.Request):
+        return web.Response(status=502, text="bad gateway")
+
+    async def scenario(base_url):
+        handler = APIHandler(
+            base_url,
+            retry_policy=RetryPolicy(max_attempts=2, base_delay=0.01),
+            circuit_breaker=CircuitBreaker(failure_threshold=2, recovery_timeout=60),
+        )
+        with pytest.raises(HTTPException):
+            await handler.get("/data")
+        with pytest.raises(HTTPException) as error:
+            await handler.get("/data")
+        return error.value, handler
+
+    error, handler = run_with_server([web.get("/data", unavailable)], scenario)
+    assert error.status_code == 503
+    assert handler.metrics.requests == 2
+    assert handler.metrics.short_circuited == 1
+    assert handler.get_metrics()["circuit_state"] == "open"
+
+
+def test_response_cache_serves_hits_and_revalidates(tmp_path):
+    calls = []
+
+    async def territory(request: web.Request):
+        calls.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304)
+        return web.json_response({"territory_id": 1}, headers={"ETag": '"v1"'})
+
+    async def scenario(base_url):
+        cache = ResponseCache(ttl_rules=[(r"/territory/\d+", 60)], cache_path=tmp_path)
+        handler = APIHandler(base_url, response_cache=cache)
+        first = await handler.get("/territory/1", params={"b": 1, "a": 2})
+        second = await handler.get("/territory/1", params={"a": 2, "b": 1})
+        for entry in cache._memory.values():
+            entry.expires_at = 0
+        third = await handler.get("/territory/1", params={"a": 2, "b": 1})
+        return [first, second, third], cache
+
+    results, cache = run_with_server([web.get("/territory/{territory_id}", territory)], scenario)
+    assert results == [{"territory_id": 1}] * 3
+    assert calls == [None, '"v1"']
+    assert cache.metrics["hits"] == 1
+    assert cache.metrics["revalidated"] == 1
+
+
+def test_cancelled_probe_is_released():
+    async def slow(request: web.Request):
+        await asyncio.sleep(10)
+        return web.json_response({"ok": True})
+
+    async def scenario(base_url):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0)
+        breaker.record_failure()
+        handler = APIHandler(base_url, retry_policy=RetryPolicy(max_attempts=1), circuit_breaker=breaker)
+        probe = asyncio.create_task(handler.get("/data"))
+        await asyncio.sleep(0.2)
+        assert breaker.state == "half_open"
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        return breaker
+
+    breaker = run_with_server([web.get("/data", slow)], scenario)
+    assert breaker.state == "half_open"
+    assert breaker.allow_request()
+
+
+def test_cached_responses_are_not_shared_between_callers(tmp_path):
+    async def territory(request: web.Request):
+        return web.json_response({"territory_id": 1, "children": [2, 3]})
+
+    async def scenario(base_url):
+        cache = ResponseCache(ttl_rules=[(r"/territory/\d+", 60)], cache_path=tmp_path)
+        handler = APIHandler(base_url, response_cache=cache)
+        first = await handler.get("/territory/1")
+        first.pop("territory_id")
+        second = await handler.get("/territory/1")
+        second["children"].append(4)
+        return await handler.get("/territory/1")
+
+    result = run_with_server([web.get("/territory/{territory_id}", territory)], scenario)
+    assert result == {"territory_id": 1, "children": [2, 3]}
+
+
+def test_disk_tier_limit_holds_for_workers_sharing_directory(tmp_path):
+    async def scenario():
+        first = ResponseCache(ttl_rules=[], cache_path=tmp_path, max_memory_bytes=0, max_disk_bytes=1000)
+        second = ResponseCache(ttl_rules=[], cache_path=tmp_path, max_memory_bytes=0, max_disk_bytes=1000)
+        await first.set("a", {"value": "x" * 300}, 60)
+        assert (await second.get("a")).data == {"value": "x" * 300}
+        for key in ("b", "c", "d"):
+            await second.set(key, {"value": "x" * 300}, 60)
+        return first, await first.get("a")
+
+    first, evicted = asyncio.run(scenario())
+    assert evicted is None
+    assert sum(file.stat().st_size for file in tmp_path.glob("*.json")) <= 1000
+    assert "a" not in first._disk_index
@@ -0,0 +1,51 @@
+import asyncio
+import os
+import time
+
+from app.common.storage.cache_janitor import CacheJanitor, CacheArtifact, CacheBudget
+
+
+def make_file(path, size: int, age: float):
+    path.write_bytes(b"0" * size)
+    timestamp = time.time() - age
+    os.utime(path, (timestamp, timestamp))
+    return path
+
+
+def test_evicts_expired_then_oldest_until_size_budget(tmp_path):
+    files = {
+        "current": make_file(tmp_path / "current", 100, age=10_000),
+        "expired": make_file(tmp_path / "expired", 10, age=5_000),
+        "old": make_file(tmp_path / "old", 50, age=3_000),
+        "recent": make_file(tmp_path / "recent", 50, age=2_000),
+        "writing": make_file(tmp_path / "writing", 500, age=1),
+    }
+
+    def collect():
+        return [
+            CacheArtifact.from_paths(name, [path], protected=name == "current")
+            for name, path in files.items() if path.exists()
+        ]
+
+    janitor = CacheJanitor(grace_period=60)
+    janitor.register("cache", collect, CacheBudget(max_bytes=660, max_age=4_000))
+    report = asyncio.run(janitor.run_once())["cache"]
+
+    assert report["evicted_names"] == ["expired", "old"]
+    assert report["reclaimed_bytes"] == 60
+    assert report["remaining_bytes"] == 650
+    assert {i.name for i in tmp_path.iterdir()} == {"current", "recent", "writing"}
+
+
+def test_directory_artifacts_are_removed_together(tmp_path):
+    snapshot = tmp_path / "1" / "2024-01-01-00-00-00"
+    snapshot.mkdir(parents=True)
+    make_file(snapshot / "matrix.npz", 20, age=7_200)
+    os.utime(snapshot, (time.time() - 7_200, time.time() - 7_200))
+
+    janitor = CacheJanitor(grace_period=60)
+    janitor.register("snapshots", lambda: [CacheArtifact.from_paths("1", [snapshot])], CacheBudget(max_age=3_600))
+    report = asyncio.run(janitor.run_once())["snapshots"]
+
+    assert report["reclaimed_bytes"] == 20
+    assert not snapshot.exists()
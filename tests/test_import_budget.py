@@ -0,0 +1,47 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+IMPORT_BUDGET_SECONDS = float(os.getenv("IMPORT_BUDGET_SECONDS", "10"))
+LAZY_MODULES = ("popframe", "matplotlib", "sklearn", "osmnx", "networkx")
+TEST_ENV = {
+    "URBAN_API": "http://127.0.0.1:1",
+    "TRANSPORTFRAME_API": "http://127.0.0.1:1",
+    "GEOSERVER_HOST": "127.0.0.1",
+    "GEOSERVER_PORT": "1",
+    "GEOSERVER_LOGIN": "test",
+    "GEOSERVER_PASSWORD": "test",
+    "GEOSERVER_WORKSPACE": "test",
+    "GEOSERVER_CACHE_PATH": "geoserver_cache",
+    "POPFRAME_MODEL_CACHE": "models_cache",
+    "LOGS_FILE": "app.log",
+    "REDIS_HOST": "127.0.0.1",
+    "REDIS_PORT": "6379",
+}
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import app.main
+print(json.dumps({
+    "seconds": time.perf_counter() - start,
+    "loaded": [name for name in %r if name in sys.modules],
+}))
+"""
+
+
+def test_app_import_is_within_budget_and_defers_popframe(tmp_path):
+    (tmp_path / ".env.importbudget").write_text("".join(f"{key}={value}\n" for key, value in TEST_ENV.items()))
+    env = {**os.environ, "APP_ENV": "importbudget", "PYTHONPATH": str(REPO_ROOT)}
+    env.pop("PRELOAD_POPFRAME", None)
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT % (LAZY_MODULES,)],
+        cwd=tmp_path, env=env, capture_output=True, text=True, timeout=120,
+    )
+
+    assert result.returncode == 0, result.stderr
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    assert report["loaded"] == []
+    assert report["seconds"] < IMPORT_BUDGET_SECONDS
@@ -0,0 +1,43 @@
+import geopandas as gpd
+import numpy as np
+import shapely
+from shapely.geometry import box, Point
+
+from app.common.models.popframe_models.landuse_layer import LanduseLayer
+
+TAG_FILTERS = [{"landuse": "forest"}, {"landuse": "residential"}, {"natural": "water"}]
+
+
+def make_osm() -> dict[str, gpd.GeoDataFrame]:
+    rng = np.random.default_rng(3)
+    osm = {}
+    for tags in TAG_FILTERS:
+        corners = rng.random((40, 2)) * 10
+        geometries = [box(x, y, x + rng.random(), y + rng.random()) for x, y in corners] + [Point(corners[0])]
+        osm[LanduseLayer.get_filter_id(tags)] = gpd.GeoDataFrame(geometry=geometries, crs=4326)
+    return osm
+
+
+def test_project_features_match_direct_request(tmp_path):
+    osm = make_osm()
+    calls = []
+
+    def fetch_osm(polygon, tags):
+        calls.append(tags)
+        features = osm[LanduseLayer.get_filter_id(tags)]
+        return features[features.intersects(polygon)]
+
+    layer = LanduseLayer.build(box(0, 0, 11, 11), TAG_FILTERS, fetch_osm, version=(1, 2))
+    assert len(calls) == len(TAG_FILTERS)
+    layer.save(tmp_path / "1.landuse.parquet")
+    loaded = LanduseLayer.load(tmp_path / "1.landuse.parquet")
+    assert loaded.version == (1, 2)
+    assert loaded.tag_filters == TAG_FILTERS
+
+    project = shapely.Polygon([(2, 2), (6, 3), (5, 7), (1, 5)])
+    assert loaded.covers(project) and not loaded.covers(box(10, 10, 12, 12))
+    for tags in TAG_FILTERS:
+        expected = fetch_osm(project, tags).geometry
+        result = loaded.fetch(project, tags).geometry
+        assert len(result) == len(expected) > 0
+        assert shapely.equals(result.union_all(), expected.union_all())
@@ -0,0 +1,52 @@
+from datetime import datetime
+
+from app.common.storage.geoserver.layer_registry import LayerRegistry
+
+
+def test_migrates_legacy_files_keeping_newest(tmp_path):
+    for filename in [
+        "2024-01-01-10-00-00_popframe_1_cities.gpkg",
+        "2024-02-01-10-00-00_popframe_1_cities.gpkg",
+        "2024-02-01-10-00-00_popframe_1_agglomerations.gpkg",
+        "unexpected.gpkg",
+    ]:
+        (tmp_path / filename).touch()
+
+    registry = LayerRegistry(tmp_path)
+    assert registry.get(1, "cities").path == "2024-02-01-10-00-00_popframe_1_cities.gpkg"
+    assert registry.get(1, "agglomerations") is not None
+    assert registry.get(2, "cities") is None
+    assert not (tmp_path / "2024-01-01-10-00-00_popframe_1_cities.gpkg").exists()
+    assert (tmp_path / "unexpected.gpkg").exists()
+
+
+def test_register_persists_and_delete_is_targeted(tmp_path):
+    registry = LayerRegistry(tmp_path)
+    for region_id in (1, 2):
+        filename = f"2024-03-01-10-00-00_popframe_{region_id}_cities.gpkg"
+        (tmp_path / filename).touch()
+        registry.register(region_id, "cities", filename, datetime(2024, 3, 1, 10))
+    registry.set_href(1, "cities", "http://geoserver/layer.json")
+
+    reloaded = LayerRegistry(tmp_path)
+    assert reloaded.get(1, "cities").href == "http://geoserver/layer.json"
+    assert reloaded.delete_region(1) == ["2024-03-01-10-00-00_popframe_1_cities.gpkg"]
+    assert reloaded.get(1, "cities") is None
+    assert reloaded.get(2, "cities") is not None
+    assert not (tmp_path / "2024-03-01-10-00-00_popframe_1_cities.gpkg").exists()
+
+
+def test_workers_see_and_keep_each_other_records(tmp_path):
+    first, second = LayerRegistry(tmp_path), LayerRegistry(tmp_path)
+    assert first.records == {} and second.records == {}
+    for registry, region_id in ((first, 1), (second, 2), (first, 3)):
+        filename = f"2024-03-01-10-00-00_popframe_{region_id}_cities.gpkg"
+        (tmp_path / filename).touch()
+        registry.register(region_id, "cities", filename, datetime(2024, 3, 1, 10))
+    revision = second.revision
+
+    assert set(second.records) == {(1, "cities"), (2, "cities"), (3, "cities")}
+    assert second.revision > revision
+    second.set_href(3, "cities", "http://geoserver/layer.json")
+    assert first.get(3, "cities").href == "http://geoserver/layer.json"
+    assert set(LayerRegistry(tmp_path).records) == {(1, "cities"), (2, "cities"), (3, "cities")}
@@ -0,0 +1,24 @@
+import geopandas as gpd
+import pytest
+from shapely.geometry import Point
+
+from app.common.storage.geoserver.layer_writers import LAYER_WRITERS, get_layer_writer
+
+
+@pytest.mark.parametrize("staging_format", list(LAYER_WRITERS))
+def test_writers_round_trip(tmp_path, staging_format):
+    layer = gpd.GeoDataFrame({"name": ["a", "b"]}, geometry=[Point(1, 2), Point(3, 4)], crs=4326)
+    writer = get_layer_writer(staging_format)
+    path = tmp_path / f"layer{writer.ext}"
+    writer.write(layer, path)
+    result = gpd.read_parquet(path) if writer.ext == ".parquet" else gpd.read_file(path)
+    assert sorted(result["name"]) == ["a", "b"]
+    assert result.crs.to_epsg() == 4326
+
+
+def test_geoserver_accepts_only_geopackage():
+    assert get_layer_writer("gpkg_no_index", target="geoserver").ext == ".gpkg"
+    with pytest.raises(ValueError):
+        get_layer_writer("fgb", target="geoserver")
+    with pytest.raises(ValueError):
+        get_layer_writer("shp")
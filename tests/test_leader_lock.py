@@ -0,0 +1,15 @@
+from app.common.storage.leader_lock import LeaderLock
+
+
+def test_only_one_holder_until_released(tmp_path):
+    path = tmp_path / "cache" / ".leader.lock"
+    leader, follower = LeaderLock(path), LeaderLock(path)
+
+    assert leader.acquire()
+    assert leader.acquire()
+    assert not follower.acquire()
+    assert not follower.is_leader
+
+    leader.release()
+    assert follower.acquire()
+    follower.release()
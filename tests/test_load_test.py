@@ -0,0 +1,58 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from benchmarks.load_test import load_mix, run_level, summarize_level
+from benchmarks.synthetic import SyntheticRegion
+
+
+def test_load_mix_resolves_endpoints_and_recorded_requests(tmp_path):
+    path = tmp_path / "mix.jsonl"
+    path.write_text("\n".join([
+        json.dumps({"endpoint": "agglomeration.get_href", "weight": 3}),
+        "",
+        json.dumps({"url": "/model_calculator/available_regions"}),
+    ]))
+    mix = load_mix(path, SyntheticRegion(region_id=7, towns_count=10))
+
+    assert [i.name for i in mix] == ["agglomeration.get_href", "GET /model_calculator/available_regions"]
+    assert mix[0].request["params"] == {"region_id": 7}
+    assert mix[0].weight == 3
+
+    path.write_text(json.dumps({"endpoint": "missing"}))
+    with pytest.raises(ValueError):
+        load_mix(path, SyntheticRegion(region_id=7, towns_count=10))
+
+
+def test_run_level_measures_latency_and_loop_lag(tmp_path):
+    application = FastAPI()
+
+    @application.get("/fast")
+    async def fast():
+        return 1
+
+    @application.get("/blocking")
+    async def blocking():
+        time.sleep(0.05)
+        return 1
+
+    path = tmp_path / "mix.jsonl"
+    path.write_text("\n".join(json.dumps({"url": url}) for url in ["/fast", "/blocking", "/missing"]))
+    mix = load_mix(path, SyntheticRegion(region_id=1, towns_count=10))
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=application)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await run_level(client, mix, concurrency=4, duration=0.5, seed=0, lag_interval=0.01)
+
+    summary = summarize_level(asyncio.run(scenario()))
+
+    assert summary["concurrency"] == 4
+    assert summary["requests"] > 0
+    assert summary["endpoints"]["GET /missing"]["statuses"] == {404: summary["endpoints"]["GET /missing"]["requests"]}
+    assert summary["latency"]["p50"] <= summary["latency"]["p99"]
+    assert summary["loop_lag"]["max"] >= 0.03
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from app.common.logs.log_reader import follow, parse_range, read_range, read_tail
+
+
+def test_parse_range():
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=95-200", 100) == (95, 99)
+    for header in ("bytes=100-", "bytes=5-1", "bytes=-", "bytes=0-1,5-6", "lines=0-1"):
+        with pytest.raises(ValueError):
+            parse_range(header, 100)
+
+
+def test_read_tail_reads_last_lines(tmp_path):
+    path = tmp_path / "app.log"
+    path.write_bytes(b"".join(f"line {i}\n".encode() for i in range(10000)))
+
+    assert read_tail(path, 3, chunk_size=16) == b"line 9997\nline 9998\nline 9999\n"
+    assert read_tail(path, 20000).count(b"\n") == 10000
+    path.write_bytes(b"first\nsecond")
+    assert read_tail(path, 1) == b"second"
+    path.write_bytes(b"")
+    assert read_tail(path, 5) == b""
+
+
+def test_read_range(tmp_path):
+    path = tmp_path / "app.log"
+    path.write_bytes(bytes(range(256)) * 10)
+
+    async def read():
+        return b"".join([chunk async for chunk in read_range(path, 250, 1029, chunk_size=100)])
+
+    assert asyncio.run(read()) == (bytes(range(256)) * 10)[250:1030]
+
+
+def test_follow_streams_appended_lines_across_rotation(tmp_path):
+    path = tmp_path / "app.log"
+    path.write_text("old 1\nold 2\n")
+
+    async def scenario():
+        events = follow(path, tail_lines=1, poll_interval=0.01)
+        received = [await events.__anext__()]
+        with path.open("a") as fout:
+            fout.write("new 1\nnew")
+        received.append(await events.__anext__())
+        with path.open("a") as fout:
+            fout.write(" 2\n")
+        received.append(await events.__anext__())
+        path.rename(tmp_path / "app.1.log")
+        path.write_text("rotated\n")
+        received.append(await events.__anext__())
+        await events.aclose()
+        return received
+
+    assert asyncio.run(asyncio.wait_for(scenario(), 5)) == [
+        "data: old 2\n\n", "data: new 1\n\n", "data: new 2\n\n", "data: rotated\n\n",
+    ]
@@ -0,0 +1,47 @@
+import asyncio
+import time
+from pathlib import Path
+
+from app.common.metrics.loop_watchdog import LoopWatchdog
+
+
+def blocking_handler(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+def test_watchdog_attributes_stall_to_blocking_call_site():
+    watchdog = LoopWatchdog(interval=0.01, threshold=0.05, app_root=Path(__file__).parent)
+
+    async def scenario():
+        watchdog.start()
+        await asyncio.sleep(0.05)
+        blocking_handler(0.3)
+        await asyncio.sleep(0.05)
+        await watchdog.stop()
+        return watchdog.get_report()
+
+    report = asyncio.run(scenario())
+
+    assert report["stalls"] == 1
+    assert report["max_lag"] >= 0.25
+    site = report["sites"][0]
+    assert site["site"].endswith("blocking_handler")
+    assert site["total_seconds"] >= 0.25
+    assert any("scenario" in line for line in site["last_stack"])
+    assert not report["running"]
+
+
+def test_watchdog_ignores_lag_below_threshold():
+    watchdog = LoopWatchdog(interval=0.01, threshold=0.2, app_root=Path(__file__).parent)
+
+    async def scenario():
+        watchdog.start()
+        for _ in range(3):
+            blocking_handler(0.03)
+            await asyncio.sleep(0.02)
+        await watchdog.stop()
+        return watchdog.get_report()
+
+    report = asyncio.run(scenario())
+    assert report["stalls"] == 0
+    assert report["sites"] == []
@@ -0,0 +1,68 @@
+import asyncio
+import io
+
+import numpy as np
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.common.api_handler.api_handler import APIHandler
+from app.common.models.popframe_models.services import matrix_transport
+from app.common.models.popframe_models.services.matrix_transport import (
+    read_matrix_response,
+    make_matrix_reader,
+    MATRIX_ACCEPT_HEADER,
+)
+
+
+def get_matrix(accept: str, response_reader=read_matrix_response):
+    index = np.array([10, 20, 30], dtype=np.int64)
+    values = np.arange(9, dtype=np.float32).reshape(3, 3)
+
+    async def matrix(request: web.Request):
+        if request.headers["Accept"].startswith("application/x-npy") and accept == "npy":
+            body = io.BytesIO()
+            np.save(body, index)
+            np.save(body, values)
+            return web.Response(body=body.getvalue(), content_type="application/x-npy")
+        return web.json_response(
+            {"values": values.tolist(), "index": index.tolist(), "columns": index.tolist()}
+        )
+
+    async def runner():
+        application = web.Application()
+        application.add_routes([web.get("/1/get_matrix", matrix)])
+        server = TestServer(application)
+        await server.start_server()
+        try:
+            handler = APIHandler(str(server.make_url("")))
+            return await handler.get_raw(
+                "/1/get_matrix",
+                response_reader=response_reader,
+                headers={"Accept": MATRIX_ACCEPT_HEADER},
+            )
+        finally:
+            await server.close()
+
+    return asyncio.run(runner())
+
+
+def test_binary_matrix_is_streamed_into_array():
+    adj_mx = get_matrix("npy")
+    assert adj_mx.values.dtype == np.float32
+    assert adj_mx.index.to_list() == [10, 20, 30]
+    assert adj_mx.loc[20, 30] == 5
+
+
+def test_json_matrix_fallback():
+    adj_mx = get_matrix("json")
+    assert adj_mx.columns.to_list() == [10, 20, 30]
+    assert adj_mx.loc[30, 10] == 6
+
+
+def test_binary_matrix_is_thresholded_by_row_blocks(monkeypatch):
+    monkeypatch.setattr(matrix_transport, "STREAM_CHUNK_SIZE", 8)
+    sparse = get_matrix("npy", make_matrix_reader(max_travel_time=5))
+    assert sparse.labels.to_list() == [10, 20, 30]
+    assert len(sparse.data) == 6
+    assert sparse.get(20, 30) == 5
+    assert sparse.get(30, 10) == np.inf
@@ -0,0 +1,32 @@
+import pytest
+from prometheus_client import CollectorRegistry, REGISTRY, generate_latest
+
+from app.common.api_handler.api_handler import APIHandler
+from app.common.metrics.prometheus_metrics import stage_timer, UpstreamMetricsCollector
+
+
+def get_stage_count(stage: str, region_id: int, outcome: str) -> float:
+    return REGISTRY.get_sample_value(
+        "popframe_model_stage_seconds_count",
+        {"stage": stage, "region_id": str(region_id), "outcome": outcome},
+    ) or 0
+
+
+def test_stage_timer_labels_outcome():
+    with stage_timer("matrix", 999):
+        pass
+    with pytest.raises(ValueError):
+        with stage_timer("matrix", 999):
+            raise ValueError()
+    assert get_stage_count("matrix", 999, "success") == 1
+    assert get_stage_count("matrix", 999, "error") == 1
+
+
+def test_upstream_collector_exports_handler_counters():
+    handler = APIHandler("http://localhost", name="test_upstream")
+    handler.metrics.retries = 3
+    registry = CollectorRegistry()
+    registry.register(UpstreamMetricsCollector([handler]))
+    assert registry.get_sample_value("popframe_upstream_retries_total", {"upstream": "test_upstream"}) == 3
+    assert registry.get_sample_value("popframe_upstream_circuit_open", {"upstream": "test_upstream"}) == 0
+    assert b"popframe_upstream_requests_total" in generate_latest(registry)
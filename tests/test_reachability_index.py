@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.common.models.popframe_models.reachability_index import ReachabilityIndex
+
+
+def test_lookups_match_matrix_scans():
+    rng = np.random.default_rng(1)
+    size = 80
+    matrix = (rng.random((size, size)) * 200).astype(np.float32)
+    matrix[rng.random((size, size)) < 0.05] = np.inf
+    matrix[rng.random((size, size)) < 0.02] = np.nan
+    np.fill_diagonal(matrix, 0)
+    population = rng.integers(100, 10 ** 6, size)
+    index = ReachabilityIndex.from_matrix(
+        matrix, range(1000, 1000 + size), population, max_time=150, block_size=7
+    )
+    positions = np.arange(size)
+
+    for time in (0, 10, 45.5, 90, 150):
+        with np.errstate(invalid="ignore"):
+            reachable = matrix <= time
+        assert (index.count_within(positions, time) == reachable.sum(axis=1)).all()
+        assert (index.population_within(positions, time) == (reachable * population).sum(axis=1)).all()
+
+    towns, times = index.neighbours_within(3, 60)
+    with np.errstate(invalid="ignore"):
+        expected = np.flatnonzero(matrix[3] <= 60)
+    assert set(towns) == set(expected + 1000)
+    assert (np.diff(times) >= 0).all()
+
+
+def test_index_roundtrips_and_rejects_unknown_towns(tmp_path):
+    adj_mx = pd.DataFrame([[0, 30], [40, 0]], index=[7, 9], columns=[7, 9], dtype=np.float32)
+    index = ReachabilityIndex.from_frame(adj_mx, pd.Series({9: 20, 7: 10}), max_time=60, version=(3, 4))
+    index.save(tmp_path / "1.reachability.npz")
+    loaded = ReachabilityIndex.load(tmp_path / "1.reachability.npz")
+
+    assert loaded.version == (3, 4)
+    assert loaded.population_within(loaded.positions([7, 9]), 35).tolist() == [30, 20]
+    with pytest.raises(ValueError):
+        ReachabilityIndex.from_frame(adj_mx, pd.Series({7: 10, 8: 20}), max_time=60)
+    with pytest.raises(KeyError):
+        loaded.positions([8])
+    with pytest.raises(ValueError):
+        loaded.count_within([0], 61)
@@ -0,0 +1,38 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.common.metrics.request_profiler import ProfilingMiddleware, RequestProfileStore
+
+
+def make_client(store: RequestProfileStore, sample_all: bool = False) -> TestClient:
+    application = FastAPI()
+
+    @application.get("/work/{size}")
+    async def work(size: int):
+        return sum(range(size))
+
+    application.add_middleware(ProfilingMiddleware, token="secret", store=store, sample_all=sample_all)
+    return TestClient(application)
+
+
+def test_profiles_only_authorized_requests():
+    store = RequestProfileStore(size=5)
+    client = make_client(store)
+    profiled = client.get("/work/1000", headers={"X-Profile": "1", "X-Profile-Token": "secret"})
+    rejected = client.get("/work/1000?profile=1&profile_token=wrong")
+
+    assert "x-profile-id" not in rejected.headers
+    profile = store.get(profiled.headers["x-profile-id"])
+    assert profile.path == "/work/1000"
+    assert profile.status == 200
+    assert '"$schema": "https://www.speedscope.app/file-format-schema.json"' in profile.render()
+
+
+def test_keeps_slowest_profiles():
+    store = RequestProfileStore(size=2)
+    client = make_client(store, sample_all=True)
+    for size in (10, 2_000_000, 10, 1_000_000, 10):
+        client.get(f"/work/{size}")
+
+    assert [profile.path for profile in store.slowest] == ["/work/2000000", "/work/1000000"]
+    assert len(store.recent) == 0
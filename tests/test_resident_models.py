@@ -0,0 +1,124 @@
+import geopandas as gpd
+import numpy as np
+import shapely
+from prometheus_client import CollectorRegistry
+
+from app.common.metrics.prometheus_metrics import ResidentModelsMetricsCollector
+from app.common.storage.models.resident_models import ResidentModelCache, deep_sizeof, measure_model
+
+
+class FakeRegion:
+    def __init__(self, towns_count: int) -> None:
+        self.towns = gpd.GeoDataFrame(
+            {"name": [f"town_{i}" for i in range(towns_count)]},
+            geometry=shapely.points(np.random.default_rng(0).random((towns_count, 2))),
+            crs=4326,
+        )
+        self.region = self.towns.iloc[:1]
+        self.accessibility_matrix = np.zeros((towns_count, towns_count), dtype=np.float32)
+
+
+def test_measure_model_counts_parts_and_shared_data_once():
+    model = FakeRegion(200)
+    parts = measure_model(model)
+
+    assert parts["accessibility_matrix"] >= 200 * 200 * 4
+    assert parts["towns"] > 200 * (16 + 100)
+    assert deep_sizeof(model.accessibility_matrix[:10]) >= model.accessibility_matrix.nbytes
+
+    model.matrix_view = model.accessibility_matrix[:10]
+    assert measure_model(model)["matrix_view"] < 1000
+
+
+def test_cache_evicts_least_recently_used_within_budgets():
+    cache = ResidentModelCache(max_models=2)
+    cache.put(1, FakeRegion(10))
+    cache.put(2, FakeRegion(10))
+    assert cache.get(1) is not None
+    cache.put(3, FakeRegion(10))
+
+    assert list(cache.entries) == [1, 3]
+    assert cache.get(2) is None
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 1, 1)
+
+    cache = ResidentModelCache(max_models=5, max_bytes=1)
+    cache.put(1, FakeRegion(10))
+    cache.put(2, FakeRegion(10))
+    assert list(cache.entries) == [2]
+
+
+def test_derived_results_are_accounted_and_dropped_with_model():
+    cache = ResidentModelCache(max_models=2)
+    cache.put(1, FakeRegion(10))
+    cache.set_derived(1, "frame", np.zeros(1000))
+
+    assert cache.get_derived(1, "frame") is not None
+    assert cache.get_derived(1, "agglomerations") is None
+    assert cache.get_report()["models"][1]["derived"]["frame"] >= 8000
+
+    cache.put(1, FakeRegion(10))
+    assert cache.get_derived(1, "frame") is None
+    assert (cache.derived_hits, cache.derived_misses) == (1, 2)
+
+
+def test_disabled_cache_keeps_nothing():
+    cache = ResidentModelCache(max_models=0)
+    cache.put(1, FakeRegion(10))
+    assert cache.get(1) is None
+    assert cache.get_report()["models"] == {}
+
+
+def test_collector_exports_memory_by_part():
+    cache = ResidentModelCache(max_models=2)
+    cache.put(7, FakeRegion(10))
+    cache.get(7)
+    registry = CollectorRegistry()
+    registry.register(ResidentModelsMetricsCollector(cache))
+
+    assert registry.get_sample_value("popframe_model_cache_hits_total") == 1
+    assert registry.get_sample_value("popframe_model_cache_models") == 1
+    assert registry.get_sample_value(
+        "popframe_model_cache_bytes", {"region_id": "7", "kind": "model", "part": "accessibility_matrix"}
+    ) >= 400
+
+
+def test_stale_version_is_dropped():
+    cache = ResidentModelCache(max_models=2)
+    cache.put(1, FakeRegion(10), version=(1, 0))
+
+    assert cache.get(1, (1, 0)) is not None
+    assert cache.peek(1, (2, 0)) is None
+    assert cache.get(1, (2, 0)) is None
+    assert 1 not in cache.entries
+    assert (cache.hits, cache.misses, cache.stale) == (1, 1, 1)
+
+
+def test_derived_results_are_bounded_per_model():
+    cache = ResidentModelCache(max_models=2, max_derived=2)
+    cache.put(1, FakeRegion(10))
+    cache.set_derived(1, "a", np.zeros(10))
+    cache.set_derived(1, "b", np.zeros(10))
+    assert cache.get_derived(1, "a") is not None
+    cache.set_derived(1, "c", np.zeros(10))
+
+    assert list(cache.entries[1].derived) == ["a", "c"]
+    assert cache.derived_evictions == 1
+
+    cache = ResidentModelCache(max_models=2, max_derived_bytes=12_000)
+    cache.put(1, FakeRegion(10))
+    cache.set_derived(1, "a", np.zeros(1000))
+    cache.set_derived(1, "b", np.zeros(1000))
+    assert list(cache.entries[1].derived) == ["b"]
+
+
+def test_memory_budget_drops_derived_results_of_the_last_model():
+    model = FakeRegion(10)
+    model_bytes = sum(measure_model(model).values())
+    cache = ResidentModelCache(max_models=2, max_bytes=model_bytes + 12_000)
+    cache.put(1, model)
+    for key in ("a", "b", "c"):
+        cache.set_derived(1, key, np.zeros(1000))
+
+    assert list(cache.entries) == [1]
+    assert list(cache.entries[1].derived) == ["c"]
+    assert cache.total_bytes <= cache.max_bytes
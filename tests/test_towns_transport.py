@@ -0,0 +1,36 @@
+import io
+import pickle
+
+import geopandas as gpd
+import pytest
+from shapely.geometry import Point
+
+from app.common.models.popframe_models.services.towns_transport import decode_towns
+
+
+def make_towns() -> gpd.GeoDataFrame:
+    return gpd.GeoDataFrame(
+        {"name": ["a", "b"]},
+        geometry=[Point(1, 2), Point(3, 4)],
+        index=[42, 43],
+        crs=4326,
+    )
+
+
+def test_decode_geoparquet_keeps_index_and_crs():
+    buffer = io.BytesIO()
+    make_towns().to_parquet(buffer)
+    towns = decode_towns("application/vnd.apache.parquet", buffer.getvalue())
+    assert list(towns.index) == [42, 43]
+    assert towns.crs.to_epsg() == 4326
+    assert towns.loc[43, "name"] == "b"
+
+
+def test_only_declared_pickle_is_unpickled():
+    body = pickle.dumps(make_towns())
+    assert list(decode_towns("application/python-pickle", body).index) == [42, 43]
+    with pytest.raises(ValueError):
+        decode_towns("application/python-pickle", body, allow_pickle=False)
+    for content_type in ("application/octet-stream", "text/html"):
+        with pytest.raises(ValueError):
+            decode_towns(content_type, body)